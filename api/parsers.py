@@ -0,0 +1,87 @@
+import gzip
+import io
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+
+
+class CompressedJSONParser(JSONParser):
+    """
+    A JSON parser that also accepts request bodies compressed
+    with gzip, as indicated by the Content-Encoding header
+    """
+    def parse(self, stream, media_type=None, parser_context=None):
+        request = (parser_context or {}).get('request')
+        encoding = request.headers.get('Content-Encoding', '').lower() if request is not None else ''
+        if encoding == 'gzip':
+            max_size = getattr(settings, 'HAWK_MAX_PUSH_SIZE', 200 * 1024 * 1024)
+            try:
+                with gzip.GzipFile(fileobj=stream) as f:
+                    body = f.read(max_size + 1)
+            except (OSError, EOFError) as e:
+                raise ParseError(f'Invalid gzip body: {e}')
+            if len(body) > max_size:
+                raise ParseError('Decompressed body is too large')
+            stream = io.BytesIO(body)
+        elif encoding not in ['', 'identity']:
+            raise ParseError(f'Unsupported Content-Encoding: {encoding}')
+        return super().parse(stream, media_type, parser_context)
+
+
+def expand_push_data(data: dict) -> dict:
+    """
+    Expand the data of a push sent in the compact format (version 2) into the
+    original format, where every job and error carries its page's details.
+
+    In the compact format the pages are sent once in a `pages` table, and jobs
+    and errors refer to them by their index in the table. Jobs are sent either
+    as columns (a dict mapping each field to a list of values) or as rows (a list
+    of [page, title, job_id, url, last_seen] lists). Data in the original format
+    is returned unchanged.
+    """
+    if not isinstance(data, dict) or data.get('version', 1) < 2:
+        return data
+    pages = data.get('pages', [])
+    # Jobs and errors of a page share the same dict for the page's details
+    page_details = [
+        {
+            'id': page['id'],
+            'name': page.get('name', ''),
+            'company': page.get('company', ''),
+            'url': page.get('url', ''),
+            'selector': page.get('selector', ''),
+        } for page in pages
+    ]
+    jobs_data = data.get('jobs', {})
+    if isinstance(jobs_data, dict):
+        rows = zip(
+            jobs_data.get('page', []),
+            jobs_data.get('title', []),
+            jobs_data.get('job_id', []),
+            jobs_data.get('url', []),
+            jobs_data.get('last_seen', []),
+        )
+    else:
+        rows = jobs_data
+    jobs = []
+    for page_index, title, job_id, url, last_seen in rows:
+        page = pages[page_index]
+        jobs.append({
+            'title': title,
+            'company': page.get('company', ''),
+            'company_id': page.get('company_id'),
+            'page': page_details[page_index],
+            'last_seen': last_seen,
+            'job_id': job_id,
+            'url': url,
+        })
+    errors = [
+        {'page': page_details[error['page']], 'error': error['error']}
+        for error in data.get('errors', [])
+    ]
+    return {
+        **data,
+        'jobs': jobs,
+        'errors': errors,
+    }
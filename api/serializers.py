@@ -50,21 +50,38 @@ class PageSearchSerializer(serializers.ModelSerializer):
 
 
 class PageSerializer(serializers.ModelSerializer):
+    """
+    Serializes a page for the scraper. The rate limits of the page's host are
+    looked up in the `hosts` context, a dict mapping host names to Host objects.
+    """
     company = serializers.StringRelatedField()
+    rate_limit = serializers.SerializerMethodField()
+    rate_burst = serializers.SerializerMethodField()
 
     class Meta:
         model = Page
         fields = [
             'id',
             'name', 'company', 'company_id', 'api_url', 'url', 'location', 'is_remote',
-            'years_of_experience', 'level', 'selector', 'response_type', 'title_key', 'job_id_key',
-            'job_url_key', 'job_url_prefix', 'request_method', 'request_payload'
+            'years_of_experience', 'level', 'selector', 'response_type', 'parser', 'stream_response', 'title_key', 'job_id_key',
+            'job_url_key', 'job_url_prefix', 'request_method', 'request_payload',
+            'pagination_type', 'pagination_param', 'pagination_limit_param', 'pagination_page_size',
+            'pagination_start', 'pagination_total_key', 'pagination_cursor_key', 'pagination_max_pages',
+            'etag', 'last_modified', 'content_hash', 'job_fingerprint', 'config_hash', 'rate_limit', 'rate_burst',
         ]
 
+    def get_rate_limit(self, obj):
+        host = self.context.get('hosts', {}).get(obj.host)
+        return host.requests_per_second if host else None
+
+    def get_rate_burst(self, obj):
+        host = self.context.get('hosts', {}).get(obj.host)
+        return host.burst if host else None
+
 
 class PushSerializer(serializers.ModelSerializer):
     # company = serializers.StringRelatedField()
 
     class Meta:
         model = Push
-        fields = ['time', 'data', 'n_jobs_found', 'n_errors']
+        fields = ['time', 'n_jobs_found', 'n_errors']
@@ -1,3 +1,85 @@
-from django.test import TestCase
+import copy
 
-# Create your tests here.
+from django.test import SimpleTestCase
+
+from api.parsers import expand_push_data
+
+PAGES = [
+    {'id': 1, 'name': 'Careers', 'company': 'Acme', 'company_id': 10, 'url': 'https://acme.com/careers', 'selector': 'a.job'},
+    {'id': 2, 'name': 'Jobs', 'company': 'Globex', 'company_id': 20, 'url': 'https://globex.com/jobs', 'selector': 'li'},
+]
+# page index, title, job ID, URL, last seen
+JOB_ROWS = [
+    [0, 'Engineer', '1', 'https://acme.com/jobs/1', '2025-01-01 00:00:00'],
+    [1, 'Designer', None, None, '2025-01-01 00:00:00'],
+    [0, 'Manager', '3', 'https://acme.com/jobs/3', '2025-01-01 00:00:00'],
+]
+
+
+def get_original_jobs() -> list[dict]:
+    """
+    The jobs of JOB_ROWS in the original format (version 1)
+    """
+    jobs = []
+    for page_index, title, job_id, url, last_seen in JOB_ROWS:
+        page = PAGES[page_index]
+        jobs.append({
+            'title': title,
+            'company': page['company'],
+            'company_id': page['company_id'],
+            'page': {key: page[key] for key in ['id', 'name', 'company', 'url', 'selector']},
+            'last_seen': last_seen,
+            'job_id': job_id,
+            'url': url,
+        })
+    return jobs
+
+
+class ExpandPushDataTests(SimpleTestCase):
+    def make_data(self, jobs) -> dict:
+        return {
+            'version': 2,
+            'push_id': 5,
+            'n_jobs_found': len(JOB_ROWS),
+            'pages': copy.deepcopy(PAGES),
+            'jobs': jobs,
+            'errors': [{'page': 1, 'error': 'Timed out'}],
+        }
+
+    def test_columnar_jobs(self):
+        fields = ['page', 'title', 'job_id', 'url', 'last_seen']
+        columns = {field: [row[i] for row in JOB_ROWS] for i, field in enumerate(fields)}
+        data = expand_push_data(self.make_data(columns))
+        self.assertEqual(data['jobs'], get_original_jobs())
+
+    def test_row_jobs(self):
+        data = expand_push_data(self.make_data(copy.deepcopy(JOB_ROWS)))
+        self.assertEqual(data['jobs'], get_original_jobs())
+
+    def test_columnar_and_row_jobs_are_expanded_the_same(self):
+        fields = ['page', 'title', 'job_id', 'url', 'last_seen']
+        columns = {field: [row[i] for row in JOB_ROWS] for i, field in enumerate(fields)}
+        self.assertEqual(
+            expand_push_data(self.make_data(columns)),
+            expand_push_data(self.make_data(copy.deepcopy(JOB_ROWS))),
+        )
+
+    def test_errors_and_other_fields(self):
+        data = expand_push_data(self.make_data([]))
+        self.assertEqual(data['jobs'], [])
+        self.assertEqual(data['errors'], [{
+            'page': {'id': 2, 'name': 'Jobs', 'company': 'Globex', 'url': 'https://globex.com/jobs', 'selector': 'li'},
+            'error': 'Timed out',
+        }])
+        self.assertEqual(data['push_id'], 5)
+        self.assertEqual(data['pages'], PAGES)
+
+    def test_original_format_is_unchanged(self):
+        original = {
+            'push_id': 5,
+            'jobs': get_original_jobs(),
+            'errors': [],
+            'pages': [{'id': 1, 'etag': '"abc"'}],
+        }
+        self.assertIs(expand_push_data(original), original)
+        self.assertEqual(expand_push_data({**original, 'version': 1})['jobs'], get_original_jobs())
@@ -4,15 +4,18 @@ import logging
 
 from django.http import HttpResponse
 from django.conf import settings
-from django.db.models import Min
+from django.db import transaction
+from django.db.models import F, Min
 import json
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.views import APIView
 
+from api.parsers import CompressedJSONParser, expand_push_data
 from api.serializers import PageSerializer, PushSerializer, PageSearchSerializer, JobSerializer, CompanySerializer
-from core.models import Page, Watchlist, Push, Company, Job
-from core.utils import create_jobs_and_notify
+from core.models import Page, Watchlist, Push, Company, Job, Host
+from core.tasks import enqueue_push_batch
+from core.utils import record_push_batch, save_push_errors
 
 logger = logging.getLogger('django')
 
@@ -43,19 +46,12 @@ class RecentJobCountView(APIView):
     def get(self, request):
         ten_days_ago = datetime.datetime.now() - datetime.timedelta(days=10)
         pushes = Push.objects.filter(time__gte=ten_days_ago).values('time__date').annotate(first_id=Min('id'))
-        recent_pushes = Push.objects.filter(id__in=[p['first_id'] for p in pushes])
+        recent_pushes = Push.objects.filter(id__in=[p['first_id'] for p in pushes], n_jobs_found__gt=0).only('time', 'n_jobs_found')
         n_jobs = []
         dates = []
         for push in recent_pushes:
-            if push.n_jobs_found > 0:
-                n_jobs.append(push.n_jobs_found)
-                dates.append(push.time.strftime("%Y-%m-%d %H:%M"))
-            else:
-                try:
-                    n_jobs.append(len(push.data['jobs']))
-                    dates.append(push.time.strftime("%Y-%m-%d %H:%M"))
-                except:
-                    pass
+            n_jobs.append(push.n_jobs_found)
+            dates.append(push.time.strftime("%Y-%m-%d %H:%M"))
         n_jobs.reverse()
         dates.reverse()
         return Response({"x": dates, "y": n_jobs}, status=status.HTTP_200_OK)
@@ -74,8 +70,9 @@ class PageListView(APIView):
             yield iterable[i:i + size]
 
     def get(self, request):
-        pages = Page.objects.all()
-        serializer = PageSerializer(pages, many=True)
+        pages = Page.objects.select_related('company')
+        hosts = {host.name: host for host in Host.objects.all()}
+        serializer = PageSerializer(pages, many=True, context={'hosts': hosts})
         # In debug mode, just return the pages here, don't push to SQS
         if settings.DEBUG:
             return Response(serializer.data, status=status.HTTP_200_OK)
@@ -90,13 +87,15 @@ class PageListView(APIView):
         data = serializer.data
         n_pages = 0
         n_messages = 0
+        chunks = list(self.chunked(data, 10))
         # An empty Push object. Jobs found from this SQS message should be
-        # associated with this Push object.
-        push = Push.objects.create()
-        for chunk in self.chunked(data, 10):
+        # associated with this Push object. The push is complete, and users
+        # are notified about its new jobs, once every chunk has been reported.
+        push = Push.objects.create(n_chunks=len(chunks))
+        for i, chunk in enumerate(chunks):
             sqs.send_message(
                 QueueUrl=queue_url,
-                MessageBody=json.dumps({'data': chunk, 'push_id': push.id}),
+                MessageBody=json.dumps({'data': chunk, 'push_id': push.id, 'chunk': i}),
             )
             n_messages += 1
             n_pages += len(chunk)
@@ -105,17 +104,25 @@ class PageListView(APIView):
 
 
 class PushCreateView(APIView):
+    parser_classes = [CompressedJSONParser]
+
     def post(self, request):
         # Note: This view does not require request origin verification
         # because this view is only called during testing. The production
         # Lambda function sends requests to the PushUpdateView to update
-        # and existing Push object and not create a new Push.
-        serializer = PushSerializer(data=request.data)
+        # and existing Push object and not create a new Push. When testing,
+        # the scraper sends its first batch of jobs here and the remaining
+        # batches to the PushUpdateView, using the ID returned here.
+        data = expand_push_data(request.data.get('data'))
+        if not data:
+            return Response({}, status=status.HTTP_400_BAD_REQUEST)
+        serializer = PushSerializer(data={'n_jobs_found': data.get('n_jobs_found', 0), 'n_errors': data.get('n_errors', 0)})
         if serializer.is_valid():
-            push = serializer.save()
-            push.n_jobs_found = push.data['n_jobs_found']
-            push.n_errors = push.data['n_errors']
-            push.save()
+            with transaction.atomic():
+                push = serializer.save()
+                record_push_batch(push, data)
+                save_push_errors(push, data.get('errors', []))
+                enqueue_push_batch(push, data)
             # Delete old pushes if we have more than 3000 pushes
             total_pushes = Push.objects.count()
             if total_pushes > 3000:
@@ -123,34 +130,32 @@ class PushCreateView(APIView):
                 last_push = Push.objects.last()
                 logger.info(f"Deleting last push {last_push}")
                 last_push.delete()
-            # TODO: turn this into a celery task and run asynchronously
-            create_jobs_and_notify(serializer.data['data']['jobs'], push.id)
-            return Response({}, status=status.HTTP_201_CREATED)
+            return Response({'push_id': push.id}, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
 class PushUpdateView(APIView):
+    parser_classes = [CompressedJSONParser]
+
     def post(self, request):
-        data = request.data.get('data', {'data': {}})
+        data = expand_push_data(request.data.get('data', {'data': {}}))
         # logger.info(f"Received Push update with data: {data}")
         if not data:
             logger.warning(f"Received Push with no data. Got the following body: {request.data}")
             return Response({}, status=status.HTTP_400_BAD_REQUEST)
-        push = Push.objects.get(id=data['push_id'])
-        if push.data is None or not isinstance(push.data, dict):
-            push.data = {'jobs': [], 'errors': [], 'n_errors': 0, 'n_jobs_found': 0, 'timestamp': str(data['timestamp'])}
-        if 'jobs' not in push.data:
-            push.data['jobs'] = []
-        if 'errors' not in push.data:
-            push.data['errors'] = []
-        push.data['jobs'].extend(data['jobs'])
-        push.data['errors'].extend(data['errors'])
-        push.n_jobs_found += len(data['jobs'])
-        push.n_errors += len(data['errors'])
-        push.save()
-        logger.info(f"Push {push.id} updated. Creating new jobs and notifying users.")
-        create_jobs_and_notify(push.data['jobs'], push.id)
-        return Response({}, status=status.HTTP_200_OK)
+        with transaction.atomic():
+            push = Push.objects.get(id=data['push_id'])
+            if not record_push_batch(push, data):
+                logger.info(f"Batch {data['batch_id']} of push {push.id} was already processed, ignoring it.")
+                return Response({'push_id': push.id}, status=status.HTTP_200_OK)
+            Push.objects.filter(id=push.id).update(
+                n_jobs_found=F('n_jobs_found') + len(data['jobs']),
+                n_errors=F('n_errors') + len(data['errors']),
+            )
+            save_push_errors(push, data['errors'])
+            enqueue_push_batch(push, data)
+            logger.info(f"Push {push.id} updated. Queued {len(data['jobs'])} jobs to be processed.")
+        return Response({'push_id': push.id}, status=status.HTTP_200_OK)
 
 
 class SubscribeToWatchlistView(APIView):
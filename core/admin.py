@@ -1,13 +1,9 @@
 from django import forms
 from django.contrib import admin
-import json
+from django.utils import timezone
 
-from core.models import Company, Job, Notification, Push, Page, Watchlist
-
-
-class PrettyJSONEncoder(json.JSONEncoder):
-    def __init__(self, *args, indent, sort_keys, **kwargs):
-        super().__init__(*args, indent=2, sort_keys=True, **kwargs)
+from core.models import Company, Host, Job, Notification, OutboundEmail, Push, PushBatch, PushError, Page, Task, Watchlist
+from core.outbox import send_queued_emails
 
 
 @admin.register(Company)
@@ -31,19 +27,47 @@ class PageAdmin(admin.ModelAdmin):
     list_filter = ['company']
 
 
-class PushModelForm(forms.ModelForm):
-    data = forms.JSONField(encoder=PrettyJSONEncoder)
+@admin.register(Host)
+class HostAdmin(admin.ModelAdmin):
+    search_fields = ['name']
+    list_display = ['name', 'requests_per_second', 'burst', 'n_requests', 'n_throttled', 'throttle_rate', 'n_failures', 'n_skipped', 'circuit_opened_at']
+    readonly_fields = ['n_requests', 'n_throttled', 'n_failures', 'n_skipped', 'circuit_opened_at']
+
+    def throttle_rate(self, obj):
+        return f'{obj.throttle_rate:.1%}'
+
+
+class PushErrorInline(admin.TabularInline):
+    model = PushError
+    extra = 0
+    readonly_fields = ['page', 'url', 'error']
+    can_delete = False
+
+
+class PushBatchInline(admin.TabularInline):
+    model = PushBatch
+    extra = 0
+    readonly_fields = ['batch_id', 'time', 'n_jobs_found', 'n_errors']
+    can_delete = False
 
 
 @admin.register(Push)
 class PushAdmin(admin.ModelAdmin):
-    form = PushModelForm
-    list_display = ['time', 'n_jobs_found', 'n_errors']
+    list_display = ['time', 'n_jobs_found', 'n_errors', 'n_chunks', 'notified_at']
+    readonly_fields = ['notified_at']
+    inlines = [PushBatchInline, PushErrorInline]
+
+
+@admin.register(PushBatch)
+class PushBatchAdmin(admin.ModelAdmin):
+    list_display = ['batch_id', 'push', 'time', 'n_jobs_found', 'n_errors']
+    readonly_fields = ['push', 'batch_id', 'time', 'n_jobs_found', 'n_errors']
 
 
 @admin.register(Notification)
 class NotificationAdmin(admin.ModelAdmin):
-    list_display = ['notification_name', 'user', 'date', 'n_new_jobs']
+    list_display = ['notification_name', 'user', 'date', 'n_new_jobs', 'pending']
+    list_filter = ['pending']
 
     def notification_name(self, obj):
         return str(obj)
@@ -63,3 +87,29 @@ class WatchlistAdminForm(forms.ModelForm):
 @admin.register(Watchlist)
 class WatchlistAdmin(admin.ModelAdmin):
     form = WatchlistAdminForm
+
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ['id', 'name', 'status', 'attempts', 'run_at', 'finished_at']
+    list_filter = ['status', 'name']
+    readonly_fields = ['created', 'started_at', 'finished_at', 'error']
+    actions = ['retry']
+
+    @admin.action(description='Retry selected tasks')
+    def retry(self, request, queryset):
+        queryset.exclude(status='running').update(status='queued', run_at=timezone.now(), attempts=0)
+
+
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = ['id', 'to_email', 'subject', 'status', 'attempts', 'send_after', 'sent_at']
+    list_filter = ['status']
+    search_fields = ['to_email']
+    readonly_fields = ['notification', 'created', 'started_at', 'sent_at', 'error']
+    actions = ['retry']
+
+    @admin.action(description='Retry selected emails')
+    def retry(self, request, queryset):
+        queryset.exclude(status__in=['sending', 'sent']).update(status='queued', send_after=timezone.now(), attempts=0)
+        send_queued_emails.enqueue()
@@ -0,0 +1,131 @@
+import multiprocessing
+import socketserver
+import time
+
+from django.core.mail import send_mail
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from core.models import OutboundEmail
+from core.outbox import deliver
+
+
+class SMTPSinkHandler(socketserver.StreamRequestHandler):
+    """
+    Speaks just enough SMTP to accept emails and throw them away, waiting
+    `server.latency` seconds before greeting a client and accepting an email,
+    like a remote email service would
+    """
+    def reply(self, line: str) -> None:
+        self.wfile.write(f'{line}\r\n'.encode())
+
+    def handle(self):
+        with self.server.n_connections.get_lock():
+            self.server.n_connections.value += 1
+        time.sleep(self.server.latency)
+        self.reply('220 localhost SMTP sink')
+        in_data = False
+        for raw_line in self.rfile:
+            line = raw_line.decode('utf-8', 'replace').rstrip('\r\n')
+            if in_data:
+                if line == '.':
+                    in_data = False
+                    time.sleep(self.server.latency)
+                    with self.server.n_received.get_lock():
+                        self.server.n_received.value += 1
+                    self.reply('250 OK')
+                continue
+            command = line[:4].upper()
+            if command == 'EHLO':
+                self.reply('250 localhost')
+            elif command == 'DATA':
+                in_data = True
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+            elif command == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('250 OK')
+
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, latency: float, n_received, n_connections):
+        super().__init__(('127.0.0.1', 0), SMTPSinkHandler)
+        self.latency = latency
+        self.n_received = n_received
+        self.n_connections = n_connections
+
+
+def run_sink(latency: float, n_received, n_connections, address) -> None:
+    """
+    Run an SMTP sink in its own process, so that it doesn't compete with
+    the threads sending emails, and send its address back through `address`
+    """
+    sink = SMTPSink(latency, n_received, n_connections)
+    address.send(sink.server_address)
+    sink.serve_forever()
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure how many emails per second are sent one connection per email (like '
+        'notify_users used to) and from the outbox, to a local SMTP stand-in. Starts '
+        'its own SMTP sink unless --smtp is given (e.g. one started with `python -m '
+        'aiosmtpd -n -l 127.0.0.1:8025`). Nothing is saved to the database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=500, help='Number of emails to send')
+        parser.add_argument('--threads', type=int, default=4, help='Threads the outbox sends emails with')
+        parser.add_argument('--latency', type=float, default=0.01, help='Seconds the built-in sink waits before each reply')
+        parser.add_argument('--smtp', help='host:port of an SMTP server to send to instead of the built-in sink')
+
+    def handle(self, *args, **options):
+        sink = None
+        n_received = multiprocessing.Value('i', 0)
+        n_connections = multiprocessing.Value('i', 0)
+        if options['smtp']:
+            host, port = options['smtp'].rsplit(':', 1)
+        else:
+            receiver, sender = multiprocessing.Pipe(duplex=False)
+            sink = multiprocessing.Process(target=run_sink, args=(options['latency'], n_received, n_connections, sender), daemon=True)
+            sink.start()
+            host, port = receiver.recv()
+        emails = [
+            OutboundEmail(
+                to_email=f'user{i}@example.com',
+                from_email='Hawk Job Tracker <jobs@hrus.in>',
+                subject='New Jobs Found on Your Watchlist',
+                body='New jobs were found on your watchlist.\n' * 20,
+                html_body='<p>New jobs were found on your watchlist.</p>\n' * 20,
+            ) for i in range(options['count'])
+        ]
+        smtp_settings = {
+            'EMAIL_BACKEND': 'django.core.mail.backends.smtp.EmailBackend',
+            'EMAIL_HOST': host,
+            'EMAIL_PORT': int(port),
+            'EMAIL_USE_TLS': False,
+            'EMAIL_HOST_USER': '',
+            'EMAIL_HOST_PASSWORD': '',
+        }
+        with override_settings(**smtp_settings):
+            start = time.perf_counter()
+            for email in emails:
+                send_mail(email.subject, email.body, email.from_email, [email.to_email], html_message=email.html_body)
+            self.report('One connection per email', len(emails), time.perf_counter() - start)
+
+            start = time.perf_counter()
+            errors = deliver(emails, options['threads'])
+            failed = sum(1 for error in errors if error)
+            self.report(f'Outbox, {options["threads"]} threads', len(emails) - failed, time.perf_counter() - start)
+            if failed:
+                self.stdout.write(f'{failed} emails failed, e.g. {next(error for error in errors if error)}')
+        if sink is not None:
+            sink.terminate()
+            self.stdout.write(f'The sink received {n_received.value} emails over {n_connections.value} connections')
+
+    def report(self, name: str, n_sent: int, elapsed: float) -> None:
+        self.stdout.write(f'{name:<28} {n_sent} emails in {elapsed:.2f}s ({n_sent / elapsed:.0f} emails/s)')
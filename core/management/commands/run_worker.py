@@ -0,0 +1,48 @@
+from datetime import timedelta
+import time
+
+from django.core.management.base import BaseCommand
+
+# Importing the tasks registers them
+from core import outbox, tasks  # noqa: F401
+from core.queue import TASKS, claim_task, delete_finished_tasks, get_backend, run_task
+
+
+class Command(BaseCommand):
+    help = 'Run queued background tasks, such as processing pushes from the scraper'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Exit once there are no more tasks that are due')
+        parser.add_argument('--sleep', type=float, default=5, help='Seconds to wait for new tasks when there are none')
+        parser.add_argument('--keep-days', type=float, default=7, help='Days to keep tasks that finished successfully')
+
+    def handle(self, *args, **options):
+        backend = get_backend()
+        keep = timedelta(days=options['keep_days'])
+        last_cleanup = 0
+        last_deadline_check = 0
+        self.stdout.write(f'Worker started with {len(TASKS)} tasks registered')
+        while True:
+            if time.monotonic() - last_cleanup > 60 * 60:
+                deleted = delete_finished_tasks(keep)
+                if deleted:
+                    self.stdout.write(f'Deleted {deleted} finished tasks')
+                last_cleanup = time.monotonic()
+            if time.monotonic() - last_deadline_check > 60:
+                overdue = tasks.enqueue_overdue_notifications()
+                if overdue:
+                    self.stdout.write(f'Queued notifications for {overdue} pushes that missed their deadline')
+                digests = tasks.enqueue_due_digests()
+                if digests:
+                    self.stdout.write(f'Queued digests for {digests} users')
+                last_deadline_check = time.monotonic()
+            task = claim_task()
+            if task is None:
+                if options['once']:
+                    break
+                backend.wait(options['sleep'])
+                continue
+            start = time.perf_counter()
+            succeeded = run_task(task)
+            elapsed = time.perf_counter() - start
+            self.stdout.write(f'Task {task.id} ({task.name}) {"done" if succeeded else "failed"} in {elapsed:.2f}s')
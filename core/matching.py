@@ -0,0 +1,138 @@
+"""
+Matching job titles against the keyword filters of watchlists.
+
+The include and exclude keywords of every watchlist are compiled into a single
+Aho-Corasick automaton, so finding every keyword in a job title takes one pass
+over the title, however many watchlists and keywords there are. Each watchlist
+then only compares the keywords it uses with the keywords that were found.
+
+Keywords match whole words or phrases, ignoring case and punctuation, so that
+"intern" matches "Summer Intern" but not "International Sales".
+"""
+import re
+
+# Characters other than these separate words. + and # are kept so
+# that keywords like C++ and C# can be told apart from C.
+NON_WORD_PATTERN = re.compile(r'[^\w+#]+')
+
+
+def normalize(text: str) -> str:
+    """
+    Lowercase text and replace runs of punctuation and whitespace with a single
+    space, padding it with spaces so that keywords only match whole words
+    """
+    return f' {NON_WORD_PATTERN.sub(" ", text.lower()).strip()} '
+
+
+def parse_keywords(value: str) -> list[str]:
+    """
+    Split a comma-separated list of keywords, leaving out empty keywords
+    """
+    return [keyword.strip() for keyword in (value or '').split(',') if normalize(keyword).strip()]
+
+
+class AhoCorasick:
+    """
+    An Aho-Corasick automaton, which finds every occurrence of a set of patterns
+    in a text in time linear in the length of the text and the number of matches
+    """
+    def __init__(self, patterns: list[str]):
+        # The transitions, failure links, patterns ending at, and the nearest
+        # node on the failure chain where a pattern ends, of each node
+        self.goto: list[dict[str, int]] = [{}]
+        self.fail: list[int] = [0]
+        self.output: list[list[int]] = [[]]
+        self.output_link: list[int] = [-1]
+        for pattern_id, pattern in enumerate(patterns):
+            node = 0
+            for char in pattern:
+                if char not in self.goto[node]:
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append([])
+                    self.output_link.append(-1)
+                    self.goto[node][char] = len(self.goto) - 1
+                node = self.goto[node][char]
+            self.output[node].append(pattern_id)
+
+        # Breadth first, so the failure link of a node is set before its children's
+        queue = list(self.goto[0].values())
+        for node in queue:
+            for char, child in self.goto[node].items():
+                queue.append(child)
+                fallback = self.fail[node]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(char, 0) if node else 0
+                target = self.fail[child]
+                self.output_link[child] = target if self.output[target] else self.output_link[target]
+
+    def find(self, text: str) -> set[int]:
+        """
+        Get the IDs (indices) of the patterns that occur in the text
+        """
+        found = set()
+        goto, fail, output, output_link = self.goto, self.fail, self.output, self.output_link
+        node = 0
+        for char in text:
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            match = node if output[node] else output_link[node]
+            while match > 0:
+                found.update(output[match])
+                match = output_link[match]
+        return found
+
+
+class WatchlistFilter:
+    """
+    The keyword filters of a watchlist, as the IDs of their keywords in a WatchlistMatcher
+    """
+    __slots__ = ('include', 'exclude')
+
+    def __init__(self, include: frozenset[int], exclude: frozenset[int]):
+        self.include = include
+        self.exclude = exclude
+
+    def accepts(self, found: set[int]) -> bool:
+        """
+        Check whether a job whose title has the keywords `found` passes this filter
+        """
+        if self.include and self.include.isdisjoint(found):
+            return False
+        return self.exclude.isdisjoint(found)
+
+
+class WatchlistMatcher:
+    """
+    Matches job titles against the keyword filters of many watchlists at once.
+    Watchlists without keyword filters accept every job and are left out.
+    """
+    def __init__(self, watchlists: list[tuple[int, str, str]]):
+        """
+        :param watchlists: A list of 3-tuples of the ID, include keywords
+            and exclude keywords of each watchlist
+        """
+        keyword_ids = {}
+        self.filters: dict[int, WatchlistFilter] = {}
+        for watchlist_id, include, exclude in watchlists:
+            include_ids = frozenset(keyword_ids.setdefault(normalize(keyword), len(keyword_ids)) for keyword in parse_keywords(include))
+            exclude_ids = frozenset(keyword_ids.setdefault(normalize(keyword), len(keyword_ids)) for keyword in parse_keywords(exclude))
+            if include_ids or exclude_ids:
+                self.filters[watchlist_id] = WatchlistFilter(include_ids, exclude_ids)
+        self.automaton = AhoCorasick(list(keyword_ids))
+
+    def find(self, title: str) -> set[int]:
+        """
+        Get the IDs of the keywords of any watchlist that occur in a job title
+        """
+        return self.automaton.find(normalize(title))
+
+    def accepts(self, watchlist_id: int, found: set[int]) -> bool:
+        """
+        Check whether a job whose title has the keywords `found` (see find)
+        passes the keyword filters of a watchlist
+        """
+        watchlist_filter = self.filters.get(watchlist_id)
+        return watchlist_filter is None or watchlist_filter.accepts(found)
@@ -0,0 +1,43 @@
+# Generated by Django 5.2 on 2026-10-18 15:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0028_alter_push_data"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="page",
+            name="content_hash",
+            field=models.CharField(
+                blank=True,
+                default="",
+                help_text="SHA-256 hash of the body of the last response received for this page.",
+                max_length=64,
+            ),
+        ),
+        migrations.AddField(
+            model_name="page",
+            name="etag",
+            field=models.CharField(
+                blank=True,
+                default="",
+                help_text="ETag header of the last response received for this page.",
+                max_length=256,
+            ),
+        ),
+        migrations.AddField(
+            model_name="page",
+            name="last_modified",
+            field=models.CharField(
+                blank=True,
+                default="",
+                help_text="Last-Modified header of the last response received for this page.",
+                max_length=64,
+            ),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-18 15:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0029_page_etag_page_last_modified_page_content_hash"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="page",
+            name="job_fingerprint",
+            field=models.CharField(
+                blank=True,
+                default="",
+                help_text="Hash of the set of jobs found on this page when it was last scraped.",
+                max_length=64,
+            ),
+        ),
+    ]
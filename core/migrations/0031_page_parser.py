@@ -0,0 +1,29 @@
+# Generated by Django 5.2 on 2026-10-18 15:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0030_page_job_fingerprint"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="page",
+            name="parser",
+            field=models.CharField(
+                blank=True,
+                choices=[
+                    ("auto", "Automatic"),
+                    ("lexbor", "selectolax (lexbor)"),
+                    ("lxml", "lxml"),
+                    ("html.parser", "html.parser"),
+                ],
+                default="auto",
+                help_text="If the response type is HTML, this is the parser used to parse the page. Automatic uses the fastest parser installed on the scraper.",
+                max_length=16,
+            ),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2 on 2026-10-18 15:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0031_page_parser"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="page",
+            name="stream_response",
+            field=models.BooleanField(
+                blank=True,
+                default=False,
+                help_text="If the response type is JSON, parse the response incrementally while it is downloaded instead of loading it in memory all at once. Use this for very large API responses. Only works if the selector is a list of object keys.",
+            ),
+        ),
+    ]
@@ -0,0 +1,94 @@
+# Generated by Django 5.2 on 2026-10-18 15:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0032_page_stream_response"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="page",
+            name="pagination_cursor_key",
+            field=models.CharField(
+                blank=True,
+                default="",
+                help_text="If the pagination type is cursor, a comma-separated list of keys that would give the cursor of the next page from the JSON response.",
+                max_length=128,
+            ),
+        ),
+        migrations.AddField(
+            model_name="page",
+            name="pagination_limit_param",
+            field=models.CharField(
+                blank=True,
+                default="",
+                help_text="Name of the request parameter that holds the number of jobs per page, if the API has one.",
+                max_length=64,
+            ),
+        ),
+        migrations.AddField(
+            model_name="page",
+            name="pagination_max_pages",
+            field=models.PositiveSmallIntegerField(
+                blank=True, default=50, help_text="Maximum number of pages to fetch."
+            ),
+        ),
+        migrations.AddField(
+            model_name="page",
+            name="pagination_page_size",
+            field=models.PositiveIntegerField(
+                blank=True,
+                default=0,
+                help_text="Number of jobs per page. If 0, the value of the limit parameter or the number of jobs on the first page is used.",
+            ),
+        ),
+        migrations.AddField(
+            model_name="page",
+            name="pagination_param",
+            field=models.CharField(
+                blank=True,
+                default="",
+                help_text="Name of the request parameter that holds the offset, page number or cursor. For GET requests this is a query parameter, for POST and PUT requests a comma-separated list of keys in the request payload.",
+                max_length=64,
+            ),
+        ),
+        migrations.AddField(
+            model_name="page",
+            name="pagination_start",
+            field=models.PositiveIntegerField(
+                blank=True,
+                default=0,
+                help_text="Offset or page number of the first page.",
+            ),
+        ),
+        migrations.AddField(
+            model_name="page",
+            name="pagination_total_key",
+            field=models.CharField(
+                blank=True,
+                default="",
+                help_text="Comma-separated list of keys that would give the total number of jobs from the JSON response. If set, the remaining pages are fetched in parallel.",
+                max_length=64,
+            ),
+        ),
+        migrations.AddField(
+            model_name="page",
+            name="pagination_type",
+            field=models.CharField(
+                blank=True,
+                choices=[
+                    ("none", "No pagination"),
+                    ("offset", "Offset and limit"),
+                    ("page", "Page number"),
+                    ("cursor", "Cursor"),
+                ],
+                default="none",
+                help_text="If the response type is JSON, how the API splits its list of jobs into pages.",
+                max_length=10,
+            ),
+        ),
+    ]
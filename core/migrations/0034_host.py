@@ -0,0 +1,63 @@
+# Generated by Django 5.2 on 2026-10-18 15:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0033_page_pagination"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Host",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "name",
+                    models.CharField(
+                        help_text="Host name (and port, if any) of the pages on this host.",
+                        max_length=255,
+                        unique=True,
+                    ),
+                ),
+                (
+                    "requests_per_second",
+                    models.FloatField(
+                        default=2.0,
+                        help_text="Maximum sustained number of requests per second the scraper sends to this host.",
+                    ),
+                ),
+                (
+                    "burst",
+                    models.PositiveSmallIntegerField(
+                        default=4,
+                        help_text="Maximum number of requests the scraper may send to this host in a burst.",
+                    ),
+                ),
+                (
+                    "n_requests",
+                    models.PositiveIntegerField(
+                        default=0,
+                        help_text="Number of requests sent to this host by the scraper.",
+                    ),
+                ),
+                (
+                    "n_throttled",
+                    models.PositiveIntegerField(
+                        default=0,
+                        help_text="Number of requests to this host that were throttled (HTTP 429).",
+                    ),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2 on 2026-10-18 16:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0034_host"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="host",
+            name="circuit_opened_at",
+            field=models.DateTimeField(
+                blank=True,
+                help_text="When the scraper last stopped sending requests to this host after repeated failures.",
+                null=True,
+            ),
+        ),
+        migrations.AddField(
+            model_name="host",
+            name="n_failures",
+            field=models.PositiveIntegerField(
+                default=0,
+                help_text="Number of requests to this host that failed after all retries.",
+            ),
+        ),
+        migrations.AddField(
+            model_name="host",
+            name="n_skipped",
+            field=models.PositiveIntegerField(
+                default=0,
+                help_text="Number of requests to this host that were skipped because its circuit breaker was open.",
+            ),
+        ),
+    ]
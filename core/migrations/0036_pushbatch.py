@@ -0,0 +1,48 @@
+# Generated by Django 5.2 on 2026-10-18 16:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0035_host_circuit_breaker"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PushBatch",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("batch_id", models.CharField(max_length=64)),
+                ("time", models.DateTimeField(auto_now_add=True)),
+                ("n_jobs_found", models.IntegerField(default=0)),
+                ("n_errors", models.IntegerField(default=0)),
+                (
+                    "push",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="batches",
+                        to="core.push",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "Push batches",
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("push", "batch_id"), name="unique_push_batch"
+                    )
+                ],
+            },
+        ),
+    ]
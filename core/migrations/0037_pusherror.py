@@ -0,0 +1,122 @@
+# Generated by Django 5.2 on 2026-10-18 16:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_push_errors(apps, schema_editor):
+    """
+    Move the errors stored in the data of each push into PushError rows,
+    and fill in the counters of pushes that only kept their data
+    """
+    Page = apps.get_model("core", "Page")
+    Push = apps.get_model("core", "Push")
+    PushError = apps.get_model("core", "PushError")
+    page_ids = set(Page.objects.values_list("id", flat=True))
+    page_urls = dict(Page.objects.values_list("url", "id"))
+    errors = []
+    for push in Push.objects.exclude(data=None).iterator(chunk_size=100):
+        if not isinstance(push.data, dict):
+            continue
+        push_errors = push.data.get("errors") or []
+        for error in push_errors:
+            page = error.get("page") or {}
+            page_id = page.get("id")
+            if page_id not in page_ids:
+                page_id = page_urls.get(page.get("url"))
+            errors.append(
+                PushError(
+                    push_id=push.id,
+                    page_id=page_id,
+                    url=(page.get("url") or "")[:512],
+                    error=str(error.get("error", "")),
+                )
+            )
+        update_fields = []
+        if not push.n_jobs_found and push.data.get("jobs"):
+            push.n_jobs_found = len(push.data["jobs"])
+            update_fields.append("n_jobs_found")
+        if not push.n_errors and push_errors:
+            push.n_errors = len(push_errors)
+            update_fields.append("n_errors")
+        if update_fields:
+            push.save(update_fields=update_fields)
+        if len(errors) >= 1000:
+            PushError.objects.bulk_create(errors)
+            errors = []
+    PushError.objects.bulk_create(errors)
+
+
+def restore_push_data(apps, schema_editor):
+    """
+    Put the errors of each push back into its data
+    """
+    Push = apps.get_model("core", "Push")
+    PushError = apps.get_model("core", "PushError")
+    data = {}
+    for error in PushError.objects.select_related("page").iterator(chunk_size=1000):
+        page = {"url": error.url}
+        if error.page is not None:
+            page.update(
+                id=error.page.id, name=error.page.name, selector=error.page.selector
+            )
+        data.setdefault(error.push_id, []).append({"page": page, "error": error.error})
+    for push_id, errors in data.items():
+        Push.objects.filter(id=push_id).update(data={"jobs": [], "errors": errors})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0036_pushbatch"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PushError",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "url",
+                    models.URLField(
+                        blank=True,
+                        default="",
+                        help_text="URL of the page, kept in case the page is deleted",
+                        max_length=512,
+                    ),
+                ),
+                ("error", models.TextField()),
+                (
+                    "page",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="scrape_errors",
+                        to="core.page",
+                    ),
+                ),
+                (
+                    "push",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="errors",
+                        to="core.push",
+                    ),
+                ),
+            ],
+        ),
+        migrations.RunPython(backfill_push_errors, restore_push_data),
+        migrations.RemoveField(
+            model_name="push",
+            name="data",
+        ),
+    ]
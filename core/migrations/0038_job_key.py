@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-18 16:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0037_pusherror"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="job",
+            name="key",
+            field=models.CharField(
+                editable=False,
+                help_text="Identifies the job across pushes, see Job.make_key",
+                max_length=40,
+                null=True,
+            ),
+        ),
+    ]
@@ -0,0 +1,77 @@
+# Generated by Django 5.2 on 2026-10-18 16:08
+
+import hashlib
+
+from django.db import migrations
+from django.db.models import Max
+
+
+def make_key(company_id, page_id, job_id, title, url):
+    # Same as Job.make_key, which isn't available on historical models
+    if job_id:
+        identity = f"{company_id}:{page_id}:id:{job_id}"
+    else:
+        identity = f"{company_id}:{page_id}:title:{title}:{url or ''}"
+    return hashlib.sha1(identity.encode("utf-8")).hexdigest()
+
+
+def backfill_job_keys(apps, schema_editor):
+    """
+    Set the key of every job, and merge jobs that have the same key into
+    the one that was seen first, keeping their notifications
+    """
+    Job = apps.get_model("core", "Job")
+    Notification = apps.get_model("core", "Notification")
+    NotificationJob = Notification.jobs.through
+    first_ids = {}
+    duplicates = {}
+    jobs = []
+    for job in (
+        Job.objects.order_by("first_seen", "id")
+        .only("id", "company_id", "page_id", "job_id", "title", "url")
+        .iterator(chunk_size=2000)
+    ):
+        key = make_key(job.company_id, job.page_id, job.job_id, job.title, job.url)
+        if key in first_ids:
+            duplicates[job.id] = first_ids[key]
+            continue
+        first_ids[key] = job.id
+        job.key = key
+        jobs.append(job)
+        if len(jobs) >= 2000:
+            Job.objects.bulk_update(jobs, ["key"])
+            jobs = []
+    Job.objects.bulk_update(jobs, ["key"])
+
+    duplicate_ids = list(duplicates)
+    for i in range(0, len(duplicate_ids), 500):
+        chunk = duplicate_ids[i : i + 500]
+        rows = list(NotificationJob.objects.filter(job_id__in=chunk))
+        NotificationJob.objects.bulk_create(
+            [
+                NotificationJob(notification_id=row.notification_id, job_id=duplicates[row.job_id])
+                for row in rows
+            ],
+            ignore_conflicts=True,
+        )
+        last_seen = (
+            Job.objects.filter(id__in=chunk)
+            .values("id")
+            .annotate(last_seen_max=Max("last_seen"))
+        )
+        for row in last_seen:
+            Job.objects.filter(
+                id=duplicates[row["id"]], last_seen__lt=row["last_seen_max"]
+            ).update(last_seen=row["last_seen_max"])
+        Job.objects.filter(id__in=chunk).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0038_job_key"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_job_keys, migrations.RunPython.noop),
+    ]
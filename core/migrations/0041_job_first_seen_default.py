@@ -0,0 +1,19 @@
+# Generated by Django 5.2 on 2026-10-18 16:11
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0040_job_key_unique"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="job",
+            name="first_seen",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
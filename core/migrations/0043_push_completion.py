@@ -0,0 +1,70 @@
+# Generated by Django 5.2 on 2026-10-18 16:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import F
+
+
+def mark_pushes_notified(apps, schema_editor):
+    # Users were already notified about the jobs of existing pushes
+    Push = apps.get_model("core", "Push")
+    Push.objects.update(notified_at=F("time"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0042_task"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="push",
+            name="n_chunks",
+            field=models.PositiveIntegerField(
+                default=0,
+                help_text="Number of SQS messages the pages were split into, or 0 if not known",
+            ),
+        ),
+        migrations.AddField(
+            model_name="push",
+            name="notified_at",
+            field=models.DateTimeField(
+                blank=True,
+                help_text="When users were notified about the new jobs found in this push",
+                null=True,
+            ),
+        ),
+        migrations.CreateModel(
+            name="PushChunk",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("index", models.PositiveIntegerField()),
+                ("time", models.DateTimeField(auto_now_add=True)),
+                (
+                    "push",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="chunks",
+                        to="core.push",
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("push", "index"), name="unique_push_chunk"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(mark_pushes_notified, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2 on 2026-10-18 16:28
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0044_outboundemail"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="notification",
+            name="pending",
+            field=models.BooleanField(
+                default=False,
+                help_text="The notification is waiting to be emailed in a digest",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="notification",
+            index=models.Index(
+                condition=models.Q(("pending", True)),
+                fields=["user", "date"],
+                name="notification_pending",
+            ),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2 on 2026-10-18 16:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0045_notification_pending"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="watchlist",
+            name="exclude_keywords",
+            field=models.CharField(
+                blank=True,
+                default="",
+                help_text="Comma-separated keywords. Jobs whose title contains one of these words or phrases are not notified.",
+                max_length=512,
+            ),
+        ),
+        migrations.AddField(
+            model_name="watchlist",
+            name="include_keywords",
+            field=models.CharField(
+                blank=True,
+                default="",
+                help_text="Comma-separated keywords. If set, only jobs whose title contains one of these words or phrases are notified.",
+                max_length=512,
+            ),
+        ),
+        migrations.AddField(
+            model_name="watchlist",
+            name="levels",
+            field=models.CharField(
+                blank=True,
+                default="",
+                help_text="Comma-separated job levels (e.g. entry,junior). If set, only jobs on pages with one of these levels are notified.",
+                max_length=128,
+            ),
+        ),
+        migrations.AddField(
+            model_name="watchlist",
+            name="locations",
+            field=models.CharField(
+                blank=True,
+                default="",
+                help_text='Comma-separated locations. If set, only jobs on pages whose location contains one of these are notified. "Remote" also matches remote pages.',
+                max_length=256,
+            ),
+        ),
+    ]
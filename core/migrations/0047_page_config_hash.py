@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-18 16:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0046_watchlist_filters"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="page",
+            name="config_hash",
+            field=models.CharField(
+                blank=True,
+                default="",
+                help_text="Hash of the scrape settings of this page when the validators above were saved. The validators are ignored once the settings change.",
+                max_length=64,
+            ),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2 on 2026-10-18 16:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0047_page_config_hash"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="page",
+            name="fingerprint_changed_at",
+            field=models.DateTimeField(
+                blank=True,
+                help_text="When the set of jobs found on this page last changed. Jobs last seen before this are no longer on the page.",
+                null=True,
+            ),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2 on 2026-10-18 16:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_first_push(apps, schema_editor):
+    """
+    Jobs that were not seen again after the push they were found in
+    still have that push, which is the best guess for the others too
+    """
+    Job = apps.get_model("core", "Job")
+    Job.objects.filter(push__isnull=False).update(first_push=F("push"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0048_page_fingerprint_changed_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="job",
+            name="first_push",
+            field=models.ForeignKey(
+                blank=True,
+                help_text="The push the job was first found in",
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="new_jobs",
+                to="core.push",
+            ),
+        ),
+        migrations.RunPython(backfill_first_push, migrations.RunPython.noop),
+    ]
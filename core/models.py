@@ -1,4 +1,8 @@
+from django.core.exceptions import ValidationError
 from django.db import models
+from django.utils import timezone
+import hashlib
+from urllib.parse import urlparse
 
 
 class Company(models.Model):
@@ -20,45 +24,115 @@ class Job(models.Model):
     title = models.CharField(max_length=200)
     url = models.URLField(blank=True, null=True, help_text='URL of the job posting, if available')
     push = models.ForeignKey('Push', on_delete=models.SET_NULL, related_name='jobs', null=True)
+    first_push = models.ForeignKey('Push', on_delete=models.SET_NULL, related_name='new_jobs', null=True, blank=True, help_text='The push the job was first found in')
     company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name='jobs')
     page = models.ForeignKey('Page', on_delete=models.CASCADE, related_name='jobs')
-    first_seen = models.DateTimeField(auto_now_add=True)
+    first_seen = models.DateTimeField(default=timezone.now)
     last_seen = models.DateTimeField(auto_now=True)
     job_id = models.CharField(max_length=20, null=True, blank=True, help_text='Job ID extracted from the posting, if available')
+    key = models.CharField(max_length=40, unique=True, editable=False, help_text='Identifies the job across pushes, see Job.make_key')
 
     def __str__(self):
         return f'{self.title} at {self.company.name}'
 
+    @staticmethod
+    def make_key(company_id, page_id, job_id=None, title='', url=None) -> str:
+        """
+        Get the identity key of a job, a hash of its company, its page, and its
+        job ID if it has one, or its title and URL otherwise
+        """
+        if job_id:
+            identity = f'{company_id}:{page_id}:id:{job_id}'
+        else:
+            identity = f'{company_id}:{page_id}:title:{title}:{url or ""}'
+        return hashlib.sha1(identity.encode('utf-8')).hexdigest()
+
 
 class Notification(models.Model):
     """A notification for a user about a watchlist change"""
     class Meta:
         ordering = ['-date']
+        indexes = [
+            models.Index(fields=['user', 'date'], condition=models.Q(pending=True), name='notification_pending'),
+        ]
 
     user = models.ForeignKey("users.User", on_delete=models.CASCADE, related_name='notifications')
     date = models.DateTimeField(auto_now_add=True)
     jobs = models.ManyToManyField(Job, related_name='notifications', blank=True)
     n_new_jobs = models.IntegerField(default=0)
+    pending = models.BooleanField(default=False, help_text='The notification is waiting to be emailed in a digest')
 
     def __str__(self):
         return f'Found {self.n_new_jobs} new jobs on {self.date.strftime("%d %b, %Y, %I:%M:%S %p")}'
 
 
 class Push(models.Model):
-    """A push from the Lambda function about changed pages"""
+    """
+    A push from the Lambda function about changed pages. New jobs found in the
+    push are linked to it through Job.push, and errors through PushError.
+    Users are notified once, after every chunk of the push is done.
+    """
     class Meta:
         verbose_name_plural = "Pushes"
         ordering = ['-time']
 
     time = models.DateTimeField(auto_now_add=True)
-    data = models.JSONField(null=True, blank=True)
     n_jobs_found = models.IntegerField(default=0)
     n_errors = models.IntegerField(default=0)
+    n_chunks = models.PositiveIntegerField(default=0, help_text='Number of SQS messages the pages were split into, or 0 if not known')
+    notified_at = models.DateTimeField(null=True, blank=True, help_text='When users were notified about the new jobs found in this push')
 
     def __str__(self):
         return f'Push at {self.time.strftime("%d %b, %Y, %I:%M:%S %p")} UTC'
 
 
+class PushBatch(models.Model):
+    """
+    A batch of jobs the scraper sent for a push. Batches are recorded by
+    their ID so that a batch that is delivered again is only processed once.
+    """
+    class Meta:
+        verbose_name_plural = "Push batches"
+        constraints = [
+            models.UniqueConstraint(fields=['push', 'batch_id'], name='unique_push_batch'),
+        ]
+
+    push = models.ForeignKey(Push, on_delete=models.CASCADE, related_name='batches')
+    batch_id = models.CharField(max_length=64)
+    time = models.DateTimeField(auto_now_add=True)
+    n_jobs_found = models.IntegerField(default=0)
+    n_errors = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f'Batch {self.batch_id} of {self.push}'
+
+
+class PushChunk(models.Model):
+    """An SQS message of pages of a push that the scraper finished scraping"""
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['push', 'index'], name='unique_push_chunk'),
+        ]
+
+    push = models.ForeignKey(Push, on_delete=models.CASCADE, related_name='chunks')
+    index = models.PositiveIntegerField()
+    time = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f'Chunk {self.index} of {self.push}'
+
+
+class PushError(models.Model):
+    """An error the scraper ran into while scraping a page for a push"""
+    push = models.ForeignKey(Push, on_delete=models.CASCADE, related_name='errors')
+    page = models.ForeignKey('Page', on_delete=models.SET_NULL, related_name='scrape_errors', null=True, blank=True)
+    url = models.URLField(max_length=512, blank=True, default='', help_text='URL of the page, kept in case the page is deleted')
+    error = models.TextField()
+
+    def __str__(self):
+        return f'Error scraping {self.url}'
+
+
 class Page(models.Model):
     """A page on a company website that will be watched"""
     JOB_LEVELS = [
@@ -74,6 +148,18 @@ class Page(models.Model):
         ('html', 'HTML'),
         ('json', 'JSON'),
     ]
+    PAGINATION_TYPES = [
+        ('none', 'No pagination'),
+        ('offset', 'Offset and limit'),
+        ('page', 'Page number'),
+        ('cursor', 'Cursor'),
+    ]
+    PARSERS = [
+        ('auto', 'Automatic'),
+        ('lexbor', 'selectolax (lexbor)'),
+        ('lxml', 'lxml'),
+        ('html.parser', 'html.parser'),
+    ]
     name = models.CharField(max_length=50)
     api_url = models.URLField(blank=True, null=True, help_text='If the response type is JSON, this is the URL to the API endpoint that returns the list of jobs. If the response type is HTML, this field is not used.')
     url = models.URLField(max_length=512)
@@ -86,15 +172,61 @@ class Page(models.Model):
     response_type = models.CharField(max_length=10, choices=RESPONSE_TYPES, default='html', blank=True)
     request_method = models.CharField(max_length=10, choices=[('GET', 'GET'), ('POST', 'POST'), ('PUT', 'PUT')], default='GET', blank=True)
     request_payload = models.JSONField(blank=True, null=True, default=dict, help_text='If the request method is POST or PUT, this is the payload that will be sent with the request.')
+    parser = models.CharField(max_length=16, choices=PARSERS, default='auto', blank=True, help_text='If the response type is HTML, this is the parser used to parse the page. Automatic uses the fastest parser installed on the scraper.')
     selector = models.CharField(max_length=128, help_text='If the response type is HTML, this is the CSS selector that selects all the job titles. If the response type is JSON, this is a comma-separated list of keys that would return the list of job titles from the JSON response.', blank=True, default="")
+    stream_response = models.BooleanField(default=False, blank=True, help_text='If the response type is JSON, parse the response incrementally while it is downloaded instead of loading it in memory all at once. Use this for very large API responses. Only works if the selector is a list of object keys.')
     title_key = models.CharField(max_length=32, help_text='If the response type is JSON, this is a comma-separated list of keys that would give the job title in a Job object in the JSON response.', blank=True, null=True)
     job_id_key = models.CharField(max_length=32, help_text='If the response type is JSON, this is a comma-separated list of keys that would give the job ID in a Job object in the JSON response.', blank=True, null=True)
     job_url_key = models.CharField(max_length=64, help_text='If the response type is JSON, this is a comma-separated list of keys that would give the job URL in a Job object in the JSON response.', blank=True, null=True)
     job_url_prefix = models.CharField(max_length=256, help_text='If the response type is JSON and the job URL extracted from the job object is a relative URL, this prefix will be added to the job URL to make it absolute.', blank=True, null=True)
 
+    pagination_type = models.CharField(max_length=10, choices=PAGINATION_TYPES, default='none', blank=True, help_text='If the response type is JSON, how the API splits its list of jobs into pages.')
+    pagination_param = models.CharField(max_length=64, blank=True, default='', help_text='Name of the request parameter that holds the offset, page number or cursor. For GET requests this is a query parameter, for POST and PUT requests a comma-separated list of keys in the request payload.')
+    pagination_limit_param = models.CharField(max_length=64, blank=True, default='', help_text='Name of the request parameter that holds the number of jobs per page, if the API has one.')
+    pagination_page_size = models.PositiveIntegerField(default=0, blank=True, help_text='Number of jobs per page. If 0, the value of the limit parameter or the number of jobs on the first page is used.')
+    pagination_start = models.PositiveIntegerField(default=0, blank=True, help_text='Offset or page number of the first page.')
+    pagination_total_key = models.CharField(max_length=64, blank=True, default='', help_text='Comma-separated list of keys that would give the total number of jobs from the JSON response. If set, the remaining pages are fetched in parallel.')
+    pagination_cursor_key = models.CharField(max_length=128, blank=True, default='', help_text='If the pagination type is cursor, a comma-separated list of keys that would give the cursor of the next page from the JSON response.')
+    pagination_max_pages = models.PositiveSmallIntegerField(default=50, blank=True, help_text='Maximum number of pages to fetch.')
+
+    # Cache validators of the last response, sent back by the scraper
+    etag = models.CharField(max_length=256, blank=True, default='', help_text='ETag header of the last response received for this page.')
+    last_modified = models.CharField(max_length=64, blank=True, default='', help_text='Last-Modified header of the last response received for this page.')
+    content_hash = models.CharField(max_length=64, blank=True, default='', help_text='SHA-256 hash of the body of the last response received for this page.')
+    job_fingerprint = models.CharField(max_length=64, blank=True, default='', help_text='Hash of the set of jobs found on this page when it was last scraped.')
+    fingerprint_changed_at = models.DateTimeField(null=True, blank=True, help_text='When the set of jobs found on this page last changed. Jobs last seen before this are no longer on the page.')
+    config_hash = models.CharField(max_length=64, blank=True, default='', help_text='Hash of the scrape settings of this page when the validators above were saved. The validators are ignored once the settings change.')
+
     def __str__(self):
         return self.name
 
+    @property
+    def host(self):
+        """The host the scraper sends requests to when scraping this page"""
+        return urlparse(self.api_url or self.url).netloc.lower()
+
+
+class Host(models.Model):
+    """A host that the scraper sends requests to, and how fast it may do so"""
+    name = models.CharField(max_length=255, unique=True, help_text='Host name (and port, if any) of the pages on this host.')
+    requests_per_second = models.FloatField(default=2.0, help_text='Maximum sustained number of requests per second the scraper sends to this host.')
+    burst = models.PositiveSmallIntegerField(default=4, help_text='Maximum number of requests the scraper may send to this host in a burst.')
+    n_requests = models.PositiveIntegerField(default=0, help_text='Number of requests sent to this host by the scraper.')
+    n_throttled = models.PositiveIntegerField(default=0, help_text='Number of requests to this host that were throttled (HTTP 429).')
+    n_failures = models.PositiveIntegerField(default=0, help_text='Number of requests to this host that failed after all retries.')
+    n_skipped = models.PositiveIntegerField(default=0, help_text='Number of requests to this host that were skipped because its circuit breaker was open.')
+    circuit_opened_at = models.DateTimeField(null=True, blank=True, help_text='When the scraper last stopped sending requests to this host after repeated failures.')
+
+    def __str__(self):
+        return self.name
+
+    @property
+    def throttle_rate(self):
+        """The fraction of requests to this host that were throttled"""
+        if not self.n_requests:
+            return 0
+        return self.n_throttled / self.n_requests
+
 
 class Watchlist(models.Model):
     """A list of pages to watch for a user"""
@@ -104,5 +236,103 @@ class Watchlist(models.Model):
     owner = models.ForeignKey("users.User", on_delete=models.CASCADE, related_name='created_watchlists')
     subscribers = models.ManyToManyField("users.User", related_name='watchlists', blank=True)
 
+    # Optional filters on the jobs subscribers are notified about, see core/matching.py
+    include_keywords = models.CharField(max_length=512, blank=True, default='', help_text='Comma-separated keywords. If set, only jobs whose title contains one of these words or phrases are notified.')
+    exclude_keywords = models.CharField(max_length=512, blank=True, default='', help_text='Comma-separated keywords. Jobs whose title contains one of these words or phrases are not notified.')
+    levels = models.CharField(max_length=128, blank=True, default='', help_text='Comma-separated job levels (e.g. entry,junior). If set, only jobs on pages with one of these levels are notified.')
+    locations = models.CharField(max_length=256, blank=True, default='', help_text='Comma-separated locations. If set, only jobs on pages whose location contains one of these are notified. "Remote" also matches remote pages.')
+
     def __str__(self):
         return f'Watchlist {self.name} by {self.owner.username}'
+
+    def clean(self):
+        levels = {value.strip() for value in self.levels.split(',') if value.strip()}
+        unknown = levels - {level for level, _ in Page.JOB_LEVELS}
+        if unknown:
+            raise ValidationError({'levels': f'Unknown job levels: {", ".join(sorted(unknown))}. Use any of {", ".join(level for level, _ in Page.JOB_LEVELS)}.'})
+
+    def accepts_page(self, level: str, location: str | None, is_remote: bool | None) -> bool:
+        """
+        Check whether jobs on a page with the given level and location
+        pass the level and location filters of this watchlist
+        """
+        levels = {value.strip() for value in self.levels.split(',') if value.strip()}
+        if levels and level not in levels:
+            return False
+        wanted_locations = [value.strip().lower() for value in self.locations.split(',') if value.strip()]
+        if not wanted_locations:
+            return True
+        return any(
+            (wanted == 'remote' and is_remote) or wanted in (location or '').lower()
+            for wanted in wanted_locations
+        )
+
+
+class Task(models.Model):
+    """
+    A unit of background work, such as processing a batch of a push. Tasks
+    are run by the `run_worker` management command, see core/queue.py.
+    """
+    STATUSES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    class Meta:
+        ordering = ['run_at', 'id']
+        indexes = [
+            models.Index(fields=['status', 'run_at'], name='task_status_run_at'),
+        ]
+
+    name = models.CharField(max_length=100, help_text='Name of the task function, see core/tasks.py')
+    kwargs = models.JSONField(default=dict, blank=True, help_text='Keyword arguments the task function is called with')
+    status = models.CharField(max_length=10, choices=STATUSES, default='queued')
+    attempts = models.PositiveSmallIntegerField(default=0, help_text='Number of times the task was started')
+    max_attempts = models.PositiveSmallIntegerField(default=3, help_text='Number of times the task is tried before it is marked as failed')
+    created = models.DateTimeField(auto_now_add=True)
+    run_at = models.DateTimeField(default=timezone.now, help_text='The task is not started before this time')
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    error = models.TextField(blank=True, default='', help_text='Error raised by the last attempt, if it failed')
+
+    def __str__(self):
+        return f'{self.name} ({self.status})'
+
+
+class OutboundEmail(models.Model):
+    """
+    An email waiting to be sent, or that was sent. Emails are sent in batches
+    by the `send_queued_emails` task, see core/outbox.py.
+    """
+    STATUSES = [
+        ('queued', 'Queued'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+
+    class Meta:
+        ordering = ['send_after', 'id']
+        indexes = [
+            models.Index(fields=['status', 'send_after'], name='email_status_send_after'),
+        ]
+
+    notification = models.ForeignKey(Notification, on_delete=models.SET_NULL, null=True, blank=True, related_name='emails')
+    to_email = models.EmailField()
+    from_email = models.CharField(max_length=200)
+    subject = models.CharField(max_length=200)
+    body = models.TextField()
+    html_body = models.TextField(blank=True, default='')
+    status = models.CharField(max_length=10, choices=STATUSES, default='queued')
+    attempts = models.PositiveSmallIntegerField(default=0, help_text='Number of times sending the email was tried')
+    max_attempts = models.PositiveSmallIntegerField(default=5, help_text='Number of times sending is tried before the email is marked as failed')
+    created = models.DateTimeField(auto_now_add=True)
+    send_after = models.DateTimeField(default=timezone.now, help_text='The email is not sent before this time')
+    started_at = models.DateTimeField(null=True, blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    error = models.TextField(blank=True, default='', help_text='Error raised by the last attempt, if it failed')
+
+    def __str__(self):
+        return f'{self.subject} to {self.to_email} ({self.status})'
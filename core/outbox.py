@@ -0,0 +1,149 @@
+"""
+An outbox of emails waiting to be sent. Emails are saved as OutboundEmail rows
+in the same transaction as the notifications they are about, and are sent
+later by the `send_queued_emails` task, so that processing a push never waits
+on the email backend.
+
+The task sends emails in batches of HAWK_EMAIL_BATCH_SIZE, split between
+HAWK_EMAIL_THREADS threads that each open a single connection to the email
+backend and send all of their emails over it. Emails that could not be sent
+are retried with exponential backoff, up to OutboundEmail.max_attempts times.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+import logging
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.db.models import F, Min, Q
+from django.utils import timezone
+
+from core.models import OutboundEmail, Task
+from core.queue import task
+
+logger = logging.getLogger('django')
+
+# Emails that have been sending for longer than this are assumed to
+# belong to a worker that died, and are sent again
+SENDING_TIMEOUT = timedelta(minutes=15)
+# Delay before the first retry of an email, doubled for every retry after it
+RETRY_DELAY = timedelta(minutes=1)
+
+
+def queue_emails(emails: list[OutboundEmail]) -> None:
+    """
+    Save emails to the outbox and queue a task to send them. If called inside
+    a transaction, the emails are only sent if the transaction commits.
+    """
+    if not emails:
+        return
+    OutboundEmail.objects.bulk_create(emails)
+    send_queued_emails.enqueue()
+
+
+def claim_emails(limit: int) -> list[OutboundEmail]:
+    """
+    Mark up to `limit` emails that are due as sending and return them. An
+    email is only claimed by one worker, even if several workers send at once.
+    """
+    now = timezone.now()
+    due = Q(status='queued', send_after__lte=now) | Q(status='sending', started_at__lt=now - SENDING_TIMEOUT)
+    claimed_ids = []
+    with transaction.atomic():
+        for email_id in OutboundEmail.objects.filter(due).values_list('id', flat=True)[:limit]:
+            claimed = OutboundEmail.objects.filter(due, id=email_id).update(
+                status='sending',
+                started_at=now,
+                attempts=F('attempts') + 1,
+            )
+            if claimed:
+                claimed_ids.append(email_id)
+    return list(OutboundEmail.objects.filter(id__in=claimed_ids))
+
+
+def _send_over_connection(emails: list[OutboundEmail]) -> list[str]:
+    """
+    Send emails over a single connection to the email backend, reconnecting
+    after an email fails. Returns the error of each email, or '' if it was sent.
+    """
+    connection = get_connection()
+    errors = []
+    connected = False
+    try:
+        for email in emails:
+            message = EmailMultiAlternatives(
+                subject=email.subject,
+                body=email.body,
+                from_email=email.from_email,
+                to=[email.to_email],
+                connection=connection,
+            )
+            if email.html_body:
+                message.attach_alternative(email.html_body, 'text/html')
+            try:
+                if not connected:
+                    # send_messages closes connections it opened itself, so the
+                    # connection is opened here to reuse it for every email
+                    connection.open()
+                    connected = True
+                connection.send_messages([message])
+            except Exception as e:
+                errors.append(repr(e))
+                # The connection may be broken, start a new one for the next email
+                connection.close()
+                connected = False
+                continue
+            errors.append('')
+    finally:
+        connection.close()
+    return errors
+
+
+def deliver(emails: list[OutboundEmail], threads: int) -> list[str]:
+    """
+    Send emails concurrently over `threads` connections, without updating
+    them. Returns the error of each email, or '' if it was sent.
+    """
+    threads = max(1, min(threads, len(emails)))
+    groups = [emails[i::threads] for i in range(threads)]
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        group_errors = list(executor.map(_send_over_connection, groups))
+    errors = [''] * len(emails)
+    for i, group in enumerate(group_errors):
+        errors[i::threads] = group
+    return errors
+
+
+@task(atomic=False)
+def send_queued_emails() -> None:
+    """
+    Send every email in the outbox that is due, a batch at a time, and queue
+    this task again for when the next email that failed is due to be retried
+    """
+    n_sent = n_failed = 0
+    while emails := claim_emails(settings.HAWK_EMAIL_BATCH_SIZE):
+        errors = deliver(emails, settings.HAWK_EMAIL_THREADS)
+        now = timezone.now()
+        for email, error in zip(emails, errors):
+            email.error = error
+            if not error:
+                email.status = 'sent'
+                email.sent_at = now
+                n_sent += 1
+            elif email.attempts >= email.max_attempts:
+                logger.error(f'Could not send email {email.id} to {email.to_email}: {error}')
+                email.status = 'failed'
+                n_failed += 1
+            else:
+                email.status = 'queued'
+                email.send_after = now + RETRY_DELAY * 2 ** (email.attempts - 1)
+                n_failed += 1
+        OutboundEmail.objects.bulk_update(emails, ['status', 'sent_at', 'send_after', 'error'])
+    if n_sent or n_failed:
+        logger.info(f'Sent {n_sent} emails, {n_failed} emails failed')
+
+    next_retry = OutboundEmail.objects.filter(status='queued').aggregate(Min('send_after'))['send_after__min']
+    already_queued = Task.objects.filter(name=send_queued_emails.task_name, status='queued').exists()
+    if next_retry is not None and not already_queued:
+        send_queued_emails.enqueue(run_at=next_retry)
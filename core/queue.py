@@ -0,0 +1,227 @@
+"""
+A durable background task queue stored in the database, so that slow work
+(creating jobs, rendering and sending emails) runs outside of the request that
+triggered it without needing any external service.
+
+Functions decorated with @task can be enqueued with `func.enqueue(**kwargs)`.
+Every task is saved as a Task row, and the `run_worker` management command runs
+queued tasks, retrying failed tasks with exponential backoff. How workers learn
+about new tasks depends on the backend set by HAWK_TASK_BACKEND:
+
+- database: workers poll the Task table
+- sqs: the ID of every new task is also sent to the SQS queue HAWK_TASK_QUEUE_URL,
+  which workers long-poll instead, picking up tasks as soon as they are queued
+- immediate: tasks run in the process that enqueued them, as soon as the current
+  transaction commits, which is convenient when developing without a worker
+"""
+from contextlib import nullcontext
+from datetime import timedelta
+import json
+import logging
+import time
+import traceback
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from core.models import Task
+
+logger = logging.getLogger('django')
+
+# Task functions by name
+TASKS = {}
+
+# Tasks that have been running for longer than this are assumed to
+# belong to a worker that died, and are started again
+TASK_TIMEOUT = timedelta(minutes=15)
+# Delay before the first retry of a failed task, doubled for every retry after it
+RETRY_DELAY = timedelta(seconds=30)
+
+
+def task(func=None, *, name: str | None = None, max_attempts: int = 3, atomic: bool = True):
+    """
+    Register a function as a task that can be run in the background with
+    `func.enqueue(**kwargs)`, or later with `func.enqueue(run_at=..., **kwargs)`.
+    Arguments must be JSON serializable.
+
+    Tasks run in a transaction unless `atomic` is False, which suits tasks
+    that wait on other services and commit their own progress as they go.
+    """
+    def decorator(func):
+        task_name = name or f'{func.__module__}.{func.__name__}'
+        TASKS[task_name] = func
+
+        def enqueue(run_at=None, **kwargs) -> Task:
+            return enqueue_task(task_name, kwargs, max_attempts=max_attempts, run_at=run_at)
+
+        func.task_name = task_name
+        func.atomic = atomic
+        func.enqueue = enqueue
+        return func
+
+    if func is not None:
+        return decorator(func)
+    return decorator
+
+
+def enqueue_task(name: str, kwargs: dict, max_attempts: int = 3, run_at=None) -> Task:
+    """
+    Save a task to be run by a worker. If called inside a transaction, the task
+    is only queued if the transaction commits.
+    """
+    new_task = Task.objects.create(name=name, kwargs=kwargs, max_attempts=max_attempts, run_at=run_at or timezone.now())
+    get_backend().notify(new_task)
+    return new_task
+
+
+def claim_task() -> Task | None:
+    """
+    Mark the next task that is due as running and return it, or return None if
+    no task is due. A task is only claimed by one worker, even if several
+    workers look for tasks at the same time.
+    """
+    now = timezone.now()
+    due = Q(status='queued', run_at__lte=now) | Q(status='running', started_at__lt=now - TASK_TIMEOUT)
+    for task_id in Task.objects.filter(due).values_list('id', flat=True)[:10]:
+        claimed = Task.objects.filter(due, id=task_id).update(
+            status='running',
+            started_at=now,
+            attempts=F('attempts') + 1,
+        )
+        if claimed:
+            return Task.objects.get(id=task_id)
+    return None
+
+
+def claim_task_by_id(task_id: int) -> Task | None:
+    """
+    Mark the given task as running and return it, unless another worker claimed it first
+    """
+    claimed = Task.objects.filter(id=task_id, status='queued').update(
+        status='running',
+        started_at=timezone.now(),
+        attempts=F('attempts') + 1,
+    )
+    return Task.objects.get(id=task_id) if claimed else None
+
+
+def run_task(claimed_task: Task) -> bool:
+    """
+    Run a claimed task, and mark it as done, or queue it to be retried
+    later if it failed. Returns True if the task succeeded.
+    """
+    func = TASKS.get(claimed_task.name)
+    try:
+        if func is None:
+            raise LookupError(f'Unknown task {claimed_task.name}')
+        # The task is marked as done in the same transaction as its work, so
+        # tasks it queues never see it running once they start
+        with transaction.atomic() if func.atomic else nullcontext():
+            func(**claimed_task.kwargs)
+            claimed_task.status = 'done'
+            claimed_task.finished_at = timezone.now()
+            claimed_task.error = ''
+            claimed_task.save(update_fields=['status', 'finished_at', 'error'])
+    except Exception as e:
+        logger.exception(f'Task {claimed_task.id} ({claimed_task.name}) failed on attempt {claimed_task.attempts}: {e!r}')
+        claimed_task.error = traceback.format_exc()
+        claimed_task.finished_at = timezone.now()
+        if claimed_task.attempts >= claimed_task.max_attempts:
+            claimed_task.status = 'failed'
+        else:
+            claimed_task.status = 'queued'
+            claimed_task.run_at = timezone.now() + RETRY_DELAY * 2 ** (claimed_task.attempts - 1)
+        claimed_task.save(update_fields=['status', 'run_at', 'finished_at', 'error'])
+        return False
+    return True
+
+
+def delete_finished_tasks(older_than: timedelta) -> int:
+    """
+    Delete tasks that finished successfully more than `older_than`
+    ago, and return the number of deleted tasks
+    """
+    deleted, _ = Task.objects.filter(status='done', finished_at__lt=timezone.now() - older_than).delete()
+    return deleted
+
+
+class DatabaseBackend:
+    """Workers find new tasks by polling the Task table"""
+    def notify(self, new_task: Task) -> None:
+        pass
+
+    def wait(self, timeout: float) -> None:
+        time.sleep(timeout)
+
+
+class ImmediateBackend:
+    """
+    Tasks are run by the process that queued them, once the transaction
+    commits. Tasks scheduled to run later are left for a worker.
+    """
+    def notify(self, new_task: Task) -> None:
+        if new_task.run_at > timezone.now():
+            return
+
+        def run():
+            claimed = claim_task_by_id(new_task.id)
+            if claimed is not None:
+                run_task(claimed)
+        transaction.on_commit(run)
+
+    def wait(self, timeout: float) -> None:
+        time.sleep(timeout)
+
+
+class SQSBackend:
+    """
+    The ID of every new task is sent to an SQS queue, which workers long-poll
+    to pick up new tasks right away. The Task table is still the source of
+    truth, so a lost or repeated message only delays or wakes up a worker.
+    """
+    def __init__(self, queue_url: str):
+        import boto3
+        self.queue_url = queue_url
+        self.sqs = boto3.client('sqs', region_name=settings.HAWK_TASK_QUEUE_REGION)
+
+    def notify(self, new_task: Task) -> None:
+        transaction.on_commit(lambda: self.sqs.send_message(
+            QueueUrl=self.queue_url,
+            MessageBody=json.dumps({'task_id': new_task.id}),
+        ))
+
+    def wait(self, timeout: float) -> None:
+        response = self.sqs.receive_message(
+            QueueUrl=self.queue_url,
+            MaxNumberOfMessages=10,
+            WaitTimeSeconds=max(1, min(20, int(timeout))),
+        )
+        messages = response.get('Messages', [])
+        if messages:
+            self.sqs.delete_message_batch(
+                QueueUrl=self.queue_url,
+                Entries=[{'Id': str(i), 'ReceiptHandle': message['ReceiptHandle']} for i, message in enumerate(messages)],
+            )
+
+
+_backend = None
+
+
+def get_backend():
+    """
+    Get the task queue backend set by the HAWK_TASK_BACKEND setting
+    """
+    global _backend
+    if _backend is None:
+        name = settings.HAWK_TASK_BACKEND
+        if name == 'immediate':
+            _backend = ImmediateBackend()
+        elif name == 'sqs':
+            _backend = SQSBackend(settings.HAWK_TASK_QUEUE_URL)
+        elif name == 'database':
+            _backend = DatabaseBackend()
+        else:
+            raise ValueError(f'Unknown task backend {name}')
+    return _backend
@@ -0,0 +1,50 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from core.models import Page, Watchlist
+from core.utils import invalidate_subscriber_index
+from users.models import User
+
+
+@receiver(m2m_changed, sender=Watchlist.pages.through)
+@receiver(m2m_changed, sender=Watchlist.subscribers.through)
+def watchlist_changed(sender, action, **kwargs):
+    """
+    Rebuild the page to subscribers index when pages are added to or removed
+    from a watchlist, or users subscribe to or unsubscribe from a watchlist
+    """
+    if action in ['post_add', 'post_remove', 'post_clear']:
+        invalidate_subscriber_index()
+
+
+@receiver(post_delete, sender=Watchlist)
+@receiver(post_delete, sender=Page)
+@receiver(post_delete, sender=User)
+def subscription_deleted(sender, **kwargs):
+    """
+    Rebuild the page to subscribers index when a watchlist, page or user is
+    deleted, which removes their subscriptions without an m2m_changed signal
+    """
+    invalidate_subscriber_index()
+
+
+@receiver(post_save, sender=Watchlist)
+def watchlist_saved(sender, created, **kwargs):
+    """
+    Rebuild the page to subscribers index and the watchlist matcher
+    when the filters of a watchlist may have changed
+    """
+    if not created:
+        invalidate_subscriber_index()
+
+
+@receiver(post_save, sender=Page)
+def page_saved(sender, created, update_fields=None, **kwargs):
+    """
+    Rebuild the page to subscribers index when the level or location of a page
+    may have changed, which decides which watchlist filters it passes
+    """
+    if created:
+        return
+    if update_fields is None or {'level', 'location', 'is_remote'} & set(update_fields):
+        invalidate_subscriber_index()
@@ -0,0 +1,139 @@
+"""
+Background tasks, run by the `run_worker` management command
+"""
+from datetime import timedelta
+import logging
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from core.models import Job, Push, PushChunk, Task
+from core.queue import task
+from core.utils import build_digests, get_due_digest_users, notify_new_jobs, update_hosts, update_pages, upsert_jobs
+
+logger = logging.getLogger('django')
+
+# Seconds to wait before checking again whether every batch of a push is processed
+NOTIFY_RETRY_DELAY = timedelta(seconds=30)
+
+
+@task
+def process_push_batch(push_id: int, jobs: list[dict], pages: list[dict], hosts: dict, chunks: list[int] | None = None, final: bool = False) -> None:
+    """
+    Save the page validators and host stats reported in a batch of a push and
+    create the jobs that are new. Users are notified about the new jobs once
+    the push is complete, which is when the last batch of every chunk of the
+    push has been received, or when the last batch of a push with an unknown
+    number of chunks has been received.
+    """
+    # Jobs on pages that haven't changed since the last push are already known
+    unchanged, n_unchanged_jobs = update_pages(pages)
+    update_hosts(hosts)
+    if n_unchanged_jobs:
+        # Count the jobs on unchanged pages too, so the number of jobs found
+        # in a push doesn't depend on how many pages changed since the last one
+        Push.objects.filter(id=push_id).update(n_jobs_found=F('n_jobs_found') + n_unchanged_jobs)
+    jobs = [job for job in jobs if job['page']['id'] not in unchanged]
+    new_jobs = upsert_jobs(jobs, push_id)
+    logger.info(f"Found {len(new_jobs)} new jobs in {len(jobs)} jobs of push {push_id}")
+    if not final:
+        return
+    PushChunk.objects.bulk_create(
+        [PushChunk(push_id=push_id, index=index) for index in chunks or []],
+        ignore_conflicts=True,
+    )
+    push = Push.objects.get(id=push_id)
+    if push.n_chunks and push.chunks.count() < push.n_chunks:
+        return
+    logger.info(f"Every chunk of push {push_id} is done")
+    notify_push.enqueue(push_id=push_id)
+
+
+@task
+def notify_push(push_id: int) -> None:
+    """
+    Notify users about every new job found in a push, once every
+    batch of the push that was received has been processed
+    """
+    pending = Task.objects.filter(
+        name=process_push_batch.task_name,
+        status__in=['queued', 'running'],
+        kwargs__push_id=push_id,
+    )
+    if pending.exists():
+        notify_push.enqueue(push_id=push_id, run_at=timezone.now() + NOTIFY_RETRY_DELAY)
+        return
+    now = timezone.now()
+    if not Push.objects.filter(id=push_id, notified_at=None).update(notified_at=now):
+        # Users were already notified about this push
+        return
+    new_jobs = list(Job.objects.filter(first_push_id=push_id))
+    logger.info(f"Notifying users about {len(new_jobs)} new jobs found in push {push_id}")
+    notify_new_jobs(new_jobs)
+
+
+def enqueue_overdue_notifications() -> int:
+    """
+    Queue notifications for pushes that were not completed by their deadline,
+    such as when a chunk of pages was never scraped. Returns the number of
+    pushes notifications were queued for.
+    """
+    deadline = timezone.now() - timedelta(minutes=settings.HAWK_PUSH_DEADLINE_MINUTES)
+    queued = set(Task.objects.filter(
+        name=notify_push.task_name,
+        status__in=['queued', 'running'],
+    ).values_list('kwargs__push_id', flat=True))
+    overdue = Push.objects.filter(notified_at=None, time__lt=deadline).exclude(id__in=queued).values_list('id', flat=True)
+    n_overdue = 0
+    for push_id in overdue:
+        logger.warning(f"Push {push_id} was not completed by its deadline, notifying users anyway")
+        notify_push.enqueue(push_id=push_id)
+        n_overdue += 1
+    return n_overdue
+
+
+@task
+def send_digests(user_ids: list[int]) -> None:
+    """
+    Email the given users a digest of the new jobs they were notified about
+    """
+    n_digests = build_digests(user_ids)
+    logger.info(f"Queued {n_digests} digests for {len(user_ids)} users")
+
+
+def enqueue_due_digests() -> int:
+    """
+    Queue digests for the users whose digest is due, unless digests are already
+    being sent. Returns the number of users digests were queued for.
+    """
+    if Task.objects.filter(name=send_digests.task_name, status__in=['queued', 'running']).exists():
+        return 0
+    user_ids = get_due_digest_users()
+    if user_ids:
+        send_digests.enqueue(user_ids=user_ids)
+    return len(user_ids)
+
+
+def enqueue_push_batch(push, data) -> None:
+    """
+    Queue a batch of a push to be processed in the background, keeping only
+    the fields of each job that are needed to create it
+    """
+    jobs = [
+        {
+            'title': job['title'],
+            'company_id': job['company_id'],
+            'page': {'id': job['page']['id']},
+            'job_id': job.get('job_id'),
+            'url': job.get('url'),
+        } for job in data.get('jobs', [])
+    ]
+    process_push_batch.enqueue(
+        push_id=push.id,
+        jobs=jobs,
+        pages=data.get('pages', []),
+        hosts=data.get('hosts', {}),
+        chunks=data.get('chunks', []),
+        final=data.get('final', False),
+    )
@@ -1,3 +1,219 @@
-from django.test import TestCase
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.core.exceptions import ValidationError
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from core import tasks
+from core.matching import AhoCorasick, WatchlistMatcher
+from core.models import Company, Job, Page, Push, Task, Watchlist
+from core.utils import update_pages, upsert_jobs
+
+
+class UpsertJobsTests(TestCase):
+    def setUp(self):
+        self.company = Company.objects.create(name='Acme')
+        self.page = Page.objects.create(name='Careers', company=self.company, url='https://acme.com/careers', selector='a')
+
+    def make_job(self, title, job_id=None):
+        return {
+            'title': title,
+            'company_id': self.company.id,
+            'page': {'id': self.page.id},
+            'job_id': job_id,
+            'url': f'https://acme.com/jobs/{title}',
+        }
+
+    def test_creates_new_jobs(self):
+        push = Push.objects.create()
+        new_jobs = upsert_jobs([self.make_job('Engineer'), self.make_job('Designer', job_id='42')], push.id)
+        self.assertEqual(sorted(job.title for job in new_jobs), ['Designer', 'Engineer'])
+        self.assertEqual(Job.objects.count(), 2)
+        for job in Job.objects.all():
+            self.assertEqual(job.push_id, push.id)
+            self.assertEqual(job.first_push_id, push.id)
+
+    def test_existing_jobs_are_not_new(self):
+        first_push = Push.objects.create()
+        upsert_jobs([self.make_job('Engineer')], first_push.id)
+        week_ago = timezone.now() - timedelta(days=7)
+        Job.objects.update(first_seen=week_ago, last_seen=week_ago)
+
+        push = Push.objects.create()
+        new_jobs = upsert_jobs([self.make_job('Engineer'), self.make_job('Designer')], push.id)
+        self.assertEqual([job.title for job in new_jobs], ['Designer'])
+        self.assertEqual(Job.objects.count(), 2)
+        job = Job.objects.get(title='Engineer')
+        self.assertEqual(job.first_seen, week_ago)
+        self.assertGreater(job.last_seen, week_ago)
+        self.assertEqual(job.push_id, push.id)
+        self.assertEqual(job.first_push_id, first_push.id)
+
+    def test_jobs_are_identified_by_job_id(self):
+        push = Push.objects.create()
+        upsert_jobs([self.make_job('Engineer', job_id='42')], push.id)
+        new_jobs = upsert_jobs([self.make_job('Software Engineer', job_id='42')], Push.objects.create().id)
+        self.assertEqual(new_jobs, [])
+        self.assertEqual(Job.objects.count(), 1)
+
+    def test_duplicate_jobs_in_a_push_are_created_once(self):
+        push = Push.objects.create()
+        new_jobs = upsert_jobs([self.make_job('Engineer'), self.make_job('Engineer')], push.id)
+        self.assertEqual(len(new_jobs), 1)
+        self.assertEqual(Job.objects.count(), 1)
+
+
+class UpdatePagesTests(TestCase):
+    def setUp(self):
+        company = Company.objects.create(name='Acme')
+        self.page = Page.objects.create(name='Careers', company=company, url='https://acme.com/careers', selector='a', job_fingerprint='old')
+        self.month_ago = timezone.now() - timedelta(days=30)
+        push = Push.objects.create()
+        upsert_jobs([{'title': 'Engineer', 'company_id': company.id, 'page': {'id': self.page.id}}], push.id)
+        Job.objects.update(first_seen=self.month_ago, last_seen=self.month_ago)
+
+    def get_last_seen(self):
+        return Job.objects.get(title='Engineer').last_seen
+
+    def test_changed_page(self):
+        self.assertEqual(update_pages([{'id': self.page.id, 'job_fingerprint': 'new', 'etag': '"abc"'}]), (set(), 0))
+        page = Page.objects.get(id=self.page.id)
+        self.assertEqual(page.job_fingerprint, 'new')
+        self.assertEqual(page.etag, '"abc"')
+        self.assertIsNotNone(page.fingerprint_changed_at)
+
+    def test_unchanged_page_marks_its_current_jobs_as_seen(self):
+        Page.objects.filter(id=self.page.id).update(fingerprint_changed_at=self.month_ago)
+        self.assertEqual(update_pages([{'id': self.page.id, 'job_fingerprint': 'old', 'unchanged': True}]), ({self.page.id}, 1))
+        self.assertGreater(self.get_last_seen(), self.month_ago)
+
+    def test_jobs_no_longer_on_an_unchanged_page_are_not_seen(self):
+        Page.objects.filter(id=self.page.id).update(fingerprint_changed_at=self.month_ago + timedelta(days=1))
+        self.assertEqual(update_pages([{'id': self.page.id, 'job_fingerprint': 'old', 'unchanged': True}]), ({self.page.id}, 0))
+        self.assertEqual(self.get_last_seen(), self.month_ago)
+
+    def test_same_fingerprint_is_not_unchanged_unless_flagged(self):
+        Page.objects.filter(id=self.page.id).update(fingerprint_changed_at=self.month_ago)
+        self.assertEqual(update_pages([{'id': self.page.id, 'job_fingerprint': 'old'}]), (set(), 0))
+        self.assertEqual(self.get_last_seen(), self.month_ago)
+
+    def test_failed_page_is_left_alone(self):
+        Page.objects.filter(id=self.page.id).update(fingerprint_changed_at=self.month_ago)
+        pages = [{'id': self.page.id, 'job_fingerprint': 'new', 'etag': '"abc"', 'unchanged': True, 'failed': True}]
+        self.assertEqual(update_pages(pages), (set(), 0))
+        page = Page.objects.get(id=self.page.id)
+        self.assertEqual(page.job_fingerprint, 'old')
+        self.assertEqual(page.etag, '')
+        self.assertEqual(self.get_last_seen(), self.month_ago)
+
+
+class PushCompletionTests(TestCase):
+    def setUp(self):
+        self.company = Company.objects.create(name='Acme')
+        self.page = Page.objects.create(name='Careers', company=self.company, url='https://acme.com/careers', selector='a')
+
+    def make_job(self, title):
+        return {'title': title, 'company_id': self.company.id, 'page': {'id': self.page.id}}
+
+    def get_notify_tasks(self, push):
+        return Task.objects.filter(name=tasks.notify_push.task_name, kwargs__push_id=push.id)
+
+    def test_notifies_once_every_chunk_is_done(self):
+        push = Push.objects.create(n_chunks=2)
+        tasks.process_push_batch(push.id, [self.make_job('Engineer')], [], {})
+        tasks.process_push_batch(push.id, [], [], {}, chunks=[0], final=True)
+        self.assertFalse(self.get_notify_tasks(push).exists())
+        tasks.process_push_batch(push.id, [], [], {}, chunks=[1], final=True)
+        self.assertEqual(self.get_notify_tasks(push).count(), 1)
+
+    @mock.patch('core.tasks.notify_new_jobs')
+    def test_notifies_about_the_jobs_a_push_created(self, notify_new_jobs):
+        first_push = Push.objects.create()
+        second_push = Push.objects.create()
+        tasks.process_push_batch(first_push.id, [self.make_job('Engineer')], [], {})
+        # Seen again by a push that overlaps with the first one
+        tasks.process_push_batch(second_push.id, [self.make_job('Engineer'), self.make_job('Designer')], [], {})
+        tasks.notify_push(first_push.id)
+        tasks.notify_push(second_push.id)
+        self.assertEqual(
+            [[job.title for job in call.args[0]] for call in notify_new_jobs.call_args_list],
+            [['Engineer'], ['Designer']],
+        )
+        # Users are only notified once about a push
+        tasks.notify_push(first_push.id)
+        self.assertEqual(notify_new_jobs.call_count, 2)
+
+
+class AhoCorasickTests(SimpleTestCase):
+    def test_finds_overlapping_patterns(self):
+        automaton = AhoCorasick(['he', 'she', 'his', 'hers'])
+        self.assertEqual(automaton.find('ushers'), {0, 1, 3})
+        self.assertEqual(automaton.find('this'), {2})
+        self.assertEqual(automaton.find('xyz'), set())
+
+
+class WatchlistMatcherTests(SimpleTestCase):
+    def accepts(self, include: str, exclude: str, title: str) -> bool:
+        matcher = WatchlistMatcher([(1, include, exclude)])
+        return matcher.accepts(1, matcher.find(title))
+
+    def test_overlapping_keywords(self):
+        matcher = WatchlistMatcher([
+            (1, 'engineer', ''),
+            (2, 'software engineer', ''),
+            (3, 'software engineering manager', ''),
+            (4, 'engineer', 'senior software'),
+        ])
+        found = matcher.find('Senior Software Engineer')
+        self.assertTrue(matcher.accepts(1, found))
+        self.assertTrue(matcher.accepts(2, found))
+        self.assertFalse(matcher.accepts(3, found))
+        self.assertFalse(matcher.accepts(4, found))
+        self.assertTrue(matcher.accepts(4, matcher.find('Software Engineer')))
+
+    def test_keywords_match_whole_words(self):
+        self.assertTrue(self.accepts('intern', '', 'Summer Intern'))
+        self.assertFalse(self.accepts('intern', '', 'International Sales'))
+        self.assertFalse(self.accepts('java', '', 'JavaScript Developer'))
+        self.assertTrue(self.accepts('c++', '', 'C++ Developer'))
+        self.assertFalse(self.accepts('c++', '', 'C Developer'))
+        self.assertFalse(self.accepts('c', '', 'C# Developer'))
+
+    def test_keywords_ignore_case_and_punctuation(self):
+        self.assertTrue(self.accepts('machine learning', '', 'Machine-Learning Engineer'))
+        self.assertTrue(self.accepts('Backend', '', 'backend engineer (remote)'))
+
+    def test_any_include_keyword_matches(self):
+        self.assertTrue(self.accepts('frontend, backend', '', 'Backend Engineer'))
+        self.assertFalse(self.accepts('frontend, backend', '', 'Data Engineer'))
+
+    def test_exclude_keywords(self):
+        self.assertTrue(self.accepts('', 'senior, staff', 'Engineer'))
+        self.assertFalse(self.accepts('', 'senior, staff', 'Staff Engineer'))
+
+    def test_watchlists_without_filters_accept_every_job(self):
+        matcher = WatchlistMatcher([(1, '', ' , '), (2, 'engineer', '')])
+        self.assertNotIn(1, matcher.filters)
+        self.assertTrue(matcher.accepts(1, matcher.find('Designer')))
+        self.assertTrue(matcher.accepts(3, matcher.find('Designer')))
+
+
+class WatchlistPageFilterTests(SimpleTestCase):
+    def test_levels(self):
+        watchlist = Watchlist(levels='entry, junior')
+        self.assertTrue(watchlist.accepts_page('junior', '', False))
+        self.assertFalse(watchlist.accepts_page('senior', '', False))
+        self.assertTrue(Watchlist().accepts_page('senior', '', False))
+
+    def test_locations(self):
+        watchlist = Watchlist(locations='Berlin, remote')
+        self.assertTrue(watchlist.accepts_page('mid', 'Berlin, Germany', False))
+        self.assertTrue(watchlist.accepts_page('mid', 'New York', True))
+        self.assertFalse(watchlist.accepts_page('mid', 'New York', False))
+        self.assertFalse(watchlist.accepts_page('mid', None, None))
+
+    def test_unknown_levels_are_invalid(self):
+        with self.assertRaises(ValidationError):
+            Watchlist(levels='junior, wizard').clean()
+        Watchlist(levels='junior').clean()
@@ -1,94 +1,428 @@
 from datetime import datetime
-from django.core.mail import send_mail
-from django.db.models import Q
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import F, Min, Prefetch, Q
+from django.db.models.functions import Coalesce
 from django.template.loader import render_to_string
+from django.utils import timezone
 from django.utils.html import strip_tags
 import logging
 
-from core.models import Job, Notification
+from core.matching import WatchlistMatcher
+from core.models import Host, Job, Notification, OutboundEmail, Page, PushBatch, PushError, Watchlist
+from core.outbox import queue_emails
 from users.models import User
 
 logger = logging.getLogger('django')
 
+# Number of jobs inserted or updated in a single query
+JOB_CHUNK_SIZE = 500
+
+# Cache keys of the page to subscribers index and its version. The index is
+# rebuilt when watchlists change, and at least once a day in case a change
+# was made without sending signals (such as a bulk update).
+SUBSCRIBER_INDEX_KEY = 'core:subscriber_index'
+SUBSCRIBER_INDEX_VERSION_KEY = 'core:subscriber_index:version'
+SUBSCRIBER_INDEX_TIMEOUT = 24 * 60 * 60
+# Cache key of the compiled keyword filters of watchlists, which share the
+# version and timeout of the subscriber index
+WATCHLIST_MATCHER_KEY = 'core:watchlist_matcher'
+
+
+def upsert_jobs(jobs, push_id) -> list[Job]:
+    """
+    Insert the jobs of a push that are new, and mark the ones that already exist
+    as seen in this push, using INSERT ... ON CONFLICT on the job identity key
+    (supported by both SQLite and PostgreSQL). Jobs are upserted in chunks of
+    at most JOB_CHUNK_SIZE jobs with a single query each.
+
+    The newly created jobs are the rows whose first_seen is the time of this
+    upsert, which the upsert returns where the database supports RETURNING.
+    Otherwise they take one more query per chunk. Returns the new jobs.
+    """
+    # Keep the first of the jobs in the push that have the same identity key
+    jobs_by_key = {}
+    for job in jobs:
+        key = Job.make_key(job['company_id'], job['page']['id'], job.get('job_id'), job['title'], job.get('url'))
+        jobs_by_key.setdefault(key, job)
+    keys = list(jobs_by_key)
+    now = timezone.now()
+    db_now = connection.ops.adapt_datetimefield_value(now)
+    qn = connection.ops.quote_name
+    fields = [Job._meta.get_field(name) for name in ['key', 'title', 'url', 'job_id', 'company', 'page', 'push', 'first_push', 'first_seen', 'last_seen']]
+    key_column, push_column, first_seen_column, last_seen_column = (
+        qn(Job._meta.get_field(name).column) for name in ['key', 'push', 'first_seen', 'last_seen']
+    )
+    returning = connection.features.can_return_rows_from_bulk_insert
+    chunk_size = min(JOB_CHUNK_SIZE, (connection.features.max_query_params or 999) // len(fields) - 1)
+    row = f'({", ".join(["%s"] * len(fields))})'
+    new_jobs = []
+    with connection.cursor() as cursor:
+        for i in range(0, len(keys), chunk_size):
+            chunk = keys[i:i + chunk_size]
+            params = []
+            for key in chunk:
+                job = jobs_by_key[key]
+                params.extend([key, job['title'], job.get('url', ''), job.get('job_id', ''), job['company_id'], job['page']['id'], push_id, push_id, db_now, db_now])
+            sql = (
+                f'INSERT INTO {qn(Job._meta.db_table)} ({", ".join(qn(field.column) for field in fields)}) '
+                f'VALUES {", ".join([row] * len(chunk))} '
+                f'ON CONFLICT ({key_column}) DO UPDATE SET '
+                f'{last_seen_column} = excluded.{last_seen_column}, {push_column} = excluded.{push_column}'
+            )
+            if not returning:
+                cursor.execute(sql, params)
+                new_jobs.extend(Job.objects.filter(key__in=chunk, first_seen=now))
+                continue
+            # Rows that were updated keep the first_seen of when they were created
+            cursor.execute(f'{sql} RETURNING {qn(Job._meta.pk.column)}, {key_column}, {first_seen_column} = %s', [*params, db_now])
+            for pk, key, created in cursor.fetchall():
+                if not created:
+                    continue
+                job = jobs_by_key[key]
+                new_jobs.append(Job(
+                    id=pk,
+                    key=key,
+                    title=job['title'],
+                    url=job.get('url', ''),
+                    job_id=job.get('job_id', ''),
+                    company_id=job['company_id'],
+                    page_id=job['page']['id'],
+                    push_id=push_id,
+                    first_push_id=push_id,
+                    first_seen=now,
+                    last_seen=now,
+                ))
+    return new_jobs
+
 
 def create_jobs_and_notify(jobs, push_id) -> None:
     """
     Bulk create jobs returned by the push from Lambda,
     figure out which jobs are new, and notify users watching those jobs
-    TODO: Turn this into a celery task and run asynchronously
-    ! This is going to be a long running function with lots of unoptimized queries
-    """
-    # Figure out which jobs are new
-    job_tuples = set((job['title'], job['company']) for job in jobs)
-    existing_jobs_qs = Job.objects.filter(
-        Q(
-            title__in=[job[0] for job in job_tuples],
-            company__name__in=[job[1] for job in job_tuples],
-        )
-    )
-    existing_jobs_qs.update(last_seen=datetime.now())
-    existing_jobs = existing_jobs_qs.distinct().values_list('title', 'company__name')
-    # Bulk create new jobs
-    new_jobs = [
-        Job(
-            title=job['title'],
-            company_id=job['company_id'],
-            page_id=job['page']['id'],
-            push_id=push_id,
-            last_seen=job['last_seen'],
-            job_id=job.get('job_id', ''),
-            url=job.get('url', ''),
-        ) for job in jobs if (job['title'], job['company']) not in existing_jobs
-    ]
+    """
+    new_jobs = upsert_jobs(jobs, push_id)
     logger.info(f"Found {len(new_jobs)} new jobs")
-    new_jobs = Job.objects.bulk_create(new_jobs)
+    notify_new_jobs(new_jobs)
+
 
-    # A dictionary mapping a user's email to a list of new jobs
+def notify_new_jobs(new_jobs) -> None:
+    """
+    Notify the users watching the pages of the given new jobs, if the jobs pass
+    the filters of at least one of the watchlists they watch the pages through
+    """
+    # A dictionary mapping a user's primary key to the user and a list of new jobs
     notification_data = {}
-    # For each new job, find the users who are watching the page.
-    # There must be a better way to do this using joins
+    subscribers = get_page_subscribers({job.page_id for job in new_jobs})
+    users = User.objects.in_bulk({user_id for page_subscribers in subscribers.values() for user_id in page_subscribers})
+    matcher = get_watchlist_matcher()
     for job in new_jobs:
-        watchlists = job.page.watchlists.all().prefetch_related('subscribers')
-        for watchlist in watchlists:
-            logger.info(f"Watchlist {watchlist.name} has new jobs!")
-            for user in watchlist.subscribers.all():
-                logger.info(f"{user.username} should be notified")
-                if user.pk not in notification_data:
-                    notification_data[user.pk] = (user, [])
-                notification_data[user.pk][1].append(job)
+        page_subscribers = subscribers.get(job.page_id)
+        if not page_subscribers:
+            continue
+        # Find the keywords of every watchlist in the title in a single pass
+        found = matcher.find(job.title) if matcher.filters else set()
+        for user_id, watchlist_ids in page_subscribers.items():
+            if not any(matcher.accepts(watchlist_id, found) for watchlist_id in watchlist_ids):
+                continue
+            if user_id not in notification_data:
+                notification_data[user_id] = (users[user_id], [])
+            notification_data[user_id][1].append(job)
     logger.info(f'Notifying {len(notification_data)} users')
     notify_users(notification_data)
 
 
+def build_subscriber_index() -> dict[int, dict[int, set[int]]]:
+    """
+    Map the ID of every page that is on a watchlist with subscribers to the IDs
+    of the users subscribed to those watchlists, and for each user, the IDs of
+    the watchlists they follow the page through. This is a single join from the
+    pages through their watchlists to the watchlists' subscribers. A page is left
+    out of a watchlist if it doesn't pass the watchlist's level and location filters.
+    """
+    index = {}
+    filtered = Watchlist.objects.exclude(levels='', locations='').only('id', 'levels', 'locations').in_bulk()
+    rows = Watchlist.pages.through.objects.filter(
+        watchlist__subscribers__isnull=False,
+    ).values_list(
+        'page_id', 'watchlist_id', 'watchlist__subscribers', 'page__level', 'page__location', 'page__is_remote',
+    ).distinct()
+    for page_id, watchlist_id, user_id, level, location, is_remote in rows:
+        if watchlist_id in filtered and not filtered[watchlist_id].accepts_page(level, location, is_remote):
+            continue
+        index.setdefault(page_id, {}).setdefault(user_id, set()).add(watchlist_id)
+    return index
+
+
+def build_watchlist_matcher() -> WatchlistMatcher:
+    """
+    Compile the keyword filters of every watchlist into a single matcher
+    """
+    return WatchlistMatcher(list(
+        Watchlist.objects.exclude(include_keywords='', exclude_keywords='').values_list(
+            'id', 'include_keywords', 'exclude_keywords',
+        )
+    ))
+
+
+def get_cached_watchlist_data(key: str, build):
+    """
+    Get a structure built from watchlists from the cache, building it with
+    `build` if it isn't cached. Structures are cached under the current version,
+    which is bumped whenever watchlists change, so a structure built from data
+    that changed while it was being built is never read.
+    """
+    version = cache.get_or_set(SUBSCRIBER_INDEX_VERSION_KEY, 1, timeout=None)
+    value = cache.get(key, version=version)
+    if value is None:
+        value = build()
+        cache.set(key, value, timeout=SUBSCRIBER_INDEX_TIMEOUT, version=version)
+    return value
+
+
+def get_subscriber_index() -> dict[int, dict[int, set[int]]]:
+    """
+    Get the page to subscribers index, see build_subscriber_index
+    """
+    return get_cached_watchlist_data(SUBSCRIBER_INDEX_KEY, build_subscriber_index)
+
+
+def get_watchlist_matcher() -> WatchlistMatcher:
+    """
+    Get the compiled keyword filters of every watchlist, see build_watchlist_matcher
+    """
+    return get_cached_watchlist_data(WATCHLIST_MATCHER_KEY, build_watchlist_matcher)
+
+
+def invalidate_subscriber_index() -> None:
+    """
+    Stop using the cached page to subscribers index and watchlist matcher,
+    once the current transaction (if any) is committed
+    """
+    def bump_version():
+        try:
+            cache.incr(SUBSCRIBER_INDEX_VERSION_KEY)
+        except ValueError:
+            cache.set(SUBSCRIBER_INDEX_VERSION_KEY, 1, timeout=None)
+    transaction.on_commit(bump_version)
+
+
+def get_page_subscribers(page_ids) -> dict[int, dict[int, set[int]]]:
+    """
+    Get the IDs of the users subscribed to a watchlist containing each of the
+    given pages, along with the IDs of those watchlists. Pages without
+    subscribers are left out.
+    """
+    index = get_subscriber_index()
+    return {page_id: index[page_id] for page_id in page_ids if page_id in index}
+
+
+def record_push_batch(push, data) -> bool:
+    """
+    Record that a batch of jobs for the given push was received. Returns False
+    if the batch was already received before, in which case it should not be
+    processed again. Data without a batch ID is always processed.
+    """
+    batch_id = data.get('batch_id', '')
+    if not batch_id:
+        return True
+    _, created = PushBatch.objects.get_or_create(
+        push=push,
+        batch_id=batch_id,
+        defaults={'n_jobs_found': len(data.get('jobs', [])), 'n_errors': len(data.get('errors', []))},
+    )
+    return created
+
+
+def save_push_errors(push, errors) -> None:
+    """
+    Save the errors the scraper ran into for the given push
+    """
+    if not errors:
+        return
+    page_ids = set(Page.objects.filter(
+        id__in=[error['page']['id'] for error in errors if error['page'].get('id') is not None]
+    ).values_list('id', flat=True))
+    PushError.objects.bulk_create([
+        PushError(
+            push=push,
+            page_id=error['page'].get('id') if error['page'].get('id') in page_ids else None,
+            url=error['page'].get('url', '')[:512],
+            error=error['error'],
+        ) for error in errors
+    ])
+
+
+def update_pages(pages) -> tuple[set[int], int]:
+    """
+    Save the cache validators and job fingerprints the scraper reported for each
+    page, and mark the jobs still on the pages the scraper found unchanged since
+    they were last scraped as seen. Pages that could not be scraped are left
+    alone. Returns the IDs of the unchanged pages, whose jobs don't need to be
+    checked for new jobs again, and the number of jobs still on them, which the
+    scraper didn't send or count.
+    """
+    # The fingerprint of a page that failed is the one it was sent, or one
+    # of an incomplete list of jobs, so it says nothing about its jobs
+    pages = [page for page in pages if not page.get('failed')]
+    if not pages:
+        return set(), 0
+    fingerprints = dict(Page.objects.filter(id__in=[page['id'] for page in pages]).values_list('id', 'job_fingerprint'))
+    unchanged = set()
+    changed = set()
+    for page in pages:
+        fingerprint = page.get('job_fingerprint', '')
+        if page.get('unchanged'):
+            unchanged.add(page['id'])
+        elif fingerprint and page['id'] in fingerprints and fingerprint != fingerprints[page['id']]:
+            changed.add(page['id'])
+    now = timezone.now()
+    # Every job on these pages is upserted after this, so the jobs still on a page
+    # are the ones last seen at or after the time its fingerprint changed
+    Page.objects.filter(id__in=changed).update(fingerprint_changed_at=now)
+    Page.objects.bulk_update([
+        Page(
+            id=page['id'],
+            etag=page.get('etag', '') or '',
+            last_modified=page.get('last_modified', '') or '',
+            content_hash=page.get('content_hash', '') or '',
+            job_fingerprint=page.get('job_fingerprint', '') or fingerprints.get(page['id'], ''),
+            config_hash=page.get('config_hash', '') or '',
+        ) for page in pages if page['id'] in fingerprints
+    ], ['etag', 'last_modified', 'content_hash', 'job_fingerprint', 'config_hash'])
+    n_unchanged_jobs = 0
+    if unchanged:
+        logger.info(f"{len(unchanged)} pages are unchanged since they were last scraped")
+        n_unchanged_jobs = Job.objects.filter(
+            page_id__in=unchanged,
+            last_seen__gte=F('page__fingerprint_changed_at'),
+        ).update(last_seen=now)
+    return unchanged, n_unchanged_jobs
+
+
+def update_hosts(hosts) -> None:
+    """
+    Add the number of requests, throttled, failed and skipped requests the
+    scraper reported for each host to the host's totals, and record when the
+    scraper's circuit breaker stopped it from sending requests to a host
+    """
+    for name, stats in (hosts or {}).items():
+        host, _ = Host.objects.get_or_create(name=name)
+        update = {
+            'n_requests': F('n_requests') + stats.get('requests', 0),
+            'n_throttled': F('n_throttled') + stats.get('throttled', 0),
+            'n_failures': F('n_failures') + stats.get('failures', 0),
+            'n_skipped': F('n_skipped') + stats.get('skipped', 0),
+        }
+        if stats.get('circuit_open'):
+            update['circuit_opened_at'] = timezone.now()
+            logger.warning(f"Scraper skipped {stats.get('skipped', 0)} requests to {name} after {stats.get('failures', 0)} failed requests")
+        Host.objects.filter(id=host.id).update(**update)
+        if stats.get('throttled'):
+            logger.warning(f"{stats['throttled']} of {stats.get('requests', 0)} requests to {name} were throttled")
+
+
 def notify_users(notification_data: dict[str, tuple[User, list[Job]]]) -> None:
     """
-    Notify users about new jobs.
+    Notify users about new jobs. Users who get instant notifications are emailed
+    right away through the outbox, and the notifications of users who get digests
+    are left pending until their next digest (see build_digests).
+    The notifications of all users and their jobs are created in bulk.
     :param notification_data: A dictionary mapping a user's primary key to a 2-tuple of
         the user's object and a list of new jobs to notify the user about
     """
-    for user_pk in notification_data:
-        user = notification_data[user_pk][0]
-        logger.info(f"Notifying {user.username} about {len(notification_data[user_pk][1])} new jobs")
-        notification = Notification.objects.create(
-            user=user,
-            n_new_jobs=len(notification_data[user_pk][1]),
-        )
-        notification.jobs.set(notification_data[user_pk][1])
-        email_html = render_to_string('email/new_jobs_found.html', {
-            'user': user,
-            'jobs': notification_data[user_pk][1],
-        })
-        email_plain = strip_tags(email_html)
-        from_email = 'Hawk Job Tracker <jobs@hrus.in>'
-        to_email = user.email
-        today = datetime.now().strftime('%d %b %Y')
-        try:
-            send_mail(
-                subject=f'New Jobs Found on Your Watchlist - {today}',
-                message=email_plain,
-                html_message=email_html,
-                from_email=from_email,
-                recipient_list=[to_email],
-            )
-        except Exception as e:
-            print(f'Error sending email to {to_email}: {e}')
+    notifications = Notification.objects.bulk_create([
+        Notification(user=user, n_new_jobs=len(jobs), pending=user.notification_frequency in User.DIGEST_WINDOWS)
+        for user, jobs in notification_data.values()
+    ])
+    NotificationJob = Notification.jobs.through
+    NotificationJob.objects.bulk_create(
+        [
+            NotificationJob(notification_id=notification.id, job_id=job.id)
+            for notification, (user, jobs) in zip(notifications, notification_data.values())
+            for job in jobs
+        ],
+        batch_size=JOB_CHUNK_SIZE,
+    )
+    emails = []
+    today = datetime.now().strftime('%d %b %Y')
+    for notification, (user, jobs) in zip(notifications, notification_data.values()):
+        if user.notification_frequency != 'instant':
+            continue
+        logger.info(f"Notifying {user.username} about {len(jobs)} new jobs")
+        emails.append(make_jobs_email(user, jobs, f'New Jobs Found on Your Watchlist - {today}', notification))
+    queue_emails(emails)
+
+
+def make_jobs_email(user: User, jobs: list[Job], subject: str, notification: Notification | None = None) -> OutboundEmail:
+    """
+    Render an email to a user about new jobs
+    """
+    email_html = render_to_string('email/new_jobs_found.html', {
+        'user': user,
+        'jobs': jobs,
+    })
+    return OutboundEmail(
+        notification=notification,
+        subject=subject,
+        body=strip_tags(email_html),
+        html_body=email_html,
+        from_email='Hawk Job Tracker <jobs@hrus.in>',
+        to_email=user.email,
+    )
+
+
+def get_due_digest_users() -> list[int]:
+    """
+    Get the IDs of the users with pending notifications whose digest is due,
+    which is once a full window has passed since their last digest, or since
+    their oldest pending notification if they were never sent a digest. Users
+    who no longer get digests are always due, so their pending notifications
+    are not left behind.
+    """
+    now = timezone.now()
+    due = ~Q(notification_frequency__in=list(User.DIGEST_WINDOWS))
+    for frequency, window in User.DIGEST_WINDOWS.items():
+        due |= Q(notification_frequency=frequency, window_start__lte=now - window)
+    users = User.objects.annotate(
+        first_pending=Min('notifications__date', filter=Q(notifications__pending=True)),
+    ).filter(first_pending__isnull=False).annotate(
+        window_start=Coalesce('last_digest_at', 'first_pending'),
+    )
+    return list(users.filter(due).values_list('id', flat=True))
+
+
+def build_digests(user_ids: list[int]) -> int:
+    """
+    Email each of the given users a single digest of the jobs in their pending
+    notifications, and mark the notifications as sent. Pending notifications
+    of users who turned notifications off are cleared without an email.
+    Returns the number of digests queued in the outbox.
+    """
+    now = timezone.now()
+    users = User.objects.in_bulk(user_ids)
+    pending = Notification.objects.filter(user_id__in=user_ids, pending=True).order_by('date').prefetch_related(
+        Prefetch('jobs', queryset=Job.objects.select_related('company', 'page')),
+    )
+    jobs_by_user = {}
+    notification_ids = []
+    for notification in pending:
+        jobs_by_user.setdefault(notification.user_id, {}).update({job.id: job for job in notification.jobs.all()})
+        notification_ids.append(notification.id)
+    Notification.objects.filter(id__in=notification_ids).update(pending=False)
+
+    emails = []
+    today = datetime.now().strftime('%d %b %Y')
+    for user_id, jobs in jobs_by_user.items():
+        user = users[user_id]
+        if user.notification_frequency == 'off' or not jobs:
+            continue
+        if user.notification_frequency in User.DIGEST_WINDOWS:
+            subject = f'Your {user.notification_frequency} digest of new jobs - {today}'
+        else:
+            subject = f'New Jobs Found on Your Watchlist - {today}'
+        logger.info(f"Sending {user.username} a digest of {len(jobs)} new jobs")
+        emails.append(make_jobs_email(user, list(jobs.values()), subject))
+    User.objects.filter(id__in=jobs_by_user).update(last_digest_at=now)
+    queue_emails(emails)
+    return len(emails)
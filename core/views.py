@@ -117,7 +117,7 @@ class PageListView(ListView):
 class WatchlistCreateView(CreateView):
     template_name = 'core/watchlist_create.html'
     model = Watchlist
-    fields = ['name', 'description']
+    fields = ['name', 'description', 'include_keywords', 'exclude_keywords', 'levels', 'locations']
 
     def form_valid(self, form):
         form.instance.owner = self.request.user
@@ -161,6 +161,32 @@ DATABASES = {
     }
 }
 
+# A file based cache is shared by all the server's processes, so a change
+# that invalidates a cached value in one process invalidates it in all of them
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": os.environ.get("HAWK_CACHE_DIR", BASE_DIR / "cache"),
+    }
+}
+# Tests get their own in-memory cache, instead of sharing the server's
+if sys.argv[1:2] == ["test"]:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+# Background tasks (see core/queue.py) are stored in the database and run by
+# `manage.py run_worker`. With the "sqs" backend, workers are also woken up
+# through an SQS queue, and with "immediate" tasks run in the web process.
+HAWK_TASK_BACKEND = os.environ.get("HAWK_TASK_BACKEND", "database")
+HAWK_TASK_QUEUE_URL = os.environ.get("HAWK_TASK_QUEUE_URL", "")
+HAWK_TASK_QUEUE_REGION = os.environ.get("HAWK_TASK_QUEUE_REGION", "ap-south-1")
+# Users are notified about the new jobs in a push once every chunk of pages has
+# been scraped, or this many minutes after the push started, whichever is first
+HAWK_PUSH_DEADLINE_MINUTES = int(os.environ.get("HAWK_PUSH_DEADLINE_MINUTES", 60))
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -212,6 +238,11 @@ if DEBUG:
 else:
     EMAIL_BACKEND = 'django_ses.SESBackend'
 
+# Emails are sent from an outbox by the worker (see core/outbox.py), in
+# batches split between this many threads, each with its own connection
+HAWK_EMAIL_BATCH_SIZE = int(os.environ.get("HAWK_EMAIL_BATCH_SIZE", 100))
+HAWK_EMAIL_THREADS = int(os.environ.get("HAWK_EMAIL_THREADS", 4))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -0,0 +1,108 @@
+"""
+Batching of scraped jobs into pushes that are sent to the server while the
+scraper is still running, instead of in a single push once every page is done.
+Each batch has a batch ID derived from the push and the pages in it, so a
+batch that is sent again is recognised by the server.
+"""
+import hashlib
+from typing import Callable
+
+from schema import Job, Page, ScrapeError
+
+# Rough number of bytes each job and error adds to a push, on top of its strings
+JOB_OVERHEAD = 64
+ERROR_OVERHEAD = 32
+
+
+def get_batch_id(push_id: int, pages: list[Page], chunks: list[int] | None = None) -> str:
+    """
+    Get the ID of a batch of the given push containing the given pages. The
+    last batch of a run also has the chunks the run scraped in its ID, since it
+    can be empty, and is then only told apart from the last batch of another
+    chunk by its chunks.
+    """
+    key = f'{push_id}:{",".join(str(page.id) for page in pages)}'
+    if chunks is not None:
+        key += f':final:{",".join(str(chunk) for chunk in sorted(chunks))}'
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+def estimate_size(jobs: list[Job], errors: list[ScrapeError]) -> int:
+    """
+    Estimate the number of bytes the jobs and errors add to a push, before compression
+    """
+    size = sum(len(job.title) + len(job.job_id or '') + len(job.url or '') + JOB_OVERHEAD for job in jobs)
+    size += sum(len(error.error) + ERROR_OVERHEAD for error in errors)
+    return size
+
+
+class PushBatcher:
+    """
+    Collects the jobs and errors of pages as they are scraped, and sends them to
+    the server in batches of about `max_jobs` jobs or `max_bytes` bytes. Pages are
+    added to batches in the order they were given, so that the same pages always
+    end up in the same batch, and a page is never split across batches.
+
+    `send` is called with the jobs, errors and pages of a batch, the push ID, the
+    batch ID, and the host stats and indices of the scraped chunks of the push
+    (both only given for the last batch), and returns the ID of the push the
+    batch was added to, or None if it could not be sent.
+    """
+    def __init__(self, pages: list[Page], push_id: int, send: Callable[..., int | None], max_jobs: int, max_bytes: int):
+        self.pages = pages
+        self.push_id = push_id
+        self.send = send
+        self.max_jobs = max_jobs
+        self.max_bytes = max_bytes
+        # Results of pages that were scraped before a page given earlier
+        self.completed: dict[int, tuple[list[Job], list[ScrapeError]]] = {}
+        self.next_index = 0
+        self.batch_pages: list[Page] = []
+        self.batch_jobs: list[Job] = []
+        self.batch_errors: list[ScrapeError] = []
+        self.batch_size = 0
+        self.n_batches = 0
+        self.n_failed = 0
+
+    def add(self, index: int, jobs: list[Job], errors: list[ScrapeError]) -> None:
+        """
+        Add the results of the page at `index`, sending a batch if it is full
+        """
+        self.completed[index] = (jobs, errors)
+        while self.next_index in self.completed:
+            jobs, errors = self.completed.pop(self.next_index)
+            self.batch_pages.append(self.pages[self.next_index])
+            self.batch_jobs.extend(jobs)
+            self.batch_errors.extend(errors)
+            self.batch_size += estimate_size(jobs, errors)
+            self.next_index += 1
+            if len(self.batch_jobs) >= self.max_jobs or self.batch_size >= self.max_bytes:
+                self.flush()
+
+    def flush(self, hosts: dict | None = None, chunks: list[int] | None = None) -> None:
+        """
+        Send the current batch to the server
+        """
+        batch_id = get_batch_id(self.push_id, self.batch_pages, chunks)
+        push_id = self.send(self.batch_jobs, self.batch_errors, self.batch_pages, self.push_id, batch_id, hosts, chunks)
+        self.n_batches += 1
+        if push_id is None:
+            self.n_failed += 1
+        else:
+            self.push_id = push_id
+        self.batch_pages = []
+        self.batch_jobs = []
+        self.batch_errors = []
+        self.batch_size = 0
+
+    def close(self, hosts: dict | None = None, chunks: list[int] | None = None) -> None:
+        """
+        Send the last batch, along with the stats of the hosts that were
+        scraped and the chunks of the push whose pages were scraped. If a batch
+        could not be sent, the chunks are not reported as scraped, so that the
+        push is only complete once the run is retried and every batch is sent.
+        """
+        if not self.n_failed:
+            self.flush(hosts, chunks or [])
+        elif self.batch_pages:
+            self.flush(hosts)
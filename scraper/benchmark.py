@@ -0,0 +1,271 @@
+"""
+Benchmarks for the scraper's parsing code. Run from the scraper directory:
+
+    python benchmark.py html --file page.html --selector "a.job-title"
+    python benchmark.py json --jobs 5000
+    python benchmark.py stream --jobs 100000
+    python benchmark.py push --jobs 3000 --pages 10
+
+If no file is given, a synthetic careers page or API response is generated instead.
+"""
+from argparse import ArgumentParser
+import gzip
+import json
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+
+from extractors import compile_extractor
+from parsers import PARSERS
+from schema import Job, Page
+from wire import encode_body, encode_compact, encode_original
+
+
+def generate_html_page(n_jobs: int) -> bytes:
+    """
+    Generate a careers page listing `n_jobs` jobs, padded with the kind of
+    markup found on large Workday and iCIMS pages
+    """
+    rows = []
+    for i in range(n_jobs):
+        rows.append(
+            f'<li class="job"><div class="meta"><span>Location {i % 50}</span><span>Team {i % 20}</span></div>'
+            f'<a href="/jobs/{i}"><h3 class="job-title">Software Engineer {i} <em>(Remote)</em></h3></a>'
+            f'<p class="description">{"Lorem ipsum dolor sit amet. " * 10}</p></li>'
+        )
+    return f'<html><head><title>Careers</title></head><body><ul>{"".join(rows)}</ul></body></html>'.encode()
+
+
+def benchmark_html(content: bytes, selector: str, repeat: int) -> None:
+    """
+    Time every installed parser backend on the given page and check that
+    they all extract the same results
+    """
+    print(f'Page size: {len(content) / 1024 / 1024:.2f} MB')
+    timings = {}
+    results = {}
+    for name, parse in PARSERS.items():
+        start = time.perf_counter()
+        for _ in range(repeat):
+            results[name] = parse(content, selector)
+        timings[name] = (time.perf_counter() - start) / repeat
+    baseline = timings['html.parser']
+    for name, elapsed in sorted(timings.items(), key=lambda item: item[1]):
+        print(f'{name:>12}: {elapsed * 1000:8.1f} ms  {baseline / elapsed:5.1f}x  ({len(results[name])} elements)')
+    for name in results:
+        if results[name] != results['html.parser']:
+            print(f'Warning: {name} results differ from html.parser')
+
+
+def generate_json_response(n_jobs: int) -> dict:
+    """
+    Generate an API response listing `n_jobs` jobs, nested like the
+    responses of the larger career APIs we track
+    """
+    return {
+        'data': {
+            'results': [
+                {
+                    'id': 1000000 + i,
+                    'data': {'title': f' Software Engineer {i} ', 'location': {'city': f'City {i % 50}'}},
+                    'links': {'apply': f'/jobs/{i}'},
+                    'description': 'Lorem ipsum dolor sit amet. ' * 10,
+                } for i in range(n_jobs)
+            ],
+            'total': n_jobs,
+        }
+    }
+
+
+def recursive_getattr(obj: dict, attr_list: list[str], default=None):
+    """
+    The key lookup used by the scraper before extractors were compiled,
+    kept here as the baseline for the JSON benchmark
+    """
+    for attr in attr_list:
+        if isinstance(obj, dict) and attr in obj:
+            obj = obj[attr]
+        else:
+            return default
+    return obj
+
+
+def extract_with_recursive_getattr(response: dict, selector: str, title_key: str, job_id_key: str, job_url_key: str) -> list[tuple[str, str, str]]:
+    results = []
+    for job in recursive_getattr(response, selector.split(','), []):
+        title = recursive_getattr(job, title_key.split(',')).strip()
+        if title:
+            results.append((
+                title,
+                str(recursive_getattr(job, job_id_key.split(','), '')).strip(),
+                str(recursive_getattr(job, job_url_key.split(','), '')),
+            ))
+    return results
+
+
+def benchmark_json(response: dict, selector: str, title_key: str, job_id_key: str, job_url_key: str, repeat: int) -> None:
+    """
+    Time extracting jobs from a JSON response with a compiled extractor,
+    compared to walking each key path with recursive_getattr
+    """
+    print(f'Response size: {len(json.dumps(response)) / 1024 / 1024:.2f} MB')
+    start = time.perf_counter()
+    for _ in range(repeat):
+        baseline_results = extract_with_recursive_getattr(response, selector, title_key, job_id_key, job_url_key)
+    baseline = (time.perf_counter() - start) / repeat
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        extractor = compile_extractor(selector, title_key, job_id_key, job_url_key, '')
+        compiled_results = [job for job in extractor.extract(response) if job[0]]
+    compiled = (time.perf_counter() - start) / repeat
+
+    n_jobs = len(compiled_results)
+    print(f'recursive_getattr: {baseline * 1000:8.1f} ms  {n_jobs / baseline:10.0f} jobs/s')
+    print(f'         compiled: {compiled * 1000:8.1f} ms  {n_jobs / compiled:10.0f} jobs/s  {baseline / compiled:5.1f}x')
+    if compiled_results != baseline_results:
+        print('Warning: compiled extractor results differ from recursive_getattr')
+
+
+def extract_from_file(path: str, stream: bool, selector: str, title_key: str, job_id_key: str, job_url_key: str) -> tuple[int, int]:
+    """
+    Extract jobs from a JSON file, either by loading it whole or by streaming
+    it, and return the number of jobs found and the peak RSS of the process in KB
+    """
+    extractor = compile_extractor(selector, title_key, job_id_key, job_url_key, '')
+    with open(path, 'rb') as f:
+        if stream:
+            jobs = [job for job in extractor.extract_stream(f) if job[0]]
+        else:
+            jobs = [job for job in extractor.extract(json.load(f)) if job[0]]
+    return len(jobs), resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def write_json_response(path: str, n_jobs: int) -> None:
+    """
+    Write a generated API response listing `n_jobs` jobs to a file
+    """
+    with open(path, 'w') as f:
+        json.dump(generate_json_response(n_jobs), f)
+
+
+def benchmark_stream(path: str, selector: str, title_key: str, job_id_key: str, job_url_key: str) -> None:
+    """
+    Compare the peak RSS of extracting jobs from a JSON file by loading the whole
+    document against streaming it. Each run uses a fresh interpreter, and since
+    the peak RSS of a process is inherited by the interpreters it spawns, the
+    calling process must not have loaded anything large itself.
+    """
+    print(f'Response size: {os.path.getsize(path) / 1024 / 1024:.2f} MB')
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(1, maxtasksperchild=1) as pool:
+        baseline = pool.apply(resource.getrusage, (resource.RUSAGE_SELF,)).ru_maxrss
+    print(f'  interpreter: {baseline / 1024:8.1f} MB peak RSS')
+    for stream in (False, True):
+        with context.Pool(1, maxtasksperchild=1) as pool:
+            start = time.perf_counter()
+            n_jobs, peak = pool.apply(extract_from_file, (path, stream, selector, title_key, job_id_key, job_url_key))
+            elapsed = time.perf_counter() - start
+        print(f'{"streamed" if stream else "json.load":>13}: {peak / 1024:8.1f} MB peak RSS  {elapsed * 1000:8.1f} ms  ({n_jobs} jobs)')
+
+
+def generate_push(n_jobs: int, n_pages: int) -> tuple[list[Job], list[Page]]:
+    """
+    Generate `n_jobs` jobs spread evenly over `n_pages` scraped pages
+    """
+    pages = [
+        Page(
+            id=i, name=f'Careers {i}', company=f'Company {i}', company_id=i,
+            url=f'https://careers.company{i}.com/jobs?location=anywhere&team=engineering',
+            selector='div.job-listing > a.job-title', job_fingerprint='0' * 64,
+        ) for i in range(n_pages)
+    ]
+    jobs = [
+        Job(
+            title=f'Senior Software Engineer {i}', company=pages[i % n_pages].company,
+            company_id=pages[i % n_pages].company_id, page=pages[i % n_pages],
+            last_seen='2025-01-01 00:00:00', job_id=str(100000 + i),
+            url=f'https://careers.company{i % n_pages}.com/jobs/{100000 + i}',
+        ) for i in range(n_jobs)
+    ]
+    return jobs, pages
+
+
+def benchmark_push(n_jobs: int, n_pages: int, repeat: int) -> None:
+    """
+    Compare the size of a push in each format, and the time the
+    server takes to decompress and decode it
+    """
+    jobs, pages = generate_push(n_jobs, n_pages)
+    formats = {
+        'original': encode_original(jobs, [], pages),
+        'compact rows': encode_compact(jobs, [], pages, columnar=False),
+        'compact columns': encode_compact(jobs, [], pages),
+    }
+    for name, data in formats.items():
+        for compress in (False, True):
+            body, _ = encode_body({'time': '2025-01-01 00:00:00', 'data': data}, compress=compress)
+            start = time.perf_counter()
+            for _ in range(repeat):
+                json.loads(gzip.decompress(body) if compress else body)
+            elapsed = (time.perf_counter() - start) / repeat
+            label = f'{name}{" + gzip" if compress else ""}'
+            print(f'{label:>22}: {len(body) / 1024:8.1f} KB  {elapsed * 1000:6.2f} ms to decode')
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser('Benchmark the scraper\'s parsing code')
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+    html_parser = subparsers.add_parser('html', help='Benchmark the HTML parser backends')
+    html_parser.add_argument('--file', '-f', help='HTML file to parse', type=str, required=False)
+    html_parser.add_argument('--selector', '-s', help='CSS selector to evaluate', type=str, default='.job-title')
+    html_parser.add_argument('--jobs', '-n', help='Number of jobs in the generated page', type=int, default=5000)
+    html_parser.add_argument('--repeat', '-r', help='Number of times to parse the page', type=int, default=3)
+    json_parser = subparsers.add_parser('json', help='Benchmark extracting jobs from JSON responses')
+    json_parser.add_argument('--file', '-f', help='JSON response to extract jobs from', type=str, required=False)
+    json_parser.add_argument('--selector', '-s', help='Key path of the list of jobs', type=str, default='data,results')
+    json_parser.add_argument('--title-key', '-tk', help='Key path of the job title', type=str, default='data,title')
+    json_parser.add_argument('--job-id-key', '-jik', help='Key path of the job ID', type=str, default='id')
+    json_parser.add_argument('--job-url-key', '-juk', help='Key path of the job URL', type=str, default='links,apply')
+    json_parser.add_argument('--jobs', '-n', help='Number of jobs in the generated response', type=int, default=5000)
+    json_parser.add_argument('--repeat', '-r', help='Number of times to extract the jobs', type=int, default=10)
+    stream_parser = subparsers.add_parser('stream', help='Benchmark the memory used by streaming JSON responses')
+    stream_parser.add_argument('--file', '-f', help='JSON response to extract jobs from', type=str, required=False)
+    stream_parser.add_argument('--selector', '-s', help='Key path of the list of jobs', type=str, default='data,results')
+    stream_parser.add_argument('--title-key', '-tk', help='Key path of the job title', type=str, default='data,title')
+    stream_parser.add_argument('--job-id-key', '-jik', help='Key path of the job ID', type=str, default='id')
+    stream_parser.add_argument('--job-url-key', '-juk', help='Key path of the job URL', type=str, default='links,apply')
+    stream_parser.add_argument('--jobs', '-n', help='Number of jobs in the generated response', type=int, default=100000)
+    push_parser = subparsers.add_parser('push', help='Benchmark the size of the data pushed to the server')
+    push_parser.add_argument('--jobs', '-n', help='Number of jobs in the push', type=int, default=3000)
+    push_parser.add_argument('--pages', '-p', help='Number of pages the jobs are found on', type=int, default=10)
+    push_parser.add_argument('--repeat', '-r', help='Number of times to decode the push', type=int, default=20)
+    args = parser.parse_args()
+
+    if args.benchmark == 'html':
+        if args.file:
+            with open(args.file, 'rb') as f:
+                page_content = f.read()
+        else:
+            page_content = generate_html_page(args.jobs)
+        benchmark_html(page_content, args.selector, args.repeat)
+    elif args.benchmark == 'json':
+        if args.file:
+            with open(args.file, 'rb') as f:
+                json_response = json.load(f)
+        else:
+            json_response = generate_json_response(args.jobs)
+        benchmark_json(json_response, args.selector, args.title_key, args.job_id_key, args.job_url_key, args.repeat)
+    elif args.benchmark == 'stream':
+        if args.file:
+            benchmark_stream(args.file, args.selector, args.title_key, args.job_id_key, args.job_url_key)
+        else:
+            with tempfile.NamedTemporaryFile(suffix='.json') as f:
+                # Generate the response in another process to keep this one small
+                with multiprocessing.get_context('spawn').Pool(1) as pool:
+                    pool.apply(write_json_response, (f.name, args.jobs))
+                benchmark_stream(f.name, args.selector, args.title_key, args.job_id_key, args.job_url_key)
+    elif args.benchmark == 'push':
+        benchmark_push(args.jobs, args.pages, args.repeat)
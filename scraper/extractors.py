@@ -0,0 +1,197 @@
+"""
+Compiled extractors for JSON responses. The key paths in a page's config
+are parsed once into a plan of lookups, instead of being split and walked
+again for every job in the response.
+
+A key path is a comma-separated list of keys, as in the Page model. Besides
+object keys, a key can be an integer to index into a list (negative indices
+count from the end), or `*` to select every item of a list or every value
+of an object.
+"""
+from functools import lru_cache
+from typing import Any, BinaryIO, Callable, Iterable, Iterator
+
+from schema import Page
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+WILDCARD = '*'
+
+
+class KeyPath:
+    """A compiled comma-separated key path"""
+    __slots__ = ('path', 'steps', 'has_wildcard', 'get')
+
+    def __init__(self, path: str):
+        self.path = path
+        steps = []
+        for key in path.split(',') if path else []:
+            try:
+                index = int(key)
+            except ValueError:
+                index = None
+            steps.append((key, index))
+        self.steps = tuple(steps)
+        self.has_wildcard = any(key == WILDCARD for key, _ in self.steps)
+        self.get = self._compile_getter()
+
+    def __bool__(self):
+        return bool(self.steps)
+
+    def _compile_getter(self) -> Callable[[Any, Any], Any]:
+        """
+        Build the function that gets the first value at this path in an object,
+        or a default value if there is none. Paths made only of object keys,
+        which is most of them, are looked up directly without type checks.
+        """
+        if self.has_wildcard:
+            def get(obj: Any, default: Any = None) -> Any:
+                return next(self.iter(obj), default)
+        elif all(index is None for _, index in self.steps):
+            keys = tuple(key for key, _ in self.steps)
+
+            def get(obj: Any, default: Any = None) -> Any:
+                try:
+                    for key in keys:
+                        obj = obj[key]
+                except (KeyError, TypeError):
+                    return default
+                return obj
+        else:
+            steps = self.steps
+
+            def get(obj: Any, default: Any = None) -> Any:
+                for key, index in steps:
+                    if isinstance(obj, dict) and key in obj:
+                        obj = obj[key]
+                    elif isinstance(obj, list) and index is not None and -len(obj) <= index < len(obj):
+                        obj = obj[index]
+                    else:
+                        return default
+                return obj
+        return get
+
+    def iter(self, obj: Any, start: int = 0) -> Iterator[Any]:
+        """
+        Yield every value at this path in `obj`, expanding wildcards
+        """
+        for position in range(start, len(self.steps)):
+            key, index = self.steps[position]
+            if key == WILDCARD and not (isinstance(obj, dict) and key in obj):
+                if isinstance(obj, dict):
+                    children = obj.values()
+                elif isinstance(obj, list):
+                    children = obj
+                else:
+                    return
+                for child in children:
+                    yield from self.iter(child, position + 1)
+                return
+            if isinstance(obj, dict) and key in obj:
+                obj = obj[key]
+            elif isinstance(obj, list) and index is not None and -len(obj) <= index < len(obj):
+                obj = obj[index]
+            else:
+                return
+        yield obj
+
+
+class JsonExtractor:
+    """
+    Extracts the title, job ID and job URL of every job in a JSON response
+    using the compiled key paths of a page
+    """
+    def __init__(self, selector: str, title_key: str, job_id_key: str, job_url_key: str, job_url_prefix: str):
+        self.selector = KeyPath(selector)
+        self.title_key = KeyPath(title_key)
+        self.job_id_key = KeyPath(job_id_key)
+        self.job_url_key = KeyPath(job_url_key)
+        self.job_url_prefix = job_url_prefix
+        self.stream_prefix = self._get_stream_prefix()
+
+    def _get_stream_prefix(self) -> str | None:
+        """
+        Get the ijson prefix of the job objects in the response, or None if the
+        selector can't be expressed as one (it uses list indices or wildcards)
+        """
+        if any(key == WILDCARD or index is not None for key, index in self.selector.steps):
+            return None
+        return '.'.join([key for key, _ in self.selector.steps] + ['item'])
+
+    def select_jobs(self, response: Any) -> Iterator[Any]:
+        """
+        Yield the job objects selected by the page's selector. Lists found at the
+        selector are expanded, so the selector can point to one or many job lists.
+        """
+        if not self.selector:
+            matches = [response]
+        else:
+            matches = self.selector.iter(response)
+        for match in matches:
+            if isinstance(match, list):
+                yield from match
+            else:
+                yield match
+
+    def extract_jobs(self, jobs: Iterable[Any]) -> Iterator[tuple[str, str, str]]:
+        """
+        Yield the title, job ID and job URL of every job object
+        """
+        get_title = self.title_key.get if self.title_key else lambda job: None
+        get_job_id = self.job_id_key.get if self.job_id_key else lambda job: None
+        get_job_url = self.job_url_key.get if self.job_url_key else lambda job: None
+        job_url_prefix = self.job_url_prefix
+        for job in jobs:
+            title = get_title(job)
+            job_id = get_job_id(job)
+            job_url = get_job_url(job)
+            yield (
+                '' if title is None else str(title).strip(),
+                '' if job_id is None else str(job_id).strip(),
+                job_url_prefix + ('' if job_url is None else str(job_url)),
+            )
+
+    def extract(self, response: Any) -> Iterator[tuple[str, str, str]]:
+        """
+        Yield the title, job ID and job URL of every job in the response
+        """
+        return self.extract_jobs(self.select_jobs(response))
+
+    def can_stream(self) -> bool:
+        """
+        Whether jobs can be extracted from a stream using `extract_stream`
+        """
+        return ijson is not None and self.stream_prefix is not None
+
+    def extract_stream(self, stream: BinaryIO) -> Iterator[tuple[str, str, str]]:
+        """
+        Yield the title, job ID and job URL of every job in a JSON document read
+        incrementally from `stream`, without loading the whole document in memory.
+        Only the job list at the selector is parsed into objects, one job at a time.
+        """
+        return self.extract_jobs(ijson.items(stream, self.stream_prefix, use_float=True))
+
+
+@lru_cache(maxsize=512)
+def compile_extractor(selector: str, title_key: str, job_id_key: str, job_url_key: str, job_url_prefix: str) -> JsonExtractor:
+    """
+    Compile an extractor for the given page config, reusing previously
+    compiled extractors for the same config
+    """
+    return JsonExtractor(selector, title_key, job_id_key, job_url_key, job_url_prefix)
+
+
+def get_json_extractor(page: Page) -> JsonExtractor:
+    """
+    Get the compiled JSON extractor for a page
+    """
+    return compile_extractor(
+        page.selector or '',
+        page.title_key or '',
+        page.job_id_key or '',
+        page.job_url_key or '',
+        page.job_url_prefix or '',
+    )
@@ -0,0 +1,120 @@
+"""
+Helpers for JSON career APIs that split their list of jobs into pages,
+using an offset and limit, a page number, or a cursor to the next page.
+"""
+from copy import deepcopy
+from math import ceil
+from typing import Any
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from extractors import KeyPath
+from schema import Page
+
+
+def get_request_param(page: Page, url: str, payload: dict | None, name: str) -> Any:
+    """
+    Get the value of a request parameter. For GET requests this is a query
+    parameter, for POST and PUT requests a key path in the request payload.
+    """
+    if page.request_method in ['POST', 'PUT']:
+        return KeyPath(name).get(payload)
+    return dict(parse_qsl(urlsplit(url).query)).get(name)
+
+
+def set_request_param(page: Page, url: str, payload: dict | None, name: str, value: Any) -> tuple[str, dict | None]:
+    """
+    Get the URL and payload of a request with the given parameter set to `value`.
+    The original URL and payload are not modified.
+    """
+    if page.request_method in ['POST', 'PUT']:
+        payload = deepcopy(payload) if isinstance(payload, dict) else {}
+        obj = payload
+        keys = name.split(',')
+        for key in keys[:-1]:
+            if not isinstance(obj.get(key), dict):
+                obj[key] = {}
+            obj = obj[key]
+        obj[keys[-1]] = value
+        return url, payload
+    parts = urlsplit(url)
+    query = dict(parse_qsl(parts.query))
+    query[name] = str(value)
+    return urlunsplit(parts._replace(query=urlencode(query))), payload
+
+
+def get_page_size(page: Page, url: str, payload: dict | None, n_jobs: int) -> int:
+    """
+    Get the number of jobs per page, from the page's config, the limit
+    parameter of the first request, or the number of jobs on the first page
+    """
+    if page.pagination_page_size:
+        return page.pagination_page_size
+    if page.pagination_limit_param:
+        try:
+            return int(get_request_param(page, url, payload, page.pagination_limit_param))
+        except (TypeError, ValueError):
+            pass
+    return n_jobs
+
+
+def get_first_request(page: Page, url: str, payload: dict | None) -> tuple[str, dict | None]:
+    """
+    Get the URL and payload of the request for the first page of jobs
+    """
+    if page.pagination_type in ['offset', 'page'] and page.pagination_param:
+        url, payload = set_request_param(page, url, payload, page.pagination_param, page.pagination_start)
+        if page.pagination_limit_param and page.pagination_page_size:
+            url, payload = set_request_param(page, url, payload, page.pagination_limit_param, page.pagination_page_size)
+    return url, payload
+
+
+def get_total(page: Page, response: Any) -> int | None:
+    """
+    Get the total number of jobs reported by the first response, if any
+    """
+    if not page.pagination_total_key:
+        return None
+    try:
+        return int(KeyPath(page.pagination_total_key).get(response))
+    except (TypeError, ValueError):
+        return None
+
+
+def get_remaining_requests(page: Page, url: str, payload: dict | None, page_size: int, total: int) -> list[tuple[str, dict | None]]:
+    """
+    Get the URL and payload of the requests for every page after the first,
+    given the total number of jobs reported by the first response
+    """
+    if page_size <= 0:
+        return []
+    n_pages = min(ceil(total / page_size), page.pagination_max_pages)
+    requests = []
+    for i in range(1, n_pages):
+        if page.pagination_type == 'offset':
+            value = page.pagination_start + i * page_size
+        else:
+            value = page.pagination_start + i
+        requests.append(set_request_param(page, url, payload, page.pagination_param, value))
+    return requests
+
+
+def get_next_request(page: Page, url: str, payload: dict | None, response: Any, n_requests: int, page_size: int) -> tuple[str, dict | None] | None:
+    """
+    Get the URL and payload of the request for the page after the `n_requests`
+    pages fetched so far, when the total number of pages isn't known upfront.
+    Returns None if there are no more pages.
+    """
+    if n_requests >= page.pagination_max_pages:
+        return None
+    if page.pagination_type == 'cursor':
+        cursor = KeyPath(page.pagination_cursor_key).get(response) if page.pagination_cursor_key else None
+        if cursor in [None, '']:
+            return None
+        return set_request_param(page, url, payload, page.pagination_param, cursor)
+    if page_size <= 0:
+        return None
+    if page.pagination_type == 'offset':
+        value = page.pagination_start + n_requests * page_size
+    else:
+        value = page.pagination_start + n_requests
+    return set_request_param(page, url, payload, page.pagination_param, value)
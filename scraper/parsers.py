@@ -0,0 +1,87 @@
+"""
+HTML parser backends used to select job titles from HTML pages.
+Every backend evaluates the same CSS selectors and returns the same
+results, so the fastest installed backend can be used for any page.
+"""
+from typing import Callable
+
+from bs4 import BeautifulSoup
+
+try:
+    from selectolax.lexbor import LexborHTMLParser, SelectolaxError
+except ImportError:
+    LexborHTMLParser = None
+    SelectolaxError = None
+
+try:
+    import lxml
+except ImportError:
+    lxml = None
+
+
+def select_with_beautifulsoup(content: bytes, selector: str, features: str) -> list[tuple[str, str | None]]:
+    """
+    Select elements using BeautifulSoup with the given tree builder, and return the
+    text of each element and the href of the closest link containing it, if any
+    """
+    results = []
+    soup = BeautifulSoup(content, features)
+    for element in soup.select(selector):
+        closest_a = element.find_parent('a')
+        if not closest_a and element.has_attr('href'):
+            closest_a = element
+        href = None
+        if closest_a and closest_a.has_attr('href'):
+            href = closest_a['href']
+        results.append((element.get_text(strip=True), href))
+    return results
+
+
+def select_with_lexbor(content: bytes, selector: str) -> list[tuple[str, str | None]]:
+    """
+    Select elements using selectolax's lexbor engine, and return the text of
+    each element and the href of the closest link containing it, if any.
+    Selectors lexbor can't parse (like soupsieve's :-soup-contains) are
+    evaluated by BeautifulSoup instead.
+    """
+    results = []
+    tree = LexborHTMLParser(content)
+    try:
+        nodes = tree.css(selector)
+    except SelectolaxError:
+        return select_with_beautifulsoup(content, selector, 'lxml' if lxml is not None else 'html.parser')
+    for node in nodes:
+        closest_a = node.parent
+        while closest_a is not None and closest_a.tag != 'a':
+            closest_a = closest_a.parent
+        if closest_a is None and 'href' in node.attributes:
+            closest_a = node
+        href = None
+        if closest_a is not None and 'href' in closest_a.attributes:
+            href = closest_a.attributes['href'] or ''
+        results.append((node.text(deep=True, separator='', strip=True), href))
+    return results
+
+
+PARSERS: dict[str, Callable[[bytes, str], list[tuple[str, str | None]]]] = {
+    'html.parser': lambda content, selector: select_with_beautifulsoup(content, selector, 'html.parser'),
+}
+if lxml is not None:
+    PARSERS['lxml'] = lambda content, selector: select_with_beautifulsoup(content, selector, 'lxml')
+if LexborHTMLParser is not None:
+    PARSERS['lexbor'] = select_with_lexbor
+
+# Parsers in order of preference when a page doesn't ask for a specific one
+PARSER_PREFERENCE = ['lexbor', 'lxml', 'html.parser']
+
+
+def get_parser(name: str = 'auto') -> Callable[[bytes, str], list[tuple[str, str | None]]]:
+    """
+    Get the parser backend with the given name. If the name is "auto" or the
+    backend is not installed, the fastest installed backend is used instead.
+    """
+    if name in PARSERS:
+        return PARSERS[name]
+    for name in PARSER_PREFERENCE:
+        if name in PARSERS:
+            return PARSERS[name]
@@ -0,0 +1,182 @@
+"""
+Per-host rate limiting for the scraper. Requests to each host are paced
+by a token bucket, and a host that responds with HTTP 429 and a Retry-After
+header is paused until the time it asked for. The number of requests sent to
+a host at the same time is limited separately, across every page being scraped.
+"""
+from collections.abc import Iterator
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from threading import BoundedSemaphore, Lock
+import time
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """
+    Get the number of seconds to wait from a Retry-After header, which is
+    either a number of seconds or an HTTP date. Returns None if it is invalid.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class TokenBucket:
+    """
+    A token bucket that allows `burst` requests at once and
+    `rate` requests per second on average after that
+    """
+    def __init__(self, rate: float, burst: int):
+        self.lock = Lock()
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self) -> float:
+        """
+        Number of seconds until a request can be sent without waiting
+        """
+        with self.lock:
+            now = time.monotonic()
+            self._refill(now)
+            if now < self.paused_until:
+                return self.paused_until - now
+            if self.tokens >= 1 or self.rate <= 0:
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+    def acquire(self) -> None:
+        """
+        Wait until a request can be sent, and take a token for it
+        """
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self.paused_until:
+                    wait = self.paused_until - now
+                elif self.tokens >= 1 or self.rate <= 0:
+                    self.tokens -= 1
+                    return
+                else:
+                    wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def pause(self, seconds: float) -> None:
+        """
+        Don't allow any requests for the given number of seconds
+        """
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+class RateLimiter:
+    """
+    Token buckets for every host the scraper sends requests to, along with the
+    number of requests sent to each host and how many of them were throttled
+    """
+    def __init__(self, rate: float, burst: int):
+        self.lock = Lock()
+        self.rate = rate
+        self.burst = burst
+        self.buckets: dict[str, TokenBucket] = {}
+        self.stats: dict[str, dict[str, int]] = {}
+
+    def configure(self, host: str, rate: float | None, burst: int | None) -> None:
+        """
+        Set the rate limit of a host, as configured on the server
+        """
+        with self.lock:
+            self.buckets[host] = TokenBucket(rate or self.rate, burst or self.burst)
+
+    def get_bucket(self, host: str) -> TokenBucket:
+        with self.lock:
+            if host not in self.buckets:
+                self.buckets[host] = TokenBucket(self.rate, self.burst)
+            return self.buckets[host]
+
+    def wait_time(self, host: str) -> float:
+        """
+        Number of seconds until a request can be sent to the host without waiting
+        """
+        return self.get_bucket(host).wait_time()
+
+    def acquire(self, host: str) -> None:
+        """
+        Wait until a request can be sent to the host
+        """
+        self.get_bucket(host).acquire()
+        self._count(host, 'requests')
+
+    def throttled(self, host: str, retry_after: float | None) -> None:
+        """
+        Record that a request to the host was throttled, and pause
+        the host for `retry_after` seconds if it asked for it
+        """
+        self._count(host, 'throttled')
+        if retry_after:
+            self.get_bucket(host).pause(retry_after)
+
+    def _count(self, host: str, key: str) -> None:
+        with self.lock:
+            stats = self.stats.setdefault(host, {'requests': 0, 'throttled': 0})
+            stats[key] += 1
+
+    def pop_stats(self) -> dict[str, dict[str, int]]:
+        """
+        Get the number of requests and throttled requests for each
+        host since the last time this was called, and reset them
+        """
+        with self.lock:
+            stats = self.stats
+            self.stats = {}
+        return stats
+
+
+class HostSlots:
+    """
+    Limits the number of requests sent to each host at the same time to `limit`,
+    however many pages of the host and pages of their results are being fetched
+    """
+    def __init__(self, limit: int):
+        self.lock = Lock()
+        self.limit = max(1, limit)
+        self.semaphores: dict[str, BoundedSemaphore] = {}
+
+    def configure(self, limit: int) -> None:
+        """
+        Change the limit, at the start of a run
+        """
+        with self.lock:
+            self.limit = max(1, limit)
+            self.semaphores = {}
+
+    @contextmanager
+    def hold(self, host: str) -> Iterator[None]:
+        """
+        Wait until fewer than `limit` requests are being sent to the
+        host, and take one of its slots until the request is done
+        """
+        with self.lock:
+            if host not in self.semaphores:
+                self.semaphores[host] = BoundedSemaphore(self.limit)
+            semaphore = self.semaphores[host]
+        with semaphore:
+            yield
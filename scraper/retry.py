@@ -0,0 +1,115 @@
+"""
+Retries with backoff and a per-host circuit breaker for scraper requests.
+A host that keeps failing after retries is skipped for the rest of the run
+instead of making every remaining page on it wait for its timeouts.
+"""
+import random
+from threading import Lock
+
+import requests
+
+# Status codes worth retrying, since they usually mean the host is briefly
+# overloaded or restarting rather than that the request is wrong
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(requests.RequestException):
+    """Raised instead of sending a request to a host whose circuit breaker is open"""
+
+
+def backoff_delay(attempt: int, base: float, maximum: float) -> float:
+    """
+    Number of seconds to wait before retry number `attempt` (starting at 0),
+    using exponential backoff with full jitter
+    """
+    return random.uniform(0, min(maximum, base * 2 ** attempt))
+
+
+class CircuitBreaker:
+    """
+    Counts consecutive failed requests to each host, and opens the circuit of a
+    host once `threshold` requests in a row have failed. Requests to a host with
+    an open circuit are not sent until the breaker is reset.
+    """
+    def __init__(self, threshold: int):
+        self.lock = Lock()
+        self.threshold = threshold
+        self.failures: dict[str, int] = {}
+        self.open_hosts: dict[str, str] = {}
+        self.stats: dict[str, dict[str, int | bool]] = {}
+
+    def check(self, host: str) -> None:
+        """
+        Raise CircuitOpenError if the circuit of the host is open
+        """
+        with self.lock:
+            if host not in self.open_hosts:
+                return
+            self._stats(host)['skipped'] += 1
+            reason = self.open_hosts[host]
+        raise CircuitOpenError(f'Skipped {host} {reason}')
+
+    def is_open(self, host: str) -> bool:
+        """
+        Check whether the circuit of the host is open
+        """
+        with self.lock:
+            return host in self.open_hosts
+
+    def success(self, host: str) -> None:
+        """
+        Record that a request to the host succeeded
+        """
+        with self.lock:
+            self.failures[host] = 0
+
+    def failure(self, host: str) -> None:
+        """
+        Record that a request to the host failed after all retries,
+        opening the host's circuit if it failed too many times in a row
+        """
+        with self.lock:
+            self.failures[host] = self.failures.get(host, 0) + 1
+            stats = self._stats(host)
+            stats['failures'] += 1
+            if self.threshold > 0 and self.failures[host] >= self.threshold:
+                self._open(host, f'after {self.threshold} failed requests in a row')
+
+    def trip(self, host: str, reason: str) -> None:
+        """
+        Record that a request to the host failed and open the host's circuit right
+        away, such as when the host asked us to wait longer than we are willing to
+        """
+        with self.lock:
+            self.failures[host] = self.failures.get(host, 0) + 1
+            self._stats(host)['failures'] += 1
+            self._open(host, reason)
+
+    def _open(self, host: str, reason: str) -> None:
+        if host in self.open_hosts:
+            return
+        self.open_hosts[host] = reason
+        self._stats(host)['circuit_open'] = True
+        print(f'Circuit breaker opened for {host} {reason}, skipping it for the rest of the run')
+
+    def _stats(self, host: str) -> dict[str, int | bool]:
+        return self.stats.setdefault(host, {'failures': 0, 'skipped': 0, 'circuit_open': False})
+
+    def reset(self) -> None:
+        """
+        Close every circuit and forget all failures, at the start of a new run
+        """
+        with self.lock:
+            self.failures = {}
+            self.open_hosts = {}
+            self.stats = {}
+
+    def pop_stats(self) -> dict[str, dict[str, int | bool]]:
+        """
+        Get the number of failed and skipped requests for each host and whether
+        its circuit is open, and reset the counts
+        """
+        with self.lock:
+            stats = self.stats
+            self.stats = {}
+        return stats
@@ -14,6 +14,8 @@ class Page:
     url: str
     selector: str
     response_type: str = 'html'
+    parser: str = 'auto'
+    stream_response: bool = False
     request_method: str = 'GET'
     request_payload: dict = None
     title_key: str = ''
@@ -21,6 +23,27 @@ class Page:
     job_url_key: str = ''
     job_url_prefix: str = ''
     api_url: str = ''
+    pagination_type: str = 'none'
+    pagination_param: str = ''
+    pagination_limit_param: str = ''
+    pagination_page_size: int = 0
+    pagination_start: int = 0
+    pagination_total_key: str = ''
+    pagination_cursor_key: str = ''
+    pagination_max_pages: int = 50
+    etag: str = ''
+    last_modified: str = ''
+    content_hash: str = ''
+    job_fingerprint: str = ''
+    # Hash of the scrape settings the validators above were saved with
+    config_hash: str = ''
+    # Rate limit of the page's host, if configured on the server
+    rate_limit: float | None = None
+    rate_burst: int | None = None
+    # Set by the scraper when the page has not changed since it was last scraped
+    unchanged: bool = False
+    # Set by the scraper when the page, or some pages of its results, could not be scraped
+    failed: bool = False
 
 
 @dataclass
@@ -4,13 +4,26 @@ scrapes the pages in the messages, and POSTs found jobs
 back to the server.
 """
 from argparse import ArgumentParser
-from bs4 import BeautifulSoup
+from collections.abc import Iterator
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from datetime import datetime
+import hashlib
 import json
 import os
 import requests
+import time
+from urllib.parse import urlparse
 
+from batches import PushBatcher
+from extractors import JsonExtractor, get_json_extractor
+from pagination import get_first_request, get_next_request, get_page_size, get_remaining_requests, get_total
+from parsers import get_parser
+from ratelimit import HostSlots, RateLimiter, parse_retry_after
+from retry import RETRY_STATUS_CODES, CircuitBreaker, backoff_delay
 from schema import Job, Page, ScrapeError
+from sessions import get_session
+from validators import Validators, get_validator_store
+from wire import encode_body, encode_compact, encode_original
 
 is_lambda = "AWS_LAMBDA_FUNCTION_NAME" in os.environ
 
@@ -19,18 +32,60 @@ if is_lambda:
 else:
     SERVER_URL = 'http://127.0.0.1:8000'
 
+# Maximum number of pages scraped at the same time, and the maximum
+# number of those pages that can be fetched from a single host at once
+CONCURRENCY = int(os.environ.get('HAWK_SCRAPER_CONCURRENCY', 8))
+HOST_CONCURRENCY = int(os.environ.get('HAWK_SCRAPER_HOST_CONCURRENCY', 2))
+# Maximum number of pages of a paginated API fetched at the same time. Requests
+# to a single host are still limited to HOST_CONCURRENCY at a time.
+PAGINATION_CONCURRENCY = int(os.environ.get('HAWK_SCRAPER_PAGINATION_CONCURRENCY', 4))
+HOST_SLOTS = HostSlots(HOST_CONCURRENCY)
 
-def recursive_getattr(obj: dict, attr_list: list[str], default=None):
-    """
-    Recursively get an attribute from a dictionary using a list of keys.
-    If the attribute does not exist, return the default value.
-    """
-    for attr in attr_list:
-        if isinstance(obj, dict) and attr in obj:
-            obj = obj[attr]
-        else:
-            return default
-    return obj
+# Default number of requests per second and burst size allowed for a
+# host, unless the server sends a different limit for the host
+RATE_LIMITER = RateLimiter(
+    rate=float(os.environ.get('HAWK_SCRAPER_RATE_LIMIT', 2)),
+    burst=int(os.environ.get('HAWK_SCRAPER_RATE_BURST', 4)),
+)
+# Longest Retry-After (in seconds) we wait for before retrying a throttled request
+MAX_RETRY_AFTER = float(os.environ.get('HAWK_SCRAPER_MAX_RETRY_AFTER', 30))
+
+# Seconds to wait for a connection to a host, and for the host to send data
+CONNECT_TIMEOUT = float(os.environ.get('HAWK_SCRAPER_CONNECT_TIMEOUT', 5))
+READ_TIMEOUT = float(os.environ.get('HAWK_SCRAPER_READ_TIMEOUT', 30))
+# Number of times a request that failed with a transient error is retried,
+# and the base and maximum delay (in seconds) of the backoff between retries
+MAX_RETRIES = int(os.environ.get('HAWK_SCRAPER_MAX_RETRIES', 2))
+BACKOFF_BASE = float(os.environ.get('HAWK_SCRAPER_BACKOFF_BASE', 0.5))
+BACKOFF_MAX = float(os.environ.get('HAWK_SCRAPER_BACKOFF_MAX', 8))
+# Hosts are skipped for the rest of the run after this many failed requests in a row
+CIRCUIT_BREAKER = CircuitBreaker(threshold=int(os.environ.get('HAWK_SCRAPER_BREAKER_THRESHOLD', 3)))
+
+# Where the ETag, Last-Modified and content hash of each page are kept
+# between runs. If None, every page is always downloaded and parsed.
+VALIDATOR_STORE = get_validator_store(is_lambda)
+
+# Format of the data pushed to the server. Version 2 sends the details of each
+# page once instead of with every job, with jobs as columns unless
+# HAWK_PUSH_COLUMNAR is 0. Set HAWK_PUSH_FORMAT_VERSION to 1 to push in the
+# original format to a server that doesn't support the compact format yet.
+PUSH_FORMAT_VERSION = int(os.environ.get('HAWK_PUSH_FORMAT_VERSION', 2))
+PUSH_COLUMNAR = os.environ.get('HAWK_PUSH_COLUMNAR', '1') != '0'
+# Whether pushed data is compressed with gzip
+PUSH_COMPRESSION = os.environ.get('HAWK_PUSH_COMPRESSION', '1') != '0'
+# Jobs are pushed in batches of about this many jobs or bytes (before compression)
+# while scraping continues, instead of all at once when every page is scraped
+PUSH_BATCH_JOBS = int(os.environ.get('HAWK_PUSH_BATCH_JOBS', 2000))
+PUSH_BATCH_BYTES = int(os.environ.get('HAWK_PUSH_BATCH_BYTES', 1024 * 1024))
+
+# Fields of a page that decide which jobs are found on it, see get_scrape_config_hash
+SCRAPE_CONFIG_FIELDS = (
+    'url', 'api_url', 'selector', 'response_type', 'parser', 'stream_response',
+    'request_method', 'request_payload', 'title_key', 'job_id_key', 'job_url_key',
+    'job_url_prefix', 'pagination_type', 'pagination_param', 'pagination_limit_param',
+    'pagination_page_size', 'pagination_start', 'pagination_total_key',
+    'pagination_cursor_key', 'pagination_max_pages',
+)
 
 
 def get_page_list(page_list: list[dict] | None = None) -> list[Page]:
@@ -41,7 +96,7 @@ def get_page_list(page_list: list[dict] | None = None) -> list[Page]:
     results = []
     if page_list is None:
         url = SERVER_URL + '/api/pages/list'
-        request = requests.get(url)
+        request = get_session(url).get(url)
         if request.status_code == 200:
             data = request.json()
         else:
@@ -58,22 +113,175 @@ def get_page_list(page_list: list[dict] | None = None) -> list[Page]:
             api_url=page['api_url'],
             selector=page['selector'],
             response_type=page['response_type'],
+            parser=page.get('parser', 'auto') or 'auto',
+            stream_response=page.get('stream_response', False) or False,
             request_method=page['request_method'],
             request_payload=page.get('request_payload', {}),
             title_key=page.get('title_key', ''),
             job_id_key=page.get('job_id_key', '') or '',
             job_url_key=page.get('job_url_key', '') or '',
             job_url_prefix=page.get('job_url_prefix', '') or '',
+            pagination_type=page.get('pagination_type', 'none') or 'none',
+            pagination_param=page.get('pagination_param', '') or '',
+            pagination_limit_param=page.get('pagination_limit_param', '') or '',
+            pagination_page_size=page.get('pagination_page_size', 0) or 0,
+            pagination_start=page.get('pagination_start', 0) or 0,
+            pagination_total_key=page.get('pagination_total_key', '') or '',
+            pagination_cursor_key=page.get('pagination_cursor_key', '') or '',
+            pagination_max_pages=page.get('pagination_max_pages', 50) or 50,
+            etag=page.get('etag', '') or '',
+            last_modified=page.get('last_modified', '') or '',
+            content_hash=page.get('content_hash', '') or '',
+            job_fingerprint=page.get('job_fingerprint', '') or '',
+            config_hash=page.get('config_hash', '') or '',
+            rate_limit=page.get('rate_limit'),
+            rate_burst=page.get('rate_burst'),
         ))
     return results
 
 
+class HashingReader:
+    """
+    A file-like wrapper around the body of a streamed response
+    that hashes the (decompressed) body as it is read
+    """
+    def __init__(self, response):
+        self.raw = response.raw
+        self.hash = hashlib.sha256()
+
+    def read(self, size: int = -1) -> bytes:
+        data = self.raw.read(None if size < 0 else size, decode_content=True)
+        self.hash.update(data)
+        return data
+
+
+def get_scrape_config_hash(page: Page) -> str:
+    """
+    Get a hash of the settings that decide how the jobs on a page are found.
+    Validators and job fingerprints saved with different settings (such as before
+    a broken selector was fixed) say nothing about the jobs found now.
+    """
+    config = {field: getattr(page, field) for field in SCRAPE_CONFIG_FIELDS}
+    return hashlib.sha256(json.dumps(config, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def get_job_fingerprint(jobs: list[Job], config_hash: str = '') -> str:
+    """
+    Get a hash of the set of jobs found on a page with the given scrape settings,
+    which does not depend on the order of the jobs or on when they were found
+    """
+    job_keys = sorted(set((job.title, job.job_id, job.url) for job in jobs))
+    return hashlib.sha256(json.dumps([config_hash, job_keys]).encode()).hexdigest()
+
+
+def send_request(session: requests.Session, page: Page, url: str, headers: dict, payload: dict | None, stream: bool = False) -> requests.Response:
+    """
+    Send a request for a page using the page's request method, waiting for the
+    rate limit of the host and for one of its HOST_SLOTS. Connection errors, timeouts and transient error
+    responses are retried with jittered exponential backoff, or after the time
+    the host asked for in a Retry-After header, unless that is longer than
+    MAX_RETRY_AFTER, which opens the host's circuit breaker. A request that
+    still fails counts towards the host's circuit breaker, and once it opens,
+    CircuitOpenError is raised without sending any more requests to the host.
+    """
+    host = urlparse(url).netloc.lower()
+    for attempt in range(MAX_RETRIES + 1):
+        CIRCUIT_BREAKER.check(host)
+        RATE_LIMITER.acquire(host)
+        try:
+            with HOST_SLOTS.hold(host):
+                if page.request_method == 'POST':
+                    response = session.post(url, headers=headers, json=payload, stream=stream, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT))
+                elif page.request_method == 'PUT':
+                    response = session.put(url, headers=headers, json=payload, stream=stream, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT))
+                else:
+                    response = session.get(url, headers=headers, stream=stream, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT))
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if attempt == MAX_RETRIES:
+                CIRCUIT_BREAKER.failure(host)
+                raise
+            delay = backoff_delay(attempt, BACKOFF_BASE, BACKOFF_MAX)
+            print(f'{e.__class__.__name__} for {url}, retrying in {delay:.1f}s')
+            time.sleep(delay)
+            continue
+        if response.status_code not in RETRY_STATUS_CODES:
+            CIRCUIT_BREAKER.success(host)
+            return response
+        retry_after = parse_retry_after(response.headers.get('Retry-After'))
+        if response.status_code == 429:
+            RATE_LIMITER.throttled(host, min(retry_after, MAX_RETRY_AFTER) if retry_after is not None else None)
+        if retry_after is not None and retry_after > MAX_RETRY_AFTER:
+            # Rather than waiting that long, skip the host for the rest of the run
+            CIRCUIT_BREAKER.trip(host, f'after it asked to wait {retry_after:.0f}s')
+            return response
+        if attempt == MAX_RETRIES:
+            CIRCUIT_BREAKER.failure(host)
+            return response
+        response.close()
+        delay = retry_after if retry_after is not None else backoff_delay(attempt, BACKOFF_BASE, BACKOFF_MAX)
+        print(f'Error: {response.status_code} for {url}, retrying in {delay:.1f}s')
+        # The rate limiter already holds back requests to a throttled host until it is ready
+        if response.status_code != 429 or retry_after is None:
+            time.sleep(delay)
+    return response
+
+
+def scrape_remaining_pages(session: requests.Session, page: Page, url: str, headers: dict, payload: dict | None, extractor: JsonExtractor, first_response, n_jobs: int) -> tuple[list[tuple[str, str, str]], list[ScrapeError]]:
+    """
+    Fetch the pages of a paginated API after the first one and extract their jobs.
+    If the first response reports the total number of jobs, the remaining pages are
+    fetched in parallel. Otherwise they are fetched one by one until a page has no jobs.
+    """
+    extracted_jobs = []
+    errors = []
+    page_size = get_page_size(page, url, payload, n_jobs)
+
+    def fetch(page_url: str, page_payload: dict | None) -> tuple[object, list[tuple[str, str, str]]]:
+        request = send_request(session, page, page_url, headers, page_payload)
+        request.raise_for_status()
+        response = request.json()
+        return response, list(extractor.extract(response))
+
+    total = get_total(page, first_response)
+    if total is not None and page.pagination_type != 'cursor':
+        remaining = get_remaining_requests(page, url, payload, page_size, total)
+        with ThreadPoolExecutor(max_workers=max(1, PAGINATION_CONCURRENCY)) as executor:
+            futures = [executor.submit(fetch, page_url, page_payload) for page_url, page_payload in remaining]
+            for (page_url, _), future in zip(remaining, futures):
+                try:
+                    extracted_jobs.extend(future.result()[1])
+                except (requests.RequestException, ValueError) as e:
+                    errors.append(ScrapeError(page=page, error=f'Error fetching next page {page_url}: {e}'))
+        return extracted_jobs, errors
+
+    response = first_response
+    n_requests = 1
+    next_request = get_next_request(page, url, payload, response, n_requests, page_size)
+    while next_request is not None:
+        try:
+            response, jobs = fetch(*next_request)
+        except (requests.RequestException, ValueError) as e:
+            errors.append(ScrapeError(page=page, error=f'Error fetching next page {next_request[0]}: {e}'))
+            break
+        if not jobs:
+            break
+        extracted_jobs.extend(jobs)
+        n_requests += 1
+        if page.pagination_type != 'cursor' and len(jobs) < page_size:
+            break
+        next_request = get_next_request(page, url, payload, response, n_requests, page_size)
+    return extracted_jobs, errors
+
+
 def scrape_page(page: Page) -> tuple[list[Job], list[ScrapeError]]:
     """
     Scrape the page at the given URL and return a list of Jobs found
-    and a list of any errors encountered during scraping.
+    and a list of any errors encountered during scraping. If the page has
+    not changed since it was last scraped, it is marked as unchanged and
+    no jobs are returned.
     """
     results = []
+    errors = []
     url = page.url
     if page.api_url:
         url = page.api_url
@@ -88,49 +296,79 @@ def scrape_page(page: Page) -> tuple[list[Job], list[ScrapeError]]:
         "Sec-Fetch-Mode": "cors",
         "Sec-Fetch-Dest": "empty"
     }
-    if page.request_method == 'POST':
-        # Specifically for Uber's careers page, which sets the CSRF token to "x"
-        if page.company == 'Uber':
-            headers['x-csrf-token'] = 'x'
-        try:
-            request = requests.post(url, headers=headers, json=page.request_payload)
-        except ConnectionError:
-            return ([], [ScrapeError(
-                page=page,
-                error=f'ConnectionError for {url}'
-            )])
-    elif page.request_method == 'PUT':
-        try:
-            request = requests.put(url, headers=headers, json=page.request_payload)
-        except ConnectionError:
-            return ([], [ScrapeError(
-                page=page,
-                error=f'ConnectionError for {url}'
-            )])
+    config_hash = get_scrape_config_hash(page)
+    extractor = get_json_extractor(page) if page.response_type == 'json' else None
+    paginated = extractor is not None and page.pagination_type != 'none' and bool(page.pagination_param)
+    if paginated:
+        # Later pages can change even if the first one didn't, so validators aren't used
+        validators = Validators()
     else:
-        try:
-            request = requests.get(url, headers=headers)
-        except ConnectionError:
-            return ([], [ScrapeError(
-                page=page,
-                error=f'ConnectionError for {url}'
-            )])
+        validators = VALIDATOR_STORE.get(page) if VALIDATOR_STORE else Validators()
+        if validators.config_hash != config_hash:
+            # The page's scrape settings changed, so it must be scraped again
+            validators = Validators()
+    session = get_session(url, pool_size=HOST_CONCURRENCY)
+    # Very large JSON responses are parsed while they are downloaded
+    stream = page.stream_response and not paginated and extractor is not None and extractor.can_stream()
+    url, payload = get_first_request(page, url, page.request_payload) if paginated else (url, page.request_payload)
+    # Specifically for Uber's careers page, which sets the CSRF token to "x"
+    if page.request_method == 'POST' and page.company == 'Uber':
+        headers['x-csrf-token'] = 'x'
+    if page.request_method not in ['POST', 'PUT']:
+        if validators.etag:
+            headers['If-None-Match'] = validators.etag
+        if validators.last_modified:
+            headers['If-Modified-Since'] = validators.last_modified
+    try:
+        request = send_request(session, page, url, headers, payload, stream=stream)
+    except requests.RequestException as e:
+        print(f'{e.__class__.__name__} for {url}: {e}')
+        return ([], [ScrapeError(
+            page=page,
+            error=f'{e.__class__.__name__} for {url}: {e}'
+        )])
+    if request.status_code == 304:
+        request.close()
+        page.unchanged = True
+        return [], []
     if request.status_code != 200:
+        request.close()
         print(f'Error: {request.status_code} for {url}')
         return ([], [ScrapeError(
             page=page,
             error=f'Error: {request.status_code} for {url}'
         )])
+    if stream:
+        # The body is hashed as it is parsed, so whether it changed is only known at the end
+        reader = HashingReader(request)
+        with request:
+            extracted_jobs = list(extractor.extract_stream(reader))
+        content_hash = reader.hash.hexdigest()
+    else:
+        content_hash = hashlib.sha256(request.content).hexdigest()
+    if VALIDATOR_STORE and not paginated:
+        # Only saved to the store once the page's jobs were pushed, so that
+        # they are scraped again if the push fails
+        page.etag = request.headers.get('ETag', '')
+        page.last_modified = request.headers.get('Last-Modified', '')
+        page.content_hash = content_hash
+        page.config_hash = config_hash
+    # Servers that don't send validators may still send the same body
+    if content_hash == validators.content_hash:
+        page.unchanged = True
+        return [], []
     # Response type is JSON
     if page.response_type == 'json':
-        response = request.json()
+        if not stream:
+            response = request.json()
+            extracted_jobs = list(extractor.extract(response))
+            if paginated:
+                more_jobs, errors = scrape_remaining_pages(
+                    session, page, url, headers, payload, extractor, response, len(extracted_jobs)
+                )
+                extracted_jobs.extend(more_jobs)
         timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        if page.selector == '':
-            jobs = response
-        else:
-            jobs = recursive_getattr(response, page.selector.split(','), [])
-        for job in jobs:
-            title = recursive_getattr(job, page.title_key.split(',')).strip()
+        for title, job_id, job_url in extracted_jobs:
             if title:
                 results.append(Job(
                     title=title,
@@ -138,23 +376,19 @@ def scrape_page(page: Page) -> tuple[list[Job], list[ScrapeError]]:
                     company_id=page.company_id,
                     page=page,
                     last_seen=timestamp,
-                    job_id=str(recursive_getattr(job, page.job_id_key.split(','), '')).strip(),
-                    url=page.job_url_prefix + str(recursive_getattr(job, page.job_url_key.split(','), ''))
+                    job_id=job_id,
+                    url=job_url,
                 ))
     # Response type is HTML
     else:
-        soup = BeautifulSoup(request.content, 'html.parser')
-        elements = soup.select(page.selector)
+        parse = get_parser(page.parser)
+        elements = parse(request.content, page.selector)
         timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
 
-        for element in elements:
-            title = element.get_text(strip=True)
-            closest_a = element.find_parent('a')
-            if not closest_a and element.has_attr('href'):
-                closest_a = element
+        for title, href in elements:
             job_url = ''
-            if closest_a and closest_a.has_attr('href'):
-                job_url = closest_a['href']
+            if href is not None:
+                job_url = href
                 if page.job_url_prefix:
                     job_url = page.job_url_prefix + job_url
             if title:
@@ -167,64 +401,177 @@ def scrape_page(page: Page) -> tuple[list[Job], list[ScrapeError]]:
                     job_id='',
                     url=job_url,
                 ))
+    # Some pages of a paginated API failed, so the jobs found are incomplete
+    if errors:
+        return results, errors
+    # Don't send the jobs again if they are the same as the last time the page was scraped
+    fingerprint = get_job_fingerprint(results, config_hash)
+    if fingerprint == page.job_fingerprint:
+        page.unchanged = True
+        return [], []
+    page.job_fingerprint = fingerprint
     return results, []
 
 
-def push_jobs(jobs: list[Job], errors: list[ScrapeError], timestamp: str, push_id: int = -1) -> bool:
+def get_host(page: Page) -> str:
     """
-    Push scraped jobs to the server
+    Get the host that will be requested when scraping the given page
     """
-    # If we are testing locally, create a new push
-    if not is_lambda:
+    return urlparse(page.api_url or page.url).netloc.lower()
+
+
+def iter_scraped_pages(pages: list[Page], concurrency: int | None = None, host_concurrency: int | None = None) -> Iterator[tuple[int, list[Job], list[ScrapeError]]]:
+    """
+    Scrape the given pages in parallel using a pool of `concurrency` threads,
+    fetching at most `host_concurrency` pages from the same host at a time.
+    Yields the index of each page along with its jobs and errors as soon as
+    the page is scraped.
+    """
+    concurrency = max(1, concurrency or CONCURRENCY)
+    host_concurrency = max(1, host_concurrency or HOST_CONCURRENCY)
+    HOST_SLOTS.configure(host_concurrency)
+    # Pages waiting to be scraped, grouped by host
+    queued = {}
+    for index, page in enumerate(pages):
+        host = get_host(page)
+        if host not in queued and page.rate_limit:
+            RATE_LIMITER.configure(host, page.rate_limit, page.rate_burst)
+        queued.setdefault(host, []).append((index, page))
+    in_flight = {host: 0 for host in queued}
+
+    def scrape(page: Page) -> tuple[list[Job], list[ScrapeError]]:
+        print(f'Scraping page: {page.name} ({page.url})')
+        try:
+            res, err = scrape_page(page)
+        except Exception as e:
+            res, err = [], [ScrapeError(page=page, error=f'Unexpected error for {page.url}: {e!r}')]
+        # The server leaves the validators and jobs of pages that failed as they were
+        page.failed = bool(err)
+        print(f'Found {len(res)} jobs and {len(err)} errors on {page.name}\n')
+        return res, err
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        running = {}
+        while queued or running:
+            # Fill the pool with pages whose host still has capacity and is within
+            # its rate limit, taking one page from each host in turn so that no
+            # single host gets a burst of requests while others are idle
+            next_ready = None
+            submitted = True
+            while submitted and len(running) < concurrency:
+                submitted = False
+                for host in list(queued):
+                    if len(running) >= concurrency:
+                        break
+                    if in_flight[host] >= host_concurrency:
+                        continue
+                    # Pages of a host whose circuit is open fail without sending
+                    # a request, so there's no need to wait for its rate limit
+                    wait_time = 0 if CIRCUIT_BREAKER.is_open(host) else RATE_LIMITER.wait_time(host)
+                    if wait_time > 0:
+                        next_ready = wait_time if next_ready is None else min(next_ready, wait_time)
+                        continue
+                    index, page = queued[host].pop(0)
+                    # Move the host to the back of the line
+                    pages_left = queued.pop(host)
+                    if pages_left:
+                        queued[host] = pages_left
+                    in_flight[host] += 1
+                    running[executor.submit(scrape, page)] = (index, host)
+                    submitted = True
+            if not running:
+                time.sleep(next_ready or 0)
+                continue
+            # Check again when a page is done or a rate limited host is ready
+            done, _ = wait(running, timeout=next_ready, return_when=FIRST_COMPLETED)
+            for future in done:
+                index, host = running.pop(future)
+                in_flight[host] -= 1
+                yield index, *future.result()
+
+
+def scrape_pages(pages: list[Page], concurrency: int | None = None, host_concurrency: int | None = None) -> tuple[list[Job], list[ScrapeError]]:
+    """
+    Scrape the given pages in parallel, and return their jobs and
+    errors in the same order as the pages were given
+    """
+    page_results = [([], [])] * len(pages)
+    for index, res, err in iter_scraped_pages(pages, concurrency, host_concurrency):
+        page_results[index] = (res, err)
+    results = []
+    errors = []
+    for res, err in page_results:
+        results.extend(res)
+        errors.extend(err)
+    return results, errors
+
+
+def push_jobs(jobs: list[Job], errors: list[ScrapeError], timestamp: str, push_id: int = -1, pages: list[Page] | None = None, hosts: dict | None = None, batch_id: str = '', chunks: list[int] | None = None) -> int | None:
+    """
+    Push scraped jobs to the server, along with the cache validators and
+    job fingerprints of the scraped pages, whether each page was unchanged or failed,
+    and the number of requests, throttled, failed and skipped requests for
+    each host along with whether its circuit breaker was opened. The data is
+    sent in the format set by PUSH_FORMAT_VERSION, compressed with gzip
+    unless PUSH_COMPRESSION is False.
+
+    Failed requests are retried with the same batch ID, so the server can
+    recognise a batch it has already received. Returns the ID of the push
+    the jobs were added to, or None if they could not be pushed.
+
+    `chunks` is only given for the last batch of a run, and lists the chunks
+    of pages the run scraped, so the server knows when every chunk of the push
+    has been scraped and can notify users about all of its new jobs at once.
+    """
+    # If we are testing locally, create a new push for the first batch
+    if not is_lambda and push_id == -1:
         url = SERVER_URL + '/api/push/create'
     # Otherwise, update an existing push
     else:
         url = SERVER_URL + '/api/push/update'
     data = {
-        'jobs': [],
         'timestamp': timestamp,
-        'errors': [],
         'n_jobs_found': len(jobs),
         'n_errors': len(errors),
         'push_id': push_id,
+        'batch_id': batch_id,
+        'hosts': hosts or {},
+        'final': chunks is not None,
+        'chunks': chunks or [],
     }
-    for job in jobs:
-        data['jobs'].append({
-            'title': job.title,
-            'company': job.company,
-            'company_id': job.company_id,
-            'page': {
-                'id': job.page.id,
-                'name': job.page.name,
-                'company': job.page.company,
-                'url': job.page.url,
-                'selector': job.page.selector,
-            },
-            'last_seen': job.last_seen,
-            'job_id': job.job_id,
-            'url': job.url,
-        })
-
-    for error in errors:
-        data['errors'].append({
-            'page': {
-                'name': error.page.name,
-                'company': error.page.company,
-                'url': error.page.url,
-                'selector': error.page.selector,
-            },
-            'error': error.error,
-        })
-    request = requests.post(url, json={'time': timestamp, 'data': data}, headers={'X-API-Key': os.environ.get('HAWK_API_KEY')})
-    return request.status_code == 200
+    if PUSH_FORMAT_VERSION >= 2:
+        data.update(encode_compact(jobs, errors, pages or [], columnar=PUSH_COLUMNAR))
+    else:
+        data.update(encode_original(jobs, errors, pages or []))
+    body, headers = encode_body({'time': timestamp, 'data': data}, compress=PUSH_COMPRESSION)
+    headers['X-API-Key'] = os.environ.get('HAWK_API_KEY')
+    for attempt in range(MAX_RETRIES + 1):
+        if attempt:
+            time.sleep(backoff_delay(attempt - 1, BACKOFF_BASE, BACKOFF_MAX))
+        try:
+            response = get_session(url).post(url, data=body, headers=headers, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT))
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            print(f'Error pushing batch {batch_id}: {e!r}')
+            continue
+        if response.ok:
+            try:
+                return response.json().get('push_id', push_id)
+            except ValueError:
+                return push_id
+        print(f'Error pushing batch {batch_id}: HTTP {response.status_code}')
+        if response.status_code not in RETRY_STATUS_CODES:
+            break
+    return None
 
 
 def lambda_handler(event, context):
     """
     Get pages to scrape from the server, scrape those pages,
-    and push scraped job data back to the server
+    and push scraped job data back to the server. Raises an
+    error if any batch of jobs could not be pushed.
     """
     push_id = -1
+    chunks = []
     if not is_lambda:
         pages = get_page_list()
     else:
@@ -234,18 +581,37 @@ def lambda_handler(event, context):
                 data = json.loads(record['body'])
                 pages.extend(get_page_list(data['data']))
                 push_id = data['push_id']
+                if data.get('chunk') is not None:
+                    chunks.append(data['chunk'])
             except json.JSONDecodeError:
                 print(f'Invalid JSON body: {record["body"]}')
-    results = []
-    errors = []
-    if pages:
-        for page in pages:
-            print(f'Scraping page: {page.name} ({page.url})')
-            res, err = scrape_page(page)
-            results.extend(res)
-            errors.extend(err)
-            print(f'Found {len(res)} jobs and {len(err)} errors on {page.name}\n')
-    push_jobs(results, errors, datetime.now().strftime('%Y-%m-%d %H:%M:%S'), push_id)
+    CIRCUIT_BREAKER.reset()
+    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+    def send(jobs, errors, batch_pages, batch_push_id, batch_id, hosts, batch_chunks):
+        print(f'Pushing {len(jobs)} jobs and {len(errors)} errors from {len(batch_pages)} pages')
+        pushed_id = push_jobs(jobs, errors, timestamp, batch_push_id, batch_pages, hosts, batch_id, batch_chunks)
+        if pushed_id is not None and VALIDATOR_STORE:
+            VALIDATOR_STORE.save(batch_pages)
+        return pushed_id
+
+    # Send jobs to the server in batches while the remaining pages are scraped
+    batcher = PushBatcher(pages, push_id, send, max_jobs=PUSH_BATCH_JOBS, max_bytes=PUSH_BATCH_BYTES)
+    for index, res, err in iter_scraped_pages(pages):
+        batcher.add(index, res, err)
+    hosts = RATE_LIMITER.pop_stats()
+    for host, stats in CIRCUIT_BREAKER.pop_stats().items():
+        hosts.setdefault(host, {'requests': 0, 'throttled': 0}).update(stats)
+    for host, stats in hosts.items():
+        if stats['throttled']:
+            print(f'{stats["throttled"]} of {stats["requests"]} requests to {host} were throttled')
+        if stats.get('circuit_open'):
+            print(f'Skipped {stats["skipped"]} requests to {host} after {stats["failures"]} failed requests')
+    batcher.close(hosts, chunks)
+    if batcher.n_failed:
+        # Fail the invocation so that SQS delivers the pages again instead of
+        # deleting them. The server ignores the batches it already received.
+        raise RuntimeError(f'Could not push {batcher.n_failed} of {batcher.n_batches} batches')
 
 
 if __name__ == '__main__':
@@ -273,7 +639,7 @@ if __name__ == '__main__':
         '--selector', '-s',
         help='If the response type is HTML, this is the CSS selector that selects all the job titles. If the response '
              'type is JSON, this is a comma-separated list of keys that would return the list of job titles from the '
-             'JSON response.',
+             'JSON response. Keys can also be list indices, or * to match every item of a list or object.',
         type=str,
         required=False,
     )
@@ -321,8 +687,114 @@ if __name__ == '__main__':
         required=False,
         default=''
     )
+    parser.add_argument(
+        '--pagination-type', '-pt',
+        help='If the response type is JSON, how the API splits its list of jobs into pages',
+        type=str,
+        choices=['none', 'offset', 'page', 'cursor'],
+        required=False,
+        default='none',
+    )
+    parser.add_argument(
+        '--pagination-param', '-pp',
+        help='Request parameter that holds the offset, page number or cursor. For POST and PUT requests this is a '
+             'comma-separated list of keys in the request payload.',
+        type=str,
+        required=False,
+        default='',
+    )
+    parser.add_argument(
+        '--pagination-limit-param', '-plp',
+        help='Request parameter that holds the number of jobs per page',
+        type=str,
+        required=False,
+        default='',
+    )
+    parser.add_argument(
+        '--pagination-page-size', '-pps',
+        help='Number of jobs per page',
+        type=int,
+        required=False,
+        default=0,
+    )
+    parser.add_argument(
+        '--pagination-start', '-pst',
+        help='Offset or page number of the first page',
+        type=int,
+        required=False,
+        default=0,
+    )
+    parser.add_argument(
+        '--pagination-total-key', '-ptk',
+        help='Comma-separated list of keys that would give the total number of jobs from the JSON response',
+        type=str,
+        required=False,
+        default='',
+    )
+    parser.add_argument(
+        '--pagination-cursor-key', '-pck',
+        help='Comma-separated list of keys that would give the cursor of the next page from the JSON response',
+        type=str,
+        required=False,
+        default='',
+    )
+    parser.add_argument(
+        '--pagination-max-pages', '-pmp',
+        help='Maximum number of pages to fetch',
+        type=int,
+        required=False,
+        default=50,
+    )
+    parser.add_argument(
+        '--parser', '-p',
+        help='If the response type is HTML, the parser used to parse the page (auto, lexbor, lxml or html.parser)',
+        type=str,
+        choices=['auto', 'lexbor', 'lxml', 'html.parser'],
+        required=False,
+        default='auto',
+    )
+    parser.add_argument(
+        '--stream',
+        help='If the response type is JSON, parse the response incrementally while it is downloaded',
+        action='store_true',
+    )
+    parser.add_argument(
+        '--connect-timeout', '-ct',
+        help='Seconds to wait for a connection to the host of a page',
+        type=float,
+        required=False,
+        default=CONNECT_TIMEOUT,
+    )
+    parser.add_argument(
+        '--read-timeout', '-rt',
+        help='Seconds to wait for the host of a page to send data',
+        type=float,
+        required=False,
+        default=READ_TIMEOUT,
+    )
+    parser.add_argument(
+        '--concurrency', '-c',
+        help='Maximum number of pages to scrape in parallel',
+        type=int,
+        required=False,
+        default=CONCURRENCY,
+    )
+    parser.add_argument(
+        '--host-concurrency', '-hc',
+        help='Maximum number of pages scraped, and requests sent, in parallel to the same host',
+        type=int,
+        required=False,
+        default=HOST_CONCURRENCY,
+    )
     args = parser.parse_args()
+    CONCURRENCY = args.concurrency
+    CONNECT_TIMEOUT = args.connect_timeout
+    READ_TIMEOUT = args.read_timeout
+    HOST_CONCURRENCY = args.host_concurrency
+    HOST_SLOTS.configure(HOST_CONCURRENCY)
     if args.t:
+        # Always download and parse the page when testing it
+        VALIDATOR_STORE = None
         if not args.url or (args.response_type == 'html' and not args.selector):
             print('Test mode requires --url and --selector arguments')
             exit(1)
@@ -334,12 +806,22 @@ if __name__ == '__main__':
             url=args.url,
             selector=args.selector,
             response_type=args.response_type,
+            parser=args.parser,
+            stream_response=args.stream,
             request_method=args.request_method,
             request_payload=args.request_payload or None,
             title_key=args.title_key or '',
             job_id_key=args.job_id_key or '',
             job_url_key=args.job_url_key or '',
             job_url_prefix=args.job_url_prefix or '',
+            pagination_type=args.pagination_type,
+            pagination_param=args.pagination_param,
+            pagination_limit_param=args.pagination_limit_param,
+            pagination_page_size=args.pagination_page_size,
+            pagination_start=args.pagination_start,
+            pagination_total_key=args.pagination_total_key,
+            pagination_cursor_key=args.pagination_cursor_key,
+            pagination_max_pages=args.pagination_max_pages,
         )
         jobs, errors = scrape_page(page)
         print(f'Found {len(jobs)} jobs and {len(errors)} errors on {page.name}')
@@ -0,0 +1,47 @@
+"""
+Pooled HTTP sessions used for every request the scraper makes.
+Sessions are kept at module level, keyed by host, so they are created
+once per Lambda container and their keep-alive connections are reused
+across pages and warm invocations.
+"""
+from threading import Lock
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+_sessions: dict[str, requests.Session] = {}
+_pool_sizes: dict[str, int] = {}
+_lock = Lock()
+
+
+def get_session(url: str, pool_size: int = 1) -> requests.Session:
+    """
+    Get the shared session for the host of the given URL, creating it if needed.
+    `pool_size` is the number of connections that may be open to the host at
+    once, and should match the number of concurrent requests made to it.
+    """
+    host = urlparse(url).netloc.lower()
+    with _lock:
+        session = _sessions.get(host)
+        if session is None:
+            session = requests.Session()
+            _sessions[host] = session
+            _pool_sizes[host] = 0
+        if _pool_sizes[host] < pool_size:
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            _pool_sizes[host] = pool_size
+    return session
+
+
+def close_sessions() -> None:
+    """
+    Close all shared sessions and their pooled connections
+    """
+    with _lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+        _pool_sizes.clear()
@@ -0,0 +1,466 @@
+"""
+Tests of the scraper, which doesn't depend on Django. Run them from this
+directory with `python -m unittest tests`.
+"""
+from contextlib import redirect_stdout
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+import gzip
+import io
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+# The scraper is deployed on its own and imports its modules by their bare
+# names, so this directory must be importable when run from the repository too
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from batches import PushBatcher, get_batch_id  # noqa: E402
+from extractors import JsonExtractor, KeyPath  # noqa: E402
+from pagination import get_first_request, get_next_request, get_page_size, get_remaining_requests, get_total  # noqa: E402
+from parsers import PARSERS, get_parser  # noqa: E402
+from ratelimit import HostSlots, RateLimiter, TokenBucket, parse_retry_after  # noqa: E402
+from retry import CircuitBreaker, CircuitOpenError, backoff_delay  # noqa: E402
+from schema import Job, Page, ScrapeError  # noqa: E402
+from validators import SQLiteValidatorStore, Validators  # noqa: E402
+from wire import encode_body, encode_compact, encode_original  # noqa: E402
+
+
+def make_page(page_id: int = 1, **kwargs) -> Page:
+    return Page(
+        id=page_id,
+        name=f'Page {page_id}',
+        company='Acme',
+        company_id=1,
+        url=f'https://acme.com/careers/{page_id}',
+        selector='a.job',
+        **kwargs,
+    )
+
+
+def make_job(page: Page, title: str, job_id: str = '') -> Job:
+    return Job(
+        title=title,
+        company=page.company,
+        company_id=page.company_id,
+        page=page,
+        last_seen='2025-01-01 00:00:00',
+        job_id=job_id,
+        url=f'https://acme.com/jobs/{title}',
+    )
+
+
+class SQLiteValidatorStoreTests(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.store = SQLiteValidatorStore(os.path.join(directory.name, 'validators.sqlite3'))
+        self.addCleanup(self.store.connection.close)
+
+    def test_get_and_set(self):
+        page = make_page()
+        self.assertEqual(self.store.get(page), Validators())
+        validators = Validators(etag='"abc"', last_modified='Wed, 01 Jan 2025 00:00:00 GMT', content_hash='1', config_hash='2')
+        self.store.set(page, validators)
+        self.assertEqual(self.store.get(page), validators)
+
+    def test_save_leaves_out_pages_that_failed(self):
+        scraped = make_page(1, etag='"a"', content_hash='1', config_hash='2')
+        failed = make_page(2, etag='"b"', content_hash='3', config_hash='2', failed=True)
+        self.store.save([scraped, failed])
+        self.assertEqual(self.store.get(scraped), Validators(etag='"a"', content_hash='1', config_hash='2'))
+        self.assertEqual(self.store.get(failed), Validators())
+
+
+JOBS_HTML = b"""<html><body>
+<ul class="jobs">
+  <li><a href="/jobs/1"><span class="title">Software Engineer</span></a></li>
+  <li><a class="title" href="/jobs/2">  Data &amp; ML   Engineer </a></li>
+  <li><span class="title">Product <b>Designer</b></span></li>
+  <li><a href="/jobs/4"><div><span class="title">Caf\xc3\xa9 Manager</span></div></a></li>
+  <li><a><span class="title">Recruiter</span></a></li>
+</ul>
+</body></html>"""
+
+
+class ParserTests(unittest.TestCase):
+    def test_backends_return_the_same_results(self):
+        expected = [
+            ('Software Engineer', '/jobs/1'),
+            ('Data & ML   Engineer', '/jobs/2'),
+            # Text nodes are stripped and joined, like get_text(strip=True) does
+            ('ProductDesigner', None),
+            ('Caf\u00e9 Manager', '/jobs/4'),
+            ('Recruiter', None),
+        ]
+        for name, parse in PARSERS.items():
+            with self.subTest(parser=name):
+                self.assertEqual(parse(JOBS_HTML, '.jobs .title'), expected)
+
+    def test_selectors_only_soupsieve_supports(self):
+        for name, parse in PARSERS.items():
+            with self.subTest(parser=name):
+                self.assertEqual(parse(JOBS_HTML, '.title:-soup-contains("Designer")'), [('ProductDesigner', None)])
+
+    def test_get_parser(self):
+        self.assertIs(get_parser('html.parser'), PARSERS['html.parser'])
+        self.assertIn(get_parser('auto'), PARSERS.values())
+        self.assertIn(get_parser('not-installed'), PARSERS.values())
+
+
+class KeyPathTests(unittest.TestCase):
+    response = {
+        'data': {
+            'jobs': [
+                {'title': 'Engineer', 'tags': ['remote', 'senior'], 'ids': {'0': 'a'}},
+                {'title': 'Designer', 'tags': []},
+            ],
+            'teams': {'design': {'lead': 'Ann'}, 'eng': {'lead': 'Bob'}},
+            '*': 'literal',
+        },
+    }
+
+    def test_object_keys(self):
+        self.assertEqual(KeyPath('data,teams,eng,lead').get(self.response), 'Bob')
+        self.assertIsNone(KeyPath('data,missing,lead').get(self.response))
+        self.assertEqual(KeyPath('data,jobs,title').get(self.response, 'default'), 'default')
+        self.assertFalse(KeyPath(''))
+
+    def test_indices(self):
+        self.assertEqual(KeyPath('data,jobs,0,title').get(self.response), 'Engineer')
+        self.assertEqual(KeyPath('data,jobs,-1,title').get(self.response), 'Designer')
+        self.assertEqual(KeyPath('data,jobs,0,tags,1').get(self.response), 'senior')
+        self.assertIsNone(KeyPath('data,jobs,2,title').get(self.response))
+        self.assertIsNone(KeyPath('data,jobs,-3,title').get(self.response))
+        # Integer keys of objects are looked up as keys
+        self.assertEqual(KeyPath('data,jobs,0,ids,0').get(self.response), 'a')
+
+    def test_wildcards(self):
+        self.assertEqual(list(KeyPath('data,jobs,*,title').iter(self.response)), ['Engineer', 'Designer'])
+        self.assertEqual(list(KeyPath('data,teams,*,lead').iter(self.response)), ['Ann', 'Bob'])
+        self.assertEqual(list(KeyPath('data,jobs,*,tags,0').iter(self.response)), ['remote'])
+        self.assertEqual(KeyPath('data,jobs,*,title').get(self.response), 'Engineer')
+        self.assertEqual(list(KeyPath('data,missing,*').iter(self.response)), [])
+        # A key that is literally * is looked up as a key
+        self.assertEqual(KeyPath('data,*').get(self.response), 'literal')
+
+
+class JsonExtractorTests(unittest.TestCase):
+    def test_extract(self):
+        extractor = JsonExtractor('results', 'name', 'meta,id', 'slug', 'https://acme.com/jobs/')
+        response = {'results': [
+            {'name': ' Engineer ', 'meta': {'id': 42}, 'slug': 'engineer'},
+            {'name': 'Designer'},
+        ]}
+        self.assertEqual(list(extractor.extract(response)), [
+            ('Engineer', '42', 'https://acme.com/jobs/engineer'),
+            ('Designer', '', 'https://acme.com/jobs/'),
+        ])
+
+    def test_selector_with_wildcards_expands_every_job_list(self):
+        extractor = JsonExtractor('departments,*,jobs', 'title', '', '', '')
+        response = {'departments': [{'jobs': [{'title': 'Engineer'}]}, {'jobs': [{'title': 'Designer'}, {'title': 'Writer'}]}]}
+        self.assertEqual([title for title, _, _ in extractor.extract(response)], ['Engineer', 'Designer', 'Writer'])
+        self.assertIsNone(extractor.stream_prefix)
+
+    def test_empty_selector_selects_the_response(self):
+        extractor = JsonExtractor('', 'title', '', '', '')
+        self.assertEqual([title for title, _, _ in extractor.extract([{'title': 'Engineer'}])], ['Engineer'])
+        self.assertEqual(JsonExtractor('data,jobs', 'title', '', '', '').stream_prefix, 'data.jobs.item')
+
+
+class PaginationTests(unittest.TestCase):
+    url = 'https://acme.com/api/jobs?team=eng'
+
+    def test_offset_pages_of_a_get_api(self):
+        page = make_page(pagination_type='offset', pagination_param='offset', pagination_limit_param='limit', pagination_page_size=20)
+        url, payload = get_first_request(page, self.url, None)
+        self.assertEqual(url, 'https://acme.com/api/jobs?team=eng&offset=0&limit=20')
+        self.assertIsNone(payload)
+        self.assertEqual(get_page_size(page, url, payload, 5), 20)
+        self.assertEqual(get_remaining_requests(page, url, payload, 20, 45), [
+            ('https://acme.com/api/jobs?team=eng&offset=20&limit=20', None),
+            ('https://acme.com/api/jobs?team=eng&offset=40&limit=20', None),
+        ])
+        self.assertEqual(get_next_request(page, url, payload, {}, 1, 20), ('https://acme.com/api/jobs?team=eng&offset=20&limit=20', None))
+
+    def test_numbered_pages_of_a_post_api(self):
+        page = make_page(request_method='POST', pagination_type='page', pagination_param='paging,page', pagination_start=1)
+        payload = {'query': 'engineer'}
+        url, first_payload = get_first_request(page, self.url, payload)
+        self.assertEqual(url, self.url)
+        self.assertEqual(first_payload, {'query': 'engineer', 'paging': {'page': 1}})
+        self.assertEqual(payload, {'query': 'engineer'})
+        # Without a configured page size, it is the number of jobs on the first page
+        self.assertEqual(get_page_size(page, url, first_payload, 10), 10)
+        requests = get_remaining_requests(page, url, first_payload, 10, 30)
+        self.assertEqual([request_payload['paging']['page'] for _, request_payload in requests], [2, 3])
+
+    def test_number_of_pages_is_limited(self):
+        page = make_page(pagination_type='page', pagination_param='page', pagination_max_pages=3)
+        url, payload = get_first_request(page, self.url, None)
+        self.assertEqual(len(get_remaining_requests(page, url, payload, 10, 1000)), 2)
+        self.assertIsNone(get_next_request(page, url, payload, {}, 3, 10))
+        self.assertEqual(get_remaining_requests(page, url, payload, 0, 1000), [])
+
+    def test_cursor_pages(self):
+        page = make_page(pagination_type='cursor', pagination_param='after', pagination_cursor_key='paging,next')
+        url, payload = get_first_request(page, self.url, None)
+        self.assertEqual(url, self.url)
+        self.assertEqual(get_next_request(page, url, payload, {'paging': {'next': 'abc'}}, 1, 10), ('https://acme.com/api/jobs?team=eng&after=abc', None))
+        self.assertIsNone(get_next_request(page, url, payload, {'paging': {'next': ''}}, 1, 10))
+        self.assertIsNone(get_next_request(page, url, payload, {}, 1, 10))
+
+    def test_total(self):
+        page = make_page(pagination_total_key='meta,total')
+        self.assertEqual(get_total(page, {'meta': {'total': '45'}}), 45)
+        self.assertIsNone(get_total(page, {'meta': {}}))
+        self.assertIsNone(get_total(make_page(), {'meta': {'total': 45}}))
+
+
+class HostSlotsTests(unittest.TestCase):
+    def test_limits_concurrent_requests_per_host(self):
+        slots = HostSlots(2)
+        lock = threading.Lock()
+        running = {'a.com': 0, 'b.com': 0}
+        most = {'a.com': 0, 'b.com': 0}
+
+        def request(host):
+            with slots.hold(host):
+                with lock:
+                    running[host] += 1
+                    most[host] = max(most[host], running[host])
+                time.sleep(0.01)
+                with lock:
+                    running[host] -= 1
+
+        threads = [threading.Thread(target=request, args=(host,)) for host in ['a.com', 'b.com'] * 5]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(most, {'a.com': 2, 'b.com': 2})
+
+
+class TokenBucketTests(unittest.TestCase):
+    def test_burst_then_rate(self):
+        bucket = TokenBucket(rate=10, burst=2)
+        self.assertEqual(bucket.wait_time(), 0)
+        bucket.acquire()
+        bucket.acquire()
+        self.assertGreater(bucket.wait_time(), 0)
+        self.assertLessEqual(bucket.wait_time(), 0.1)
+        start = time.monotonic()
+        bucket.acquire()
+        self.assertGreater(time.monotonic() - start, 0.05)
+
+    def test_tokens_refill_up_to_the_burst(self):
+        bucket = TokenBucket(rate=10, burst=2)
+        bucket.updated -= 60
+        bucket.acquire()
+        bucket.acquire()
+        self.assertGreater(bucket.wait_time(), 0)
+
+    def test_pause(self):
+        bucket = TokenBucket(rate=10, burst=2)
+        bucket.pause(5)
+        bucket.pause(1)
+        self.assertGreater(bucket.wait_time(), 4)
+
+
+class RateLimiterTests(unittest.TestCase):
+    def test_stats_and_throttling(self):
+        limiter = RateLimiter(rate=100, burst=5)
+        limiter.configure('slow.com', 1, 1)
+        limiter.acquire('slow.com')
+        limiter.acquire('acme.com')
+        self.assertGreater(limiter.wait_time('slow.com'), 0.5)
+        self.assertEqual(limiter.wait_time('acme.com'), 0)
+        limiter.throttled('acme.com', 30)
+        self.assertGreater(limiter.wait_time('acme.com'), 29)
+        self.assertEqual(limiter.pop_stats(), {
+            'slow.com': {'requests': 1, 'throttled': 0},
+            'acme.com': {'requests': 1, 'throttled': 1},
+        })
+        self.assertEqual(limiter.pop_stats(), {})
+
+    def test_parse_retry_after(self):
+        self.assertEqual(parse_retry_after('120'), 120)
+        self.assertEqual(parse_retry_after('-5'), 0)
+        retry_at = datetime.now(timezone.utc) + timedelta(seconds=60)
+        self.assertAlmostEqual(parse_retry_after(format_datetime(retry_at, usegmt=True)), 60, delta=2)
+        self.assertEqual(parse_retry_after('Wed, 01 Jan 2020 00:00:00 GMT'), 0)
+        self.assertIsNone(parse_retry_after('soon'))
+        self.assertIsNone(parse_retry_after(None))
+
+
+class CircuitBreakerTests(unittest.TestCase):
+    def setUp(self):
+        # The breaker prints when a circuit opens
+        self.enterContext(redirect_stdout(io.StringIO()))
+
+    def test_opens_after_consecutive_failures(self):
+        breaker = CircuitBreaker(threshold=3)
+        breaker.failure('acme.com')
+        breaker.failure('acme.com')
+        breaker.success('acme.com')
+        breaker.failure('acme.com')
+        breaker.failure('acme.com')
+        breaker.check('acme.com')
+        self.assertFalse(breaker.is_open('acme.com'))
+        breaker.failure('acme.com')
+        self.assertTrue(breaker.is_open('acme.com'))
+        with self.assertRaises(CircuitOpenError):
+            breaker.check('acme.com')
+        breaker.check('globex.com')
+        self.assertEqual(breaker.pop_stats(), {'acme.com': {'failures': 5, 'skipped': 1, 'circuit_open': True}})
+
+    def test_trip_opens_right_away(self):
+        breaker = CircuitBreaker(threshold=3)
+        breaker.trip('acme.com', 'after it asked to wait 3600s')
+        with self.assertRaisesRegex(CircuitOpenError, 'after it asked to wait 3600s'):
+            breaker.check('acme.com')
+
+    def test_reset(self):
+        breaker = CircuitBreaker(threshold=1)
+        breaker.failure('acme.com')
+        breaker.reset()
+        breaker.check('acme.com')
+        self.assertEqual(breaker.pop_stats(), {})
+
+    def test_zero_threshold_never_opens(self):
+        breaker = CircuitBreaker(threshold=0)
+        for _ in range(10):
+            breaker.failure('acme.com')
+        self.assertFalse(breaker.is_open('acme.com'))
+
+    def test_backoff_delay(self):
+        for attempt in range(6):
+            delay = backoff_delay(attempt, 0.5, 8)
+            self.assertGreaterEqual(delay, 0)
+            self.assertLessEqual(delay, min(8, 0.5 * 2 ** attempt))
+
+
+class WireTests(unittest.TestCase):
+    def setUp(self):
+        self.pages = [make_page(1), make_page(2), make_page(3)]
+        self.jobs = [make_job(self.pages[1], 'Engineer', '1'), make_job(self.pages[0], 'Designer'), make_job(self.pages[1], 'Writer')]
+        self.errors = [ScrapeError(page=self.pages[2], error='Timed out')]
+
+    def test_compact_format_sends_each_page_once(self):
+        data = encode_compact(self.jobs, self.errors, self.pages)
+        self.assertEqual(data['version'], 2)
+        self.assertEqual([page['id'] for page in data['pages']], [1, 2, 3])
+        self.assertEqual(data['jobs'], {
+            'page': [1, 0, 1],
+            'title': ['Engineer', 'Designer', 'Writer'],
+            'job_id': ['1', '', ''],
+            'url': ['https://acme.com/jobs/Engineer', 'https://acme.com/jobs/Designer', 'https://acme.com/jobs/Writer'],
+            'last_seen': ['2025-01-01 00:00:00'] * 3,
+        })
+        self.assertEqual(data['errors'], [{'page': 2, 'error': 'Timed out'}])
+
+    def test_rows_hold_the_same_jobs_as_columns(self):
+        columns = encode_compact(self.jobs, self.errors, self.pages)['jobs']
+        rows = encode_compact(self.jobs, self.errors, self.pages, columnar=False)['jobs']
+        self.assertEqual(rows, [list(row) for row in zip(*columns.values())])
+
+    def test_pages_of_jobs_are_added_to_the_table(self):
+        data = encode_compact(self.jobs, [], [])
+        self.assertEqual([page['id'] for page in data['pages']], [2, 1])
+        self.assertEqual(data['jobs']['page'], [0, 1, 0])
+
+    def test_original_format(self):
+        data = encode_original(self.jobs, self.errors, self.pages)
+        self.assertEqual(data['jobs'][0]['page'], {'id': 2, 'name': 'Page 2', 'company': 'Acme', 'url': 'https://acme.com/careers/2', 'selector': 'a.job'})
+        self.assertEqual(len(data['pages']), 3)
+        self.assertEqual(data['errors'][0]['error'], 'Timed out')
+
+    def test_encode_body(self):
+        body = {'time': 't', 'data': encode_compact(self.jobs, self.errors, self.pages)}
+        content, headers = encode_body(body)
+        self.assertEqual(headers, {'Content-Type': 'application/json', 'Content-Encoding': 'gzip'})
+        self.assertEqual(json.loads(gzip.decompress(content)), body)
+        content, headers = encode_body(body, compress=False)
+        self.assertNotIn('Content-Encoding', headers)
+        self.assertEqual(json.loads(content), body)
+
+
+class PushBatcherTests(unittest.TestCase):
+    def run_batcher(self, pages, results, order=None, chunks=None, max_jobs=2, max_bytes=10 ** 6, failing=()):
+        """
+        Add the results of each page to a batcher in the given order of page
+        indices and close it. Returns the batches sent, as 5-tuples of the
+        IDs of their pages, job titles, batch ID, host stats and chunks.
+        """
+        sent = []
+
+        def send(jobs, errors, batch_pages, push_id, batch_id, hosts, batch_chunks):
+            sent.append(([page.id for page in batch_pages], [job.title for job in jobs], batch_id, hosts, batch_chunks))
+            return None if len(sent) in failing else push_id
+
+        batcher = PushBatcher(pages, 7, send, max_jobs=max_jobs, max_bytes=max_bytes)
+        for index in order or range(len(pages)):
+            batcher.add(index, results[index], [])
+        batcher.close({'acme.com': {'requests': 1, 'throttled': 0}}, chunks)
+        return sent
+
+    def test_batches_keep_the_order_of_the_pages(self):
+        pages = [make_page(i) for i in range(1, 5)]
+        results = [[make_job(page, f'Job {page.id}')] for page in pages]
+        sent = self.run_batcher(pages, results, order=[2, 0, 3, 1], chunks=[0])
+        self.assertEqual([(page_ids, titles) for page_ids, titles, *_ in sent], [
+            ([1, 2], ['Job 1', 'Job 2']),
+            ([3, 4], ['Job 3', 'Job 4']),
+            ([], []),
+        ])
+        # Only the last batch has the host stats and chunks
+        self.assertEqual([(hosts, chunks) for *_, hosts, chunks in sent], [
+            (None, None),
+            (None, None),
+            ({'acme.com': {'requests': 1, 'throttled': 0}}, [0]),
+        ])
+
+    def test_a_page_is_never_split(self):
+        pages = [make_page(1), make_page(2)]
+        results = [[make_job(pages[0], f'Job {i}') for i in range(3)], [make_job(pages[1], 'Job 3')]]
+        sent = self.run_batcher(pages, results, max_jobs=2)
+        self.assertEqual([titles for _, titles, *_ in sent], [['Job 0', 'Job 1', 'Job 2'], ['Job 3']])
+
+    def test_batches_are_limited_by_size(self):
+        pages = [make_page(i) for i in range(1, 4)]
+        results = [[make_job(page, 'x' * 100)] for page in pages]
+        # Each job is about 300 bytes, as its URL has its title too
+        sent = self.run_batcher(pages, results, max_jobs=100, max_bytes=500)
+        self.assertEqual([page_ids for page_ids, *_ in sent], [[1, 2], [3]])
+
+    def test_batch_ids(self):
+        pages = [make_page(i) for i in range(1, 5)]
+        results = [[make_job(page, f'Job {page.id}')] for page in pages]
+        first_chunk = self.run_batcher(pages[:2], results[:2], chunks=[0])
+        second_chunk = self.run_batcher(pages[2:], results[2:], chunks=[1])
+        batch_ids = [batch_id for _, _, batch_id, *_ in first_chunk + second_chunk]
+        # Including the empty last batch of each chunk
+        self.assertEqual(len(set(batch_ids)), len(batch_ids))
+        # A chunk that is scraped again is sent with the same batch IDs
+        self.assertEqual([batch_id for _, _, batch_id, *_ in self.run_batcher(pages[:2], results[:2], chunks=[0])], batch_ids[:2])
+        self.assertEqual(get_batch_id(7, pages[:2]), get_batch_id(7, pages[:2]))
+        self.assertNotEqual(get_batch_id(7, pages[:2]), get_batch_id(8, pages[:2]))
+        self.assertNotEqual(get_batch_id(7, []), get_batch_id(7, [], []))
+
+    def test_chunks_are_not_completed_when_a_batch_failed(self):
+        pages = [make_page(i) for i in range(1, 4)]
+        results = [[make_job(page, f'Job {page.id}')] for page in pages]
+        sent = self.run_batcher(pages, results, chunks=[0], failing={1})
+        self.assertEqual([(page_ids, chunks) for page_ids, *_, chunks in sent], [([1, 2], None), ([3], None)])
+        # An empty last batch is not sent at all
+        sent = self.run_batcher(pages[:2], results[:2], chunks=[0], failing={1})
+        self.assertEqual([page_ids for page_ids, *_ in sent], [[1, 2]])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+"""
+Stores for the cache validators (ETag, Last-Modified and a hash of the
+response body) of scraped pages, used to skip pages that have not changed
+since they were last scraped.
+"""
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+import os
+import sqlite3
+from threading import Lock
+
+from schema import Page
+
+
+@dataclass
+class Validators:
+    """Cache validators of the last response received for a page"""
+    etag: str = ''
+    last_modified: str = ''
+    content_hash: str = ''
+    # Hash of the page's scrape settings when the validators were saved
+    config_hash: str = ''
+
+
+class ValidatorStore(ABC):
+    """Base class for a store that persists the validators of each page"""
+    @abstractmethod
+    def get(self, page: Page) -> Validators:
+        """
+        Get the validators saved for a page, or empty validators if there are none
+        """
+
+    @abstractmethod
+    def set(self, page: Page, validators: Validators) -> None:
+        """
+        Save the validators of a page
+        """
+
+    def save(self, pages: list[Page]) -> None:
+        """
+        Save the validators the scraper set on each page, once the page's jobs
+        were pushed, leaving out pages that could not be scraped
+        """
+        for page in pages:
+            if page.failed:
+                continue
+            self.set(page, Validators(
+                etag=page.etag,
+                last_modified=page.last_modified,
+                content_hash=page.content_hash,
+                config_hash=page.config_hash,
+            ))
+
+
+class ServerValidatorStore(ValidatorStore):
+    """
+    Validators sent by the server along with the list of pages. Updated
+    validators are sent back to the server on the page in the push, so they
+    survive cold starts without any storage in the Lambda itself.
+    """
+    def get(self, page: Page) -> Validators:
+        return Validators(
+            etag=page.etag,
+            last_modified=page.last_modified,
+            content_hash=page.content_hash,
+            config_hash=page.config_hash,
+        )
+
+    def set(self, page: Page, validators: Validators) -> None:
+        page.etag = validators.etag
+        page.last_modified = validators.last_modified
+        page.content_hash = validators.content_hash
+        page.config_hash = validators.config_hash
+
+
+class SQLiteValidatorStore(ValidatorStore):
+    """Validators stored in a local SQLite database, used when testing locally"""
+    def __init__(self, path: str):
+        self.lock = Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self.lock, self.connection:
+            self.connection.execute(
+                'CREATE TABLE IF NOT EXISTS validators ('
+                'page_id INTEGER PRIMARY KEY, etag TEXT, last_modified TEXT, content_hash TEXT, config_hash TEXT)'
+            )
+            columns = [row[1] for row in self.connection.execute('PRAGMA table_info(validators)')]
+            # Databases created before config hashes were stored
+            if 'config_hash' not in columns:
+                self.connection.execute("ALTER TABLE validators ADD COLUMN config_hash TEXT DEFAULT ''")
+
+    def get(self, page: Page) -> Validators:
+        with self.lock:
+            row = self.connection.execute(
+                'SELECT etag, last_modified, content_hash, config_hash FROM validators WHERE page_id = ?',
+                (page.id,)
+            ).fetchone()
+        if row is None:
+            return Validators()
+        return Validators(*(value or '' for value in row))
+
+    def set(self, page: Page, validators: Validators) -> None:
+        with self.lock, self.connection:
+            self.connection.execute(
+                'INSERT OR REPLACE INTO validators (page_id, etag, last_modified, content_hash, config_hash) VALUES (?, ?, ?, ?, ?)',
+                (page.id, validators.etag, validators.last_modified, validators.content_hash, validators.config_hash)
+            )
+
+
+def get_validator_store(is_lambda: bool) -> ValidatorStore | None:
+    """
+    Get the validator store selected by the HAWK_VALIDATOR_STORE environment
+    variable ("server", "sqlite" or "none"). The server store is used on Lambda
+    and a local SQLite database is used otherwise.
+    """
+    backend = os.environ.get('HAWK_VALIDATOR_STORE', 'server' if is_lambda else 'sqlite')
+    if backend == 'server':
+        return ServerValidatorStore()
+    if backend == 'sqlite':
+        return SQLiteValidatorStore(os.environ.get('HAWK_VALIDATOR_DB', 'validators.sqlite3'))
+    return None
@@ -0,0 +1,125 @@
+"""
+Encoding of the data pushed to the server. The original format (version 1)
+repeats the details of a page with every job found on it. The compact format
+(version 2) sends the details of each page once in a table, and jobs and errors
+refer to their page by its index in the table.
+"""
+import gzip
+import json
+
+from schema import Job, Page, ScrapeError
+
+# Fields of each job in the compact format, in the order of a row
+JOB_FIELDS = ['page', 'title', 'job_id', 'url', 'last_seen']
+
+
+def get_page_table(jobs: list[Job], errors: list[ScrapeError], pages: list[Page]) -> tuple[list[dict], dict[int, int]]:
+    """
+    Get the details of every page that was scraped or that jobs and errors were
+    found on, and the index of each page in that list by the page's ID
+    """
+    table = []
+    indices = {}
+    for page in [*pages, *(job.page for job in jobs), *(error.page for error in errors)]:
+        if page.id in indices:
+            continue
+        indices[page.id] = len(table)
+        table.append({
+            'id': page.id,
+            'name': page.name,
+            'company': page.company,
+            'company_id': page.company_id,
+            'url': page.url,
+            'selector': page.selector,
+            'etag': page.etag,
+            'last_modified': page.last_modified,
+            'content_hash': page.content_hash,
+            'job_fingerprint': page.job_fingerprint,
+            'config_hash': page.config_hash,
+            'unchanged': page.unchanged,
+            'failed': page.failed,
+        })
+    return table, indices
+
+
+def encode_compact(jobs: list[Job], errors: list[ScrapeError], pages: list[Page], columnar: bool = True) -> dict:
+    """
+    Get the jobs, errors and pages of a push in the compact format. With `columnar`
+    jobs are sent as a list of values for each field, otherwise as a list of rows.
+    """
+    table, indices = get_page_table(jobs, errors, pages)
+    rows = [
+        [indices[job.page.id], job.title, job.job_id, job.url, job.last_seen]
+        for job in jobs
+    ]
+    if columnar:
+        encoded_jobs = {field: [row[i] for row in rows] for i, field in enumerate(JOB_FIELDS)}
+    else:
+        encoded_jobs = rows
+    return {
+        'version': 2,
+        'pages': table,
+        'jobs': encoded_jobs,
+        'errors': [{'page': indices[error.page.id], 'error': error.error} for error in errors],
+    }
+
+
+def encode_original(jobs: list[Job], errors: list[ScrapeError], pages: list[Page]) -> dict:
+    """
+    Get the jobs, errors and pages of a push in the original format
+    """
+    return {
+        'jobs': [
+            {
+                'title': job.title,
+                'company': job.company,
+                'company_id': job.company_id,
+                'page': {
+                    'id': job.page.id,
+                    'name': job.page.name,
+                    'company': job.page.company,
+                    'url': job.page.url,
+                    'selector': job.page.selector,
+                },
+                'last_seen': job.last_seen,
+                'job_id': job.job_id,
+                'url': job.url,
+            } for job in jobs
+        ],
+        'errors': [
+            {
+                'page': {
+                    'name': error.page.name,
+                    'company': error.page.company,
+                    'url': error.page.url,
+                    'selector': error.page.selector,
+                },
+                'error': error.error,
+            } for error in errors
+        ],
+        'pages': [
+            {
+                'id': page.id,
+                'etag': page.etag,
+                'last_modified': page.last_modified,
+                'content_hash': page.content_hash,
+                'job_fingerprint': page.job_fingerprint,
+                'config_hash': page.config_hash,
+                'unchanged': page.unchanged,
+                'failed': page.failed,
+            } for page in pages
+        ],
+    }
+
+
+def encode_body(body: dict, compress: bool = True) -> tuple[bytes, dict[str, str]]:
+    """
+    Serialize the body of a request to JSON, compressed with gzip if `compress`
+    is True. Returns the body along with the headers describing it.
+    """
+    content = json.dumps(body, separators=(',', ':')).encode('utf-8')
+    headers = {'Content-Type': 'application/json'}
+    if compress:
+        content = gzip.compress(content, compresslevel=6)
+        headers['Content-Encoding'] = 'gzip'
+    return content, headers
@@ -5,7 +5,10 @@ from users.models import User
 
 
 class CustomUserAdmin(UserAdmin):
-    list_display = ['username', 'email',]
+    list_display = ['username', 'email', 'notification_frequency']
+    fieldsets = UserAdmin.fieldsets + (
+        ('Notifications', {'fields': ('notification_frequency', 'last_digest_at')}),
+    )
 
 
 admin.site.register(User, CustomUserAdmin)
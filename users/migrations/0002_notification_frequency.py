@@ -0,0 +1,37 @@
+# Generated by Django 5.2 on 2026-10-18 16:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="last_digest_at",
+            field=models.DateTimeField(
+                blank=True,
+                help_text="When the user was last emailed a digest",
+                null=True,
+            ),
+        ),
+        migrations.AddField(
+            model_name="user",
+            name="notification_frequency",
+            field=models.CharField(
+                choices=[
+                    ("instant", "Instantly"),
+                    ("hourly", "Hourly digest"),
+                    ("daily", "Daily digest"),
+                    ("off", "Off"),
+                ],
+                default="instant",
+                help_text="How often to email the user about new jobs on their watchlists",
+                max_length=10,
+            ),
+        ),
+    ]
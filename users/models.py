@@ -1,8 +1,29 @@
+from datetime import timedelta
+
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 
 
 class User(AbstractUser):
     """A custom user model"""
+    NOTIFICATION_FREQUENCIES = [
+        ('instant', 'Instantly'),
+        ('hourly', 'Hourly digest'),
+        ('daily', 'Daily digest'),
+        ('off', 'Off'),
+    ]
+    # How long new jobs are collected for before they are emailed in a digest
+    DIGEST_WINDOWS = {
+        'hourly': timedelta(hours=1),
+        'daily': timedelta(days=1),
+    }
+
     username = models.CharField(max_length=30, unique=True)
     email = models.EmailField(unique=True)
+    notification_frequency = models.CharField(
+        max_length=10,
+        choices=NOTIFICATION_FREQUENCIES,
+        default='instant',
+        help_text='How often to email the user about new jobs on their watchlists',
+    )
+    last_digest_at = models.DateTimeField(null=True, blank=True, help_text='When the user was last emailed a digest')
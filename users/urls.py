@@ -3,6 +3,7 @@ from django.urls import path
 
 from users.views import (
     test_view,
+    NotificationPreferencesView,
     UserRegistrationView,
 )
 
@@ -12,4 +13,5 @@ urlpatterns = [
     path('login', LoginView.as_view(template_name='users/login.html'), name='login'),
     path('logout', LogoutView.as_view(), name='logout'),
     path('register', UserRegistrationView.as_view(), name='register'),
+    path('preferences', NotificationPreferencesView.as_view(), name='preferences'),
 ]
@@ -1,9 +1,10 @@
 from django.contrib.auth import login
+from django.contrib.auth.mixins import LoginRequiredMixin
 from django.http import HttpResponse, HttpResponseRedirect
 from django.shortcuts import render, reverse
 from django.views.generic import View
 
-from users.forms import UserRegistrationForm
+from users.forms import NotificationPreferencesForm, UserRegistrationForm
 
 
 def test_view(request, *args, **kwargs):
@@ -28,3 +29,19 @@ class UserRegistrationView(View):
             return render(request, 'users/register.html', {
                 'form': form,
             })
+
+
+class NotificationPreferencesView(LoginRequiredMixin, View):
+    def get(self, request):
+        return render(request, 'users/preferences.html', {
+            'form': NotificationPreferencesForm(instance=request.user),
+        })
+
+    def post(self, request):
+        form = NotificationPreferencesForm(request.POST, instance=request.user)
+        if form.is_valid():
+            form.save()
+            return HttpResponseRedirect(reverse('core:index'))
+        return render(request, 'users/preferences.html', {
+            'form': form,
+        })